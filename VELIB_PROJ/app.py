@@ -1,4 +1,5 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 # from my_utils import *
 import folium
@@ -17,7 +18,9 @@ from scipy.stats import pearsonr, ttest_ind, f_oneway, chi2_contingency
 import seaborn as sns
 import json
 
-from data.loader import load_raw_data, load_processed_data
+from data.aggregates import aggregates_version
+from data.loader import ensure_raw_store, load_dashboard_aggregates, load_raw_data
+from data.raw_store import DATE_COL, SITE_COL, TARGET_COL
 
 # ------------------------------ PATHS ------------------------------
 # CSV_PATH = "comptage_velo_donnees_compteurs.csv"
@@ -25,70 +28,73 @@ PLOT_DIR = "assets/plots"
 os.makedirs(PLOT_DIR, exist_ok=True)
 
 # ------------------------------ CACHING ------------------------------
+# Les graphiques sont dessinés depuis les agrégats (data/aggregates.py), une fois par version
+# des données : seule la version (quelques octets) est hachée, les tables "_" ne le sont pas.
+def _bar(ax, table, title, order=None):
+    if order is not None:
+        table = table.set_index("key").reindex(order).dropna(subset=["count"]).reset_index()
+    ci = 1.96 * table["std"] / np.sqrt(table["count"])  # IC 95 % de la moyenne
+    ax.bar(table["key"].astype(str), table["mean"], yerr=ci, color="steelblue", capsize=3)
+    ax.set_title(title)
+    ax.set_ylabel("Comptage horaire")
+
 @st.cache_data
-def ensure_png_hourly(df, path=os.path.join(PLOT_DIR, "hourly.png")):
+def ensure_png_hourly(version, _hourly):
+    path = os.path.join(PLOT_DIR, f"hourly_{version}.png")
     # si le fichier existe déjà, retourner son chemin (pas de recalcul)
     if os.path.exists(path):
         return path
     # sinon dessiner et sauvegarder
-    df_heure = df.groupby('heure', as_index=False)['comptage_horaire'].mean()
     fig, ax = plt.subplots(figsize=(12,6))
-    sns.barplot(data=df_heure, x='heure', y='comptage_horaire', color='steelblue', ax=ax)
-    ax.set_title("Comptage horaire moyen selon l'heure")
-    ax.set_ylabel("Comptage horaire")
+    _bar(ax, _hourly, "Comptage horaire moyen selon l'heure")
     plt.tight_layout()
     fig.savefig(path, dpi=150, bbox_inches='tight')
     plt.close(fig)
     return path
 
 @st.cache_data
-def ensure_png_weather(df, path=os.path.join(PLOT_DIR, "weather_effects.png")):
+def ensure_png_weather(version, _aggregates):
+    path = os.path.join(PLOT_DIR, f"weather_effects_{version}.png")
     if os.path.exists(path):
         return path
-    df['pluie'] = df['rain'] > 0
-    df['neige'] = df['snowfall'] > 0
-    df['vent'] = df['wind_speed_10m'] > 15
     fig, axes = plt.subplots(2,2, figsize=(14,10))
     axes = axes.flatten()
-    sns.barplot(x='pluie', y='comptage_horaire', data=df, ax=axes[0])
-    axes[0].set_title("Pluie")
-    sns.barplot(x='neige', y='comptage_horaire', data=df, ax=axes[1])
-    axes[1].set_title("Neige")
-    sns.barplot(x='vent', y='comptage_horaire', data=df, ax=axes[2])
-    axes[2].set_title("Vent")
-    sns.scatterplot(x='apparent_temperature', y='comptage_horaire', data=df, alpha=0.3, ax=axes[3])
+    _bar(axes[0], _aggregates["pluie"], "Pluie")
+    _bar(axes[1], _aggregates["neige"], "Neige")
+    _bar(axes[2], _aggregates["vent"], "Vent")
+    # moyenne par degré de température ressentie (taille : nombre d'heures)
+    temperature = _aggregates["temperature"]
+    axes[3].scatter(temperature["key"], temperature["mean"], s=10 + 90 * temperature["count"] / temperature["count"].max(), alpha=0.6)
     axes[3].set_title("Température")
+    axes[3].set_xlabel("apparent_temperature (°C)")
     plt.tight_layout()
     fig.savefig(path, dpi=150, bbox_inches='tight')
     plt.close(fig)
     return path
 
 @st.cache_data
-def ensure_png_corr(df, path=os.path.join(PLOT_DIR, "corr_matrix.png")):
+def ensure_png_corr(version, _corr):
+    path = os.path.join(PLOT_DIR, f"corr_matrix_{version}.png")
     if os.path.exists(path):
         return path
-    corr_matrix = df[['comptage_horaire','nuit','vacances','heure_de_pointe','pluie','neige','apparent_temperature','vent']].corr()
     fig, ax = plt.subplots(figsize=(10,8))
-    sns.heatmap(corr_matrix, annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
+    sns.heatmap(_corr, annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
     plt.tight_layout()
     fig.savefig(path, dpi=150, bbox_inches='tight')
     plt.close(fig)
     return path
 
 @st.cache_data
-def ensure_png_seasons(df, path=os.path.join(PLOT_DIR, "seasons.png")):
+def ensure_png_seasons(version, _aggregates):
+    path = os.path.join(PLOT_DIR, f"seasons_{version}.png")
     if os.path.exists(path):
         return path
     fig, axes = plt.subplots(2,2, figsize=(14,10))
     axes = axes.flatten()
-    sns.barplot(x='saison', y='comptage_horaire', order=['winter','spring','summer','autumn'], data=df, ax=axes[0])
-    axes[0].set_title("Saisons")
-    sns.barplot(x=df['date_et_heure_de_comptage'].dt.month, y='comptage_horaire', data=df, ax=axes[1])
-    axes[1].set_title("Mois")
-    sns.barplot(x='vacances', y='comptage_horaire', data=df, ax=axes[2])
-    axes[2].set_title("Vacances")
-    sns.barplot(x='heure_de_pointe', y='comptage_horaire', data=df, ax=axes[3])
-    axes[3].set_title("Heures de pointe")
+    _bar(axes[0], _aggregates["saison"], "Saisons", order=['winter','spring','summer','autumn'])
+    _bar(axes[1], _aggregates["mois"], "Mois")
+    _bar(axes[2], _aggregates["vacances"], "Vacances")
+    _bar(axes[3], _aggregates["heure_de_pointe"], "Heures de pointe")
     plt.tight_layout()
     fig.savefig(path, dpi=150, bbox_inches='tight')
     plt.close(fig)
@@ -106,8 +112,11 @@ def ensure_png_seasons(df, path=os.path.join(PLOT_DIR, "seasons.png")):
 #     return processed_df, feature_names
 
 # -----------------------------------------------------LOAD DATA--------------------------------------------------------------------
-raw_df = load_raw_data()
-processed_df, feature_names = load_processed_data(raw_df)
+# Pas de lecture des données à chaque rerun : la version (hash du manifest du store) suffit à
+# retrouver les agrégats précalculés ; ils ne sont recalculés qu'après une mise à jour des données.
+store_dir = ensure_raw_store()
+data_version = aggregates_version(store_dir)
+aggregates = load_dashboard_aggregates(data_version, store_dir)
 
 #------------------------------------------------------- SIDE BAR-------------------------------------------------------------------
 with st.sidebar:
@@ -160,5 +169,60 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-st.dataframe(raw_df.head())
-st.write(raw_df.columns)
\ No newline at end of file
+st.dataframe(aggregates["preview"])
+st.write(aggregates["preview"].columns)
+
+
+#------------------------------------------------------- ANALYSE DES DONNÉES -------------------------------------------------------
+if page == "Data Analysis":
+    st.header("Analyse des données")
+    st.caption(f"{int(aggregates['heure']['count'].sum()):,} heures de comptage agrégées (version {data_version})")
+    st.image(ensure_png_hourly(data_version, aggregates["heure"]))
+    st.image(ensure_png_weather(data_version, aggregates))
+    st.image(ensure_png_corr(data_version, aggregates["corr"]))
+    st.image(ensure_png_seasons(data_version, aggregates))
+
+
+#------------------------------------------------------- MODELE SARIMAX -------------------------------------------------------------
+SARIMAX_DIR = "artifacts/sarimax"
+
+
+@st.cache_resource
+def get_sarimax_models(path, mtime):
+    # mtime dans la clé : rechargé après un nouveau fit ou un --extend
+    from utils.my_utils import load_sarimax
+    return load_sarimax(path)
+
+
+if page == "Modèle Sarimax":
+    st.header("Modèle Sarimax")
+    manifest = os.path.join(SARIMAX_DIR, "manifest.json")
+    if not os.path.exists(manifest):
+        st.info("Aucun modèle Sarimax : lancer `python models/sarimax.py --data <raw_csv_or_store>` (ou `make sarimax`).")
+    else:
+        sarimax_models = get_sarimax_models(SARIMAX_DIR, os.path.getmtime(manifest))
+        site = st.selectbox("Site de comptage", sorted(sarimax_models))
+        horizon = st.slider("Horizon (heures)", 24, 168, 48, step=24)
+        site_model = sarimax_models[site]
+        forecast = site_model.forecast(horizon)
+
+        # seuls les derniers jours sont lus (filtre poussé jusqu'aux partitions du store)
+        recent = load_raw_data(columns=[SITE_COL, DATE_COL, TARGET_COL], start=f"{site_model.end - timedelta(days=7):%Y-%m-%d}")
+        site_rows = recent[recent["identifiant_du_site_de_comptage"].astype(str) == site]
+        history = (
+            site_rows.assign(date=pd.to_datetime(site_rows["date_et_heure_de_comptage"].astype(str), utc=True).dt.tz_convert(None))
+            .groupby("date")["comptage_horaire"].sum()
+        )
+        history = history[history.index > site_model.end - timedelta(days=7)]
+
+        fig, ax = plt.subplots(figsize=(12, 4))
+        ax.plot(history.index, history.values, label="Observé")
+        ax.plot(forecast.index, forecast.values, label="Prévision Sarimax")
+        ax.set_xlabel("Date (UTC)")
+        ax.set_ylabel("Comptage horaire")
+        ax.legend()
+        st.pyplot(fig)
+        st.caption(
+            f"SARIMA{tuple(site_model.order)}x{tuple(site_model.seasonal_order)} — "
+            f"AIC {site_model.info.get('aic', float('nan')):.1f}, données jusqu'au {site_model.end}"
+        )
@@ -0,0 +1,61 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `data.preprocessing` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.preprocessing import get_season_from_date, is_vacances, is_rush_hour, is_night
+from data.calendar_features import add_calendar_features
+
+
+def make_dates(n_rows, seed=42):
+    # Dates horaires aléatoires couvrant la période du dataset (+ minutes pour tester les seuils 20:30)
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-08-01").value
+    end = pd.Timestamp("2025-10-07").value
+    values = rng.integers(start, end, n_rows) // (60 * 10**9) * (60 * 10**9)
+    return pd.DataFrame({"date_et_heure_de_comptage": pd.to_datetime(values)})
+
+
+def rowwise(df):
+    df = df.copy()
+    df['saison'] = df['date_et_heure_de_comptage'].apply(get_season_from_date)
+    df['vacances'] = df['date_et_heure_de_comptage'].apply(is_vacances)
+    df['heure_de_pointe'] = df['date_et_heure_de_comptage'].apply(is_rush_hour)
+    df['nuit'] = df.apply(is_night, axis=1)
+    return df
+
+
+def vectorized(df):
+    return add_calendar_features(df.copy())
+
+
+def timeit(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="Row counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions (best time is kept)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'rowwise (s)':>12} {'vectorized (s)':>15} {'speedup':>8}")
+    for n_rows in args.rows:
+        df = make_dates(n_rows)
+        t_ref, ref = timeit(rowwise, df, 1)
+        t_vec, out = timeit(vectorized, df, args.repeat)
+        pd.testing.assert_frame_equal(ref, out)
+        print(f"{n_rows:>10} {t_ref:>12.3f} {t_vec:>15.4f} {t_ref / t_vec:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
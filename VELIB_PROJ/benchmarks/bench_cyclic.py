@@ -0,0 +1,62 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `data.preprocessing` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.preprocessing import add_cyclic_features
+
+
+def make_calendar(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "jour": rng.integers(1, 32, n_rows),
+        "mois": rng.integers(1, 13, n_rows),
+        "heure": rng.integers(0, 24, n_rows),
+        "saison": rng.choice(np.array(["winter", "spring", "summer", "autumn"], dtype=object), n_rows),
+    })
+
+
+def rowwise_numpy(df):
+    # Version précédente : np.sin/np.cos sur chaque ligne, saison mappée deux fois
+    df['jour_sin'] = np.sin(2 * np.pi * df['jour'] / 7)
+    df['jour_cos'] = np.cos(2 * np.pi * df['jour'] / 7)
+    df['mois_sin'] = np.sin(2 * np.pi * df['mois'] / 12)
+    df['mois_cos'] = np.cos(2 * np.pi * df['mois'] / 12)
+    df['heure_sin'] = np.sin(2 * np.pi * df['heure'] / 24)
+    df['heure_cos'] = np.cos(2 * np.pi * df['heure'] / 24)
+    df["saison_sin"] = np.sin(2 * np.pi * df["saison"].map({'winter': 0, 'spring': 1, 'summer': 2, 'autumn': 3}) / 4)
+    df["saison_cos"] = np.cos(2 * np.pi * df["saison"].map({'winter': 0, 'spring': 1, 'summer': 2, 'autumn': 3}) / 4)
+    return df.drop(columns=["jour", "saison", "heure", "mois"])
+
+
+def timeit(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        data = df.copy()
+        t0 = time.perf_counter()
+        out = fn(data)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000], help="Row counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions (best time is kept)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'np.sin (s)':>11} {'lookup (s)':>11} {'speedup':>8} {'Mrows/s':>8}")
+    for n_rows in args.rows:
+        df = make_calendar(n_rows)
+        t_ref, ref = timeit(rowwise_numpy, df, args.repeat)
+        t_new, out = timeit(add_cyclic_features, df, args.repeat)
+        np.testing.assert_allclose(out.to_numpy(np.float64), ref.to_numpy(np.float64), atol=1e-7)
+        print(f"{n_rows:>10} {t_ref:>11.3f} {t_new:>11.3f} {t_ref / t_new:>7.1f}x {n_rows / t_new / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import train_final_model
+from data.preprocessing import SITE_COL
+from benchmarks.bench_model_io import make_features
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="History rows")
+    parser.add_argument("--new-rows", type=int, default=20_000, help="Rows appended for the incremental run")
+    parser.add_argument("--trees", type=int, default=50, help="n_estimators (kept small: the benchmark targets Dataset construction)")
+    args = parser.parse_args()
+
+    X, y = make_features(args.rows + args.new_rows)
+    numeric_cols = [c for c in X.columns if c != SITE_COL]
+    params = dict(n_estimators=args.trees, learning_rate=0.05, num_leaves=63, random_state=42, n_jobs=-1, verbose=-1)
+    history = (X.head(args.rows), y.head(args.rows))
+
+    tmp = Path(tempfile.mkdtemp(prefix="velib_dataset_cache_"))
+    try:
+        runs = [
+            ("no cache", history, None),
+            ("cache miss", history, tmp),
+            ("cache hit", history, tmp),
+            (f"append {args.new_rows}", (X, y), tmp),
+        ]
+        print(f"{'run':>14} {'status':>8} {'dataset (s)':>12} {'fit (s)':>8}")
+        preds = {}
+        for name, (X_run, y_run), cache in runs:
+            t0 = time.perf_counter()
+            pipeline, metrics = train_final_model(X_run, y_run, params, [SITE_COL], numeric_cols, test_size_ratio=0.01, dataset_cache=cache)
+            elapsed = time.perf_counter() - t0
+            training = metrics["training"]
+            print(f"{name:>14} {training.get('dataset_cache', '-'):>8} {training.get('dataset_seconds', float('nan')):>12.2f} {elapsed:>8.2f}")
+            preds[name] = pipeline.predict(X.head(1000))
+        # même Dataset binaire : modèle identique
+        np.testing.assert_array_equal(preds["cache hit"], preds["no cache"])
+        np.testing.assert_array_equal(preds["cache miss"], preds["no cache"])
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import time
+import numpy as np
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import flat_predictor, train_final_model
+from data.dtypes import downcast_features
+from data.preprocessing import SITE_COL
+from benchmarks.bench_model_io import make_features
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000, help="Training rows")
+    parser.add_argument("--trees", type=int, default=1200, help="n_estimators")
+    parser.add_argument("--leaves", type=int, default=63, help="num_leaves")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1_000, 10_000, 100_000, 1_000_000], help="Batch sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions for small batches (best time is kept)")
+    args = parser.parse_args()
+
+    # Types compacts comme en sortie de preprocess_data (float32, int8, uint32)
+    X, y = make_features(args.rows)
+    X = downcast_features(X, verbose=False)
+    params = dict(n_estimators=args.trees, learning_rate=0.03, num_leaves=args.leaves, min_child_samples=5,
+                  subsample=0.8, colsample_bytree=0.8, random_state=42, n_jobs=-1, verbose=-1)
+    pipeline, _ = train_final_model(X, y, params, [SITE_COL], [c for c in X.columns if c != SITE_COL])
+    flat = flat_predictor(pipeline)
+
+    X_big = X.sample(max(args.sizes), replace=True, random_state=0).reset_index(drop=True)
+    print(f"{'batch':>9} {'pipeline (ms)':>14} {'flat (ms)':>10} {'speedup':>8} {'flat rows/s':>12}")
+    for n in args.sizes:
+        batch = X_big.head(n)
+        repeat = max(1, min(args.repeat, 100_000 // n))
+        t_ref, ref = best_of(lambda: pipeline.predict(batch), repeat)
+        t_flat, out = best_of(lambda: flat.predict(batch), repeat)
+        np.testing.assert_array_equal(out, ref)
+        print(f"{n:>9} {t_ref * 1e3:>14.2f} {t_flat * 1e3:>10.2f} {t_ref / t_flat:>7.1f}x {n / t_flat:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import load_model
+from data.raw_store import read_raw_input
+from data.preprocessing import DATE_COL, SITE_COL, TARGET_COL
+from models.serve import ScoringService, _site_key
+from models.forecast import DirectForecaster, RecursiveForecaster
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def naive_loop(service, sites, start, horizon):
+    # Référence : une requête ScoringService par heure, prédictions réinjectées comme observations
+    state = service.state
+    service.state = state.copy()
+    try:
+        dates = pd.date_range(start, periods=horizon, freq="h")
+        preds = np.empty((len(sites), horizon))
+        for t, date in enumerate(dates):
+            for i, site in enumerate(sites):
+                preds[i, t] = service.predict([site], [date])[0]
+                service.observe([site], [date], preds[i, t:t + 1])
+        return preds
+    finally:
+        service.state = state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="artifacts/model", help="Trained model (artifact directory or legacy .pkl)")
+    parser.add_argument("--history", required=True, help="Raw CSV or Parquet store; its last --horizon hours are held out")
+    parser.add_argument("--horizon", type=int, default=48, help="Hours forecast")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions (best time is kept)")
+    args = parser.parse_args()
+
+    raw = read_raw_input(args.history)
+    dates = pd.to_datetime(raw[DATE_COL].astype(str), errors="coerce", utc=True).dt.tz_convert(None)
+    start = dates.max().floor("h") - pd.Timedelta(hours=args.horizon - 1)
+    past = raw[dates < start].reset_index(drop=True)
+
+    service = ScoringService(load_model(args.model), past)
+    sites = list(service.state.site_index)
+
+    # Vérité terrain : comptages des heures retenues, grille sites x heures
+    held = raw[dates >= start]
+    truth = (pd.DataFrame({"site": held[SITE_COL].map(_site_key), DATE_COL: dates[dates >= start], TARGET_COL: held[TARGET_COL]})
+             .pivot_table(index="site", columns=DATE_COL, values=TARGET_COL, aggfunc="sum")
+             .reindex(index=sites, columns=pd.date_range(start, periods=args.horizon, freq="h")))
+    truth = truth.to_numpy(dtype=np.float64)
+
+    t0 = time.perf_counter()
+    direct = DirectForecaster(service, horizon=args.horizon).fit(past)
+    t_fit = time.perf_counter() - t0
+
+    recursive = RecursiveForecaster(service)
+    results = {
+        "naive loop (1 predict per site-hour)": best_of(lambda: naive_loop(service, sites, start, args.horizon), 1),
+        "recursive, vectorized": best_of(lambda: recursive.forecast_array(sites, start, args.horizon), args.repeat),
+        "direct multi-horizon": best_of(lambda: direct.forecast_array(sites, start, args.horizon), args.repeat),
+    }
+
+    naive, vectorized = results["naive loop (1 predict per site-hour)"][1], results["recursive, vectorized"][1]
+    assert np.allclose(naive, vectorized, rtol=1e-9, atol=1e-9), np.abs(naive - vectorized).max()
+
+    print(f"{len(sites)} sites x {args.horizon} h from {start} (direct model trained in {t_fit:.1f}s)")
+    print(f"{'method':>38} {'latency':>10} {'MAE':>8} {'MAE 1-6h':>9} {'MAE last 6h':>12}")
+    known = ~np.isnan(truth)
+    for name, (elapsed, preds) in results.items():
+        err = np.abs(preds - truth)
+        print(f"{name:>38} {elapsed * 1e3:>8.1f}ms {err[known].mean():>8.2f} "
+              f"{np.nanmean(err[:, :6]):>9.2f} {np.nanmean(err[:, -6:]):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
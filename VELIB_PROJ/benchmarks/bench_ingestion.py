@@ -0,0 +1,60 @@
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.ingestion import fetch_velib_data, fetch_velib_data_parallel
+from data.replay import RecordsBackend, ReplayServer
+from data.weather_cache import WeatherStore
+
+
+def timed_run(server, fn):
+    requests0 = server.requests
+    t0 = time.perf_counter()
+    df = fn()
+    return time.perf_counter() - t0, server.requests - requests0, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion throughput against the local replay server (offline)")
+    parser.add_argument("--sites", type=int, default=20, help="Synthetic counting sites")
+    parser.add_argument("--days", type=int, default=14, help="Days fetched")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per response (typical API round trip)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="Thread counts for fetch_velib_data_parallel")
+    args = parser.parse_args()
+
+    start = pd.Timestamp("2024-09-01")
+    end = start + pd.Timedelta(days=args.days - 1)
+    records = RecordsBackend.synthetic(args.sites, 24 * (args.days + 1), f"{start:%Y-%m-%d}")
+
+    results = {}
+    with ReplayServer(records, latency=args.latency) as server, tempfile.TemporaryDirectory() as tmp:
+        print(f"{len(records):,} records on {server.url}, {args.latency * 1e3:.0f} ms per response")
+        results["fetch_velib_data (serial pages)"] = timed_run(
+            server, lambda: fetch_velib_data(f"{start:%Y/%m/%d}", f"{end:%Y/%m/%d}", sleep=0)
+        )
+        for workers in args.workers:
+            checkpoints = os.path.join(tmp, f"checkpoints_{workers}")
+            results[f"fetch_velib_data_parallel, {workers} workers"] = timed_run(
+                server, lambda: fetch_velib_data_parallel(
+                    f"{start:%Y/%m/%d}", f"{end:%Y/%m/%d}", checkpoint_dir=checkpoints, max_workers=workers, rate=1000
+                )
+            )
+
+        store = WeatherStore(os.path.join(tmp, "weather"))
+        hourly = ["temperature_2m", "precipitation", "wind_speed_10m"]
+        for label in ("weather store, cold", "weather store, warm"):
+            results[label] = timed_run(server, lambda: store.get(48.8575, 2.3514, f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}", hourly))
+
+    print(f"\n{'method':>40} {'seconds':>8} {'requests':>9} {'rows':>8} {'rows/s':>9}")
+    for name, (seconds, n_requests, df) in results.items():
+        print(f"{name:>40} {seconds:>8.2f} {n_requests:>9} {len(df):>8} {len(df) / seconds:>9,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import pickle
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import ModelArtifact, load_model, save_model, train_final_model
+from data.preprocessing import MODEL_FEATURES, SITE_COL
+
+
+def make_features(n_rows, n_sites=80, seed=42):
+    # Matrice au format MODEL_FEATURES (valeurs synthétiques), cible dépendant de l'heure et du site
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, len(MODEL_FEATURES.features))), columns=MODEL_FEATURES.features)
+    sites = rng.integers(0, n_sites, n_rows)
+    X[SITE_COL] = 100_000_000 + sites
+    X["hour"] = rng.integers(0, 24, n_rows)
+    y = pd.Series(50 + 30 * np.sin(np.pi * X["hour"] / 24) + sites + 5 * X["lag_1"] + rng.normal(size=n_rows))
+    return X, y
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def dir_size(path):
+    path = Path(path)
+    return sum(f.stat().st_size for f in path.rglob("*")) if path.is_dir() else path.stat().st_size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000, help="Training rows")
+    parser.add_argument("--trees", type=int, default=1200, help="n_estimators")
+    parser.add_argument("--leaves", type=int, default=63, help="num_leaves")
+    parser.add_argument("--predict-rows", type=int, default=1000, help="Rows scored after loading")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions (best time is kept)")
+    args = parser.parse_args()
+
+    X, y = make_features(args.rows)
+    params = dict(n_estimators=args.trees, learning_rate=0.03, num_leaves=args.leaves, min_child_samples=5,
+                  subsample=0.8, colsample_bytree=0.8, random_state=42, n_jobs=-1, verbose=-1)
+    t0 = time.perf_counter()
+    pipeline, _ = train_final_model(X, y, params, [SITE_COL], [c for c in X.columns if c != SITE_COL])
+    print(f"Trained {args.trees} trees x {args.leaves} leaves in {time.perf_counter() - t0:.1f}s")
+
+    tmp = Path(tempfile.mkdtemp(prefix="velib_model_io_"))
+    try:
+        pkl_path, art_path = tmp / "model.pkl", tmp / "model"
+        save_model(pipeline, pkl_path)
+        save_model(pipeline, art_path)
+        X_new = X.head(args.predict_rows)
+
+        def pickle_load():
+            with open(pkl_path, "rb") as f:
+                return pickle.load(f)
+
+        t_pkl, model_pkl = best_of(pickle_load, args.repeat)
+        t_art, _ = best_of(lambda: load_model(art_path), args.repeat)
+        model_art = load_model(art_path)
+        model_art.predict(X_new)
+        t_pkl_warm, _ = best_of(lambda: model_pkl.predict(X_new), args.repeat)
+        t_art_warm, _ = best_of(lambda: model_art.predict(X_new), args.repeat)
+        t_pkl_pred, ref = best_of(lambda: pickle_load().predict(X_new), args.repeat)
+        t_art_pred, out = best_of(lambda: ModelArtifact.load(art_path).predict(X_new), args.repeat)
+        np.testing.assert_array_equal(out, pipeline.predict(X_new))
+        np.testing.assert_array_equal(out, ref)
+
+        print(f"{'':>26} {'pickle':>10} {'artifact':>10}")
+        print(f"{'size on disk (MB)':>26} {dir_size(pkl_path) / 1e6:>10.2f} {dir_size(art_path) / 1e6:>10.2f}")
+        print(f"{'load (ms)':>26} {t_pkl * 1e3:>10.1f} {t_art * 1e3:>10.2f}")
+        print(f"{f'predict {args.predict_rows}, loaded (ms)':>26} {t_pkl_warm * 1e3:>10.1f} {t_art_warm * 1e3:>10.1f}")
+        print(f"{f'load + predict {args.predict_rows} (ms)':>26} {t_pkl_pred * 1e3:>10.1f} {t_art_pred * 1e3:>10.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import fit_sites_sarimax, site_series, train_sarimax
+
+
+def make_counts(n_sites, days, seed=42):
+    # Comptages horaires synthétiques : profil journalier commun, amplitude qui varie doucement avec la position
+    rng = np.random.default_rng(seed)
+    lat, lon = 48.82 + 0.08 * rng.random(n_sites), 2.25 + 0.17 * rng.random(n_sites)
+    dates = pd.date_range("2025-03-01", periods=days * 24, freq="h", tz="UTC")
+    hour = dates.hour.to_numpy()
+    profile = np.exp(-((hour - 8) ** 2) / 4) + 0.8 * np.exp(-((hour - 18) ** 2) / 6)
+    frames = []
+    for i in range(n_sites):
+        level = 20 + 200 * (lat[i] - 48.82) + 100 * (lon[i] - 2.25)
+        y = level * (0.3 + profile) + np.cumsum(rng.normal(size=len(dates))) * 0.3 + rng.normal(size=len(dates)) * 3
+        frames.append(pd.DataFrame({
+            "identifiant_du_site_de_comptage": 100_000_000 + i,
+            "date_et_heure_de_comptage": dates.astype(str),
+            "comptage_horaire": np.clip(y, 0, None).round(),
+            "coordonnées_géographiques": f"{lat[i]:.5f},{lon[i]:.5f}",
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=100, help="Counting sites")
+    parser.add_argument("--days", type=int, default=28, help="Days of hourly history")
+    parser.add_argument("--serial-sites", type=int, default=3, help="Sites fitted with train_sarimax (serial time is extrapolated)")
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--extend-hours", type=int, default=24, help="New observations filtered by extend()")
+    args = parser.parse_args()
+
+    df = make_counts(args.sites, args.days + args.extend_hours // 24 + 1)
+    full = site_series(df, history_days=None)
+    # les extend_hours dernières heures sont retenues pour extend()
+    end = full.index[-1 - args.extend_hours]
+    fit_df = df[pd.to_datetime(df["date_et_heure_de_comptage"], utc=True).dt.tz_convert(None) <= end]
+    series = site_series(fit_df, history_days=args.days)
+
+    t0 = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for site in series.columns[: args.serial_sites]:
+            train_sarimax(series[site].to_numpy())
+    t_serial = (time.perf_counter() - t0) / args.serial_sites * args.sites
+
+    results = {}
+    for name, n_seeds in [("cold", args.sites), ("warm", None)]:
+        t0 = time.perf_counter()
+        models = fit_sites_sarimax(fit_df, history_days=args.days, n_seeds=n_seeds, max_workers=args.max_workers)
+        results[name] = (time.perf_counter() - t0, models)
+
+    print(f"{args.sites} sites x {args.days} days of hourly counts")
+    print(f"{'train_sarimax, serial (extrapolated)':>40} {t_serial:>8.1f}s")
+    for name, (elapsed, models) in results.items():
+        iters = np.mean([m.info["iterations"] for m in models.values()])
+        print(f"{f'fit_sites_sarimax, {name} start':>40} {elapsed:>8.1f}s  {iters:5.1f} iterations/site  {t_serial / elapsed:5.1f}x")
+
+    models = results["warm"][1]
+    new = full[full.index > end]
+    t0 = time.perf_counter()
+    for site, model in models.items():
+        model.extend(new[site].to_numpy())
+    t_extend = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for model in models.values():
+        model.forecast(24)
+    t_forecast = time.perf_counter() - t0
+    print(f"{f'extend {args.extend_hours}h, all sites':>40} {t_extend:>8.2f}s")
+    print(f"{'forecast 24h, all sites':>40} {t_forecast:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import flat_predictor, preprocess_data, train_final_model
+from data import weather_cache
+from data.preprocessing import TARGET_COL, VELIB_FEATURES
+from data.profiling import get_tracer, peak_memory_mb
+from data.raw_store import convert_csv_to_parquet, read_raw_input
+from data.synthetic import make_raw_counts, synthetic_weather
+from models.predict import predict_chunked
+
+
+MODEL_PARAMS = dict(n_estimators=200, learning_rate=0.05, num_leaves=63, subsample=0.8, colsample_bytree=0.8, random_state=42, n_jobs=-1, verbose=-1)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def block_network():
+    # Garde-fou : toute connexion sortante échoue, la suite ne dépend que des données locales
+    def refuse(self, address):
+        raise OSError(f"network disabled during benchmarks ({address})")
+    socket.socket.connect = refuse
+
+
+def git_revision(root: Path):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "nogit", False
+    return commit, dirty
+
+
+def environment() -> dict:
+    import lightgbm, pandas, pyarrow, sklearn
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "versions": {m.__name__: m.__version__ for m in (np, pandas, pyarrow, sklearn, lightgbm)},
+    }
+
+
+def feature_breakdown(report: dict) -> dict:
+    # self time de chaque transform du registre, sous preprocess_data
+    return {
+        s["stage"].rsplit("features:", 1)[1]: round(s["seconds"], 6)
+        for s in report["stages"] if "/features:" in s["stage"]
+    }
+
+
+def bench_scale(n_sites: int, n_hours: int, repeat: int, workdir: str, seed: int) -> dict:
+    """Time every stage of the pipeline on ``n_sites`` x ``n_hours`` synthetic rows (best of ``repeat``)."""
+    tracer = get_tracer()
+    csv = os.path.join(workdir, f"raw_{n_sites}x{n_hours}.csv")
+    store = os.path.join(workdir, f"store_{n_sites}x{n_hours}")
+    stages = {}
+
+    t0 = time.perf_counter()
+    make_raw_counts(n_sites, n_hours, seed=seed).to_csv(csv, index=False, sep=";")
+    generate_seconds = time.perf_counter() - t0
+
+    stages["read_raw_csv"], _ = best_of(lambda: read_raw_input(csv), repeat)
+    stages["convert_raw_store"], _ = best_of(lambda: convert_csv_to_parquet(csv, store, force=True), repeat)
+    # la suite part du store, comme les cibles du Makefile (dates typées en UTC naïf)
+    stages["read_raw_store"], raw = best_of(lambda: read_raw_input(store), repeat)
+
+    # passage non chronométré : remplit le cache météo local (état d'un poste déjà utilisé)
+    preprocess_data(raw)
+    features_seconds, best = {}, float("inf")
+    for _ in range(repeat):
+        tracer.reset()
+        t0 = time.perf_counter()
+        df_encoded, features = preprocess_data(raw)
+        seconds = time.perf_counter() - t0
+        if seconds < best:
+            best, features_seconds = seconds, feature_breakdown(tracer.report())
+    stages["preprocess_data"] = best
+    stages["velib_features"], _ = best_of(lambda: VELIB_FEATURES.transform(raw), repeat)
+
+    X, y = df_encoded[features], df_encoded[TARGET_COL]
+    target_cols = ["identifiant_du_site_de_comptage"]
+    numeric_cols = [c for c in features if c not in target_cols]
+    stages["train_final_model"], (pipeline, metrics) = best_of(
+        lambda: train_final_model(X, y, dict(MODEL_PARAMS), target_cols, numeric_cols, valid_ratio=0.0), repeat
+    )
+
+    flat = flat_predictor(pipeline)
+    stages["predict_pipeline"], _ = best_of(lambda: pipeline.predict(X), repeat)
+    stages["predict_flat"], _ = best_of(lambda: flat.predict(X), repeat)
+    one_row = X.iloc[:1]
+    latencies = [best_of(lambda: flat.predict(one_row), 1)[0] for _ in range(200)]
+    stages["predict_flat_1row_p50"] = float(np.median(latencies))
+    out = os.path.join(workdir, "predictions.parquet")
+    stages["predict_chunked"], _ = best_of(lambda: predict_chunked(pipeline, store, out, chunk_rows=max(len(raw) // 4, 1)), repeat)
+
+    return {
+        "sites": n_sites,
+        "hours": n_hours,
+        "rows": int(len(raw)),
+        "generate_seconds": round(generate_seconds, 6),
+        "stages": {k: round(v, 6) for k, v in stages.items()},
+        "features": features_seconds,
+        "metrics": {k: metrics[k] for k in ("MAE", "RMSE", "R2")},
+        "trees": metrics["training"]["trees_built"],
+    }
+
+
+def load_results(ref: str, out_dir: str) -> dict:
+    """Results of ``ref``: a JSON path, or a commit (prefix) saved in ``out_dir``."""
+    if os.path.isfile(ref):
+        path = ref
+    else:
+        matches = sorted(glob.glob(os.path.join(out_dir, f"{ref}*.json")))
+        if not matches:
+            raise FileNotFoundError(f"No benchmark results for {ref!r} in {out_dir}")
+        path = matches[0]
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_comparison(current: dict, reference: dict) -> None:
+    print(f"\nComparison with {reference['commit']}{' (dirty)' if reference.get('dirty') else ''}  (ratio < 1: faster now)")
+    print(f"{'scale':>10} {'stage':>24} {'ref s':>10} {'now s':>10} {'ratio':>7}")
+    for scale, res in current["scales"].items():
+        ref = reference["scales"].get(scale)
+        if ref is None:
+            print(f"{scale:>10} {'(not in reference)':>24}")
+            continue
+        for name, seconds in res["stages"].items():
+            before = ref["stages"].get(name)
+            ratio = f"{seconds / before:.2f}" if before else "n/a"
+            before = f"{before:.4f}" if before is not None else "n/a"
+            print(f"{scale:>10} {name:>24} {before:>10} {seconds:>10.4f} {ratio:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of preprocessing, training and inference on synthetic counts")
+    parser.add_argument("--scales", nargs="+", default=["10x720", "40x2160"], help="Sizes as SITESxHOURS")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per stage (best time is kept)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic data")
+    parser.add_argument("--out-dir", default="artifacts/benchmarks", help="Results directory (one JSON per commit)")
+    parser.add_argument("--compare", default=None, help="Commit (prefix) or results JSON to compare with")
+    args = parser.parse_args()
+
+    block_network()
+    root = Path(__file__).resolve().parent.parent
+    commit, dirty = git_revision(root)
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "repeat": args.repeat,
+        "model_params": MODEL_PARAMS,
+        "scales": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # météo servie par le générateur local, via le cache disque habituel
+        weather_cache._default_store = weather_cache.WeatherStore(os.path.join(workdir, "weather"), fetcher=synthetic_weather)
+        for scale in args.scales:
+            n_sites, n_hours = (int(v) for v in scale.lower().split("x"))
+            print(f"== {scale}: {n_sites} sites x {n_hours} hours")
+            res = bench_scale(n_sites, n_hours, args.repeat, workdir, args.seed)
+            results["scales"][scale] = res
+            for name, seconds in res["stages"].items():
+                rows = 1 if name.endswith("1row_p50") else res["rows"]
+                print(f"{name:>24} {seconds * 1e3:>10.1f} ms  {rows / seconds:>12,.0f} rows/s")
+    results["peak_memory_mb"] = peak_memory_mb()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    out = os.path.join(args.out_dir, f"{commit}{'-dirty' if dirty else ''}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print("Results saved to:", out)
+
+    if args.compare:
+        print_comparison(results, load_results(args.compare, args.out_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `data.window_features` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.window_features import add_window_features
+
+
+SITE = "identifiant_du_site_de_comptage"
+DATE = "date_et_heure_de_comptage"
+TARGET = "comptage_horaire"
+
+
+def make_counts(n_sites, n_hours, seed=42):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-08-01", periods=n_hours, freq="h")
+    df = pd.DataFrame({
+        SITE: np.repeat(np.arange(100000000, 100000000 + n_sites), n_hours),
+        DATE: np.tile(dates, n_sites),
+        TARGET: rng.poisson(80, n_sites * n_hours).astype(float),
+    })
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def current_chain(df):
+    # Chaîne pandas actuelle de time_varying_features (la fenêtre glissante déborde entre sites)
+    df = df.sort_values([SITE, DATE])
+    df['lag_1'] = df.groupby(SITE)[TARGET].shift(1)
+    df['lag_24'] = df.groupby(SITE)[TARGET].shift(24)
+    df['rolling_mean_24'] = df.groupby(SITE)[TARGET].shift(1).rolling(24).mean()
+    return df
+
+
+def grouped_reference(df, windows, stats):
+    # Référence pandas correcte : fenêtres calculées site par site
+    df = df.sort_values([SITE, DATE], kind="stable")
+    shifted = df.groupby(SITE)[TARGET].shift(1)
+    for w in windows:
+        rolled = shifted.groupby(df[SITE]).rolling(w)
+        for stat in stats:
+            df[f"rolling_{stat}_{w}"] = getattr(rolled, stat)().reset_index(level=0, drop=True)
+    return df
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=100, help="Number of sites")
+    parser.add_argument("--hours", type=int, nargs="+", default=[24 * 30, 24 * 365], help="Hours per site")
+    parser.add_argument("--windows", type=int, nargs="+", default=[3, 24, 168], help="Rolling windows")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions (best time is kept)")
+    args = parser.parse_args()
+
+    stats = ("mean", "std", "min", "max")
+    print(f"{'rows':>10} {'current (s)':>12} {'kernel 1x24 (s)':>16} {'grouped pandas (s)':>19} {'kernel all (s)':>15}")
+    for n_hours in args.hours:
+        df = make_counts(args.sites, n_hours)
+
+        t_cur, _ = timeit(lambda: current_chain(df.copy()), args.repeat)
+        t_k1, _ = timeit(lambda: add_window_features(df), args.repeat)
+        t_ref, ref = timeit(lambda: grouped_reference(df.copy(), args.windows, stats), 1)
+        t_all, out = timeit(lambda: add_window_features(df, windows=args.windows, stats=stats), args.repeat)
+
+        for col in [c for c in ref.columns if c.startswith("rolling_")]:
+            np.testing.assert_allclose(out[col].to_numpy(), ref[col].to_numpy(), rtol=1e-7, atol=1e-5, equal_nan=True)
+
+        print(f"{len(df):>10} {t_cur:>12.3f} {t_k1:>16.3f} {t_ref:>19.3f} {t_all:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from data.pipeline import FeatureSet
+from data.preprocessing import DATE_COL, FEATURES, TARGET_COL, clean_raw_data
+from data.profiling import stage
+from data.raw_store import DEFAULT_STORE_DIR, PARTITION_COLS, iter_raw_chunks, store_fingerprint
+
+
+# À incrémenter quand la définition d'un agrégat change : les anciens répertoires ne sont plus lus
+AGGREGATES_VERSION = 1
+DEFAULT_AGGREGATES_DIR = "artifacts/aggregates"
+
+GROUPS = ["heure", "pluie", "neige", "vent", "saison", "mois", "vacances", "heure_de_pointe"]
+CORR_COLS = [TARGET_COL, "nuit", "vacances", "heure_de_pointe", "pluie", "neige", "apparent_temperature", "vent"]
+
+# Colonnes des graphiques du dashboard (app.py), toutes calculées ligne à ligne
+AGGREGATE_FEATURES = FeatureSet(
+    'aggregates',
+    columns=[TARGET_COL, DATE_COL, 'heure', 'mois', 'saison', 'vacances', 'heure_de_pointe', 'nuit',
+             'apparent_temperature', 'pluie', 'vent', 'neige'],
+    passthrough=[TARGET_COL, DATE_COL],
+    registry=FEATURES,
+    clean=clean_raw_data,
+)
+
+
+class GroupStats:
+    """Count, sum and sum of squares of the target per group value, mergeable across chunks."""
+
+    def __init__(self):
+        self.stats: Optional[pd.DataFrame] = None
+
+    def update(self, keys: pd.Series, values: pd.Series) -> None:
+        values = values.astype(np.float64)
+        chunk = (
+            pd.DataFrame({"key": keys.to_numpy(), "v": values.to_numpy(), "v2": values.to_numpy() ** 2})
+            .groupby("key", observed=True)
+            .agg(count=("v", "size"), sum=("v", "sum"), sum_sq=("v2", "sum"))
+        )
+        self.stats = chunk if self.stats is None else self.stats.add(chunk, fill_value=0)
+
+    def table(self) -> pd.DataFrame:
+        """``key, count, mean, std`` (sample std) sorted by key."""
+        if self.stats is None:
+            return pd.DataFrame(columns=["key", "count", "mean", "std"])
+        s = self.stats.sort_index()
+        mean = s["sum"] / s["count"]
+        var = (s["sum_sq"] - s["count"] * mean ** 2) / (s["count"] - 1)
+        return pd.DataFrame({
+            "key": s.index.to_numpy(),
+            "count": s["count"].to_numpy(dtype=np.int64),
+            "mean": mean.to_numpy(),
+            "std": np.sqrt(var.clip(lower=0)).to_numpy(),
+        })
+
+
+class CorrStats:
+    """Pearson correlation matrix from running sums (rows with a missing value are skipped)."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.sum = np.zeros(k)
+        self.cross = np.zeros((k, k))
+
+    def update(self, df: pd.DataFrame) -> None:
+        x = df[self.columns].astype(np.float64).dropna().to_numpy()
+        if not len(x):
+            return
+        # centré sur la moyenne du chunk avant le produit croisé, puis recombiné (stabilité numérique)
+        m = x.mean(axis=0)
+        d = x - m
+        n = len(x)
+        if self.n:
+            delta = m - self.sum / self.n
+            self.cross += d.T @ d + np.outer(delta, delta) * self.n * n / (self.n + n)
+        else:
+            self.cross = d.T @ d
+        self.sum += x.sum(axis=0)
+        self.n += n
+
+    def matrix(self) -> pd.DataFrame:
+        std = np.sqrt(np.diag(self.cross))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.cross / np.outer(std, std)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def aggregates_version(store_dir: str = DEFAULT_STORE_DIR) -> str:
+    """Key of the aggregates of a store: its fingerprint plus ``AGGREGATES_VERSION`` (no data is read)."""
+    payload = f"{AGGREGATES_VERSION}:{store_fingerprint(store_dir)}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def compute_aggregates(store_dir: str = DEFAULT_STORE_DIR, chunk_rows: int = 500_000) -> Dict[str, pd.DataFrame]:
+    """
+    Dashboard aggregates of a raw Parquet store, in one streaming pass.
+
+    Each chunk goes through ``AGGREGATE_FEATURES`` (cleaning, calendar and
+    weather flags) and only updates running sums, so memory is one chunk
+    whatever the size of the archive. Returns small frames: one
+    ``key, count, mean, std`` table of ``comptage_horaire`` per column of
+    ``GROUPS``, ``temperature`` (apparent temperature rounded to 1 °C),
+    ``corr`` (correlation matrix of ``CORR_COLS``) and ``preview`` (first
+    raw rows).
+    """
+    groups = {g: GroupStats() for g in GROUPS + ["temperature"]}
+    corr = CorrStats(CORR_COLS)
+    rows = 0
+    with stage("compute_aggregates") as s:
+        for raw in iter_raw_chunks(store_dir, chunk_rows, columns=AGGREGATE_FEATURES.raw_columns):
+            df, _ = AGGREGATE_FEATURES.transform(raw)
+            if df.empty:
+                continue
+            for g in GROUPS:
+                groups[g].update(df[g], df[TARGET_COL])
+            temperature = df["apparent_temperature"].round() + 0.0  # -0.0 -> 0.0
+            known = temperature.notna()
+            groups["temperature"].update(temperature[known], df.loc[known, TARGET_COL])
+            corr.update(df)
+            rows += len(df)
+        s.rows = rows
+
+    aggregates = {name: acc.table() for name, acc in groups.items()}
+    aggregates["corr"] = corr.matrix()
+    dataset = ds.dataset(store_dir, format="parquet", partitioning="hive", exclude_invalid_files=True)
+    preview = dataset.head(5, columns=[c for c in dataset.schema.names if c not in PARTITION_COLS]).to_pandas()
+    aggregates["preview"] = preview
+    return aggregates
+
+
+def save_aggregates(aggregates: Dict[str, pd.DataFrame], directory: str, meta: dict) -> None:
+    # Écriture dans un répertoire temporaire puis renommage : un répertoire présent est complet
+    directory = Path(directory)
+    tmp = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, df in aggregates.items():
+        df.to_parquet(tmp / f"{name}.parquet", index=name == "corr")
+    with open(tmp / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({**meta, "tables": sorted(aggregates)}, f, indent=2)
+    if directory.exists():
+        shutil.rmtree(directory)
+    os.replace(tmp, directory)
+
+
+def read_aggregates(directory: str) -> Dict[str, pd.DataFrame]:
+    directory = Path(directory)
+    with open(directory / "manifest.json", "r", encoding="utf-8") as f:
+        tables = json.load(f)["tables"]
+    return {name: pd.read_parquet(directory / f"{name}.parquet") for name in tables}
+
+
+def load_aggregates(
+    store_dir: str = DEFAULT_STORE_DIR,
+    cache_dir: str = DEFAULT_AGGREGATES_DIR,
+    version: Optional[str] = None,
+) -> Tuple[str, Dict[str, pd.DataFrame]]:
+    """
+    ``(version, aggregates)`` of a store, computed once per data version.
+
+    Aggregates live in ``cache_dir/<version>``, where the version hashes the
+    store manifest (``aggregates_version``): a new export gets new
+    aggregates, and an unchanged one is read back in constant time.
+    Directories of older versions are removed after a recompute.
+    """
+    version = version or aggregates_version(store_dir)
+    directory = Path(cache_dir) / version
+    if (directory / "manifest.json").exists():
+        return version, read_aggregates(directory)
+
+    t0 = time.perf_counter()
+    aggregates = compute_aggregates(store_dir)
+    meta = {
+        "version": version,
+        "store": str(Path(store_dir).resolve()),
+        "rows": int(aggregates["heure"]["count"].sum()),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    save_aggregates(aggregates, directory, meta)
+    for old in Path(cache_dir).iterdir():
+        if old.is_dir() and old.name != version and not old.name.endswith(".tmp"):
+            shutil.rmtree(old, ignore_errors=True)
+    print(f"Dashboard aggregates computed for {meta['rows']:,} rows in {meta['seconds']:.1f}s:", directory)
+    return version, aggregates
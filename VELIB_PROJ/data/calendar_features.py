@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+
+# Saisons codées 0..3 (même ordre que l'encodage cyclique de add_cyclic_features)
+SEASON_NAMES = np.array(['winter', 'spring', 'summer', 'autumn'], dtype=object)
+
+# Heures de nuit approximatives par saison (format 24h, heures fractionnaires)
+NIGHT_HOURS = {
+    'winter': {'start': 17, 'end': 8},
+    'spring': {'start': 20.5, 'end': 6},   # 20:30
+    'summer': {'start': 22, 'end': 5},
+    'autumn': {'start': 19, 'end': 7},
+}
+
+# Périodes de vacances scolaires [début, fin)
+VACANCES_PERIODS = [
+    ('2024-10-19', '2024-11-05'),  # Toussaint
+    ('2024-12-21', '2025-01-07'),  # Noël
+    ('2025-02-15', '2025-03-04'),  # Hiver
+    ('2025-04-12', '2025-04-29'),  # Printemps
+    ('2025-05-29', '2025-06-01'),  # Ascension + pont (29, 30, 31)
+    ('2025-07-05', '2025-09-02'),  # Summer begins 5 July to 1 Sept
+]
+
+
+def _build_season_table():
+    # Table [mois, jour] -> code saison, bornes identiques à get_season_from_date
+    table = np.zeros((13, 32), dtype=np.int8)
+    for month in range(1, 13):
+        for day in range(1, 32):
+            md = month * 100 + day
+            if 320 <= md < 621:
+                table[month, day] = 1
+            elif 621 <= md < 922:
+                table[month, day] = 2
+            elif 922 <= md < 1221:
+                table[month, day] = 3
+    return table
+
+
+SEASON_TABLE = _build_season_table()
+
+_NIGHT_START = np.array([NIGHT_HOURS[s]['start'] for s in SEASON_NAMES], dtype=np.float64)
+_NIGHT_END = np.array([NIGHT_HOURS[s]['end'] for s in SEASON_NAMES], dtype=np.float64)
+
+_VACANCES_START = np.array([pd.Timestamp(s).to_datetime64() for s, _ in VACANCES_PERIODS], dtype='datetime64[ns]')
+_VACANCES_END = np.array([pd.Timestamp(e).to_datetime64() for _, e in VACANCES_PERIODS], dtype='datetime64[ns]')
+_VACANCES_ORDER = np.argsort(_VACANCES_START)
+_VACANCES_START = _VACANCES_START[_VACANCES_ORDER]
+_VACANCES_END = _VACANCES_END[_VACANCES_ORDER]
+
+
+def _to_utc_datetime64(dates):
+    # Les dates naïves sont supposées UTC (comme get_season_from_date)
+    dates = pd.Series(dates)
+    if isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    return dates.to_numpy(dtype='datetime64[ns]')
+
+
+def calendar_codes(dates):
+    """
+    Compute the raw calendar arrays for a datetime column in one pass.
+
+    Parameters
+    ----------
+    dates : array-like of datetime64
+        Naive timestamps are interpreted as UTC.
+
+    Returns
+    -------
+    dict of np.ndarray
+        ``saison`` (int8 code into SEASON_NAMES), ``vacances``,
+        ``heure_de_pointe`` and ``nuit`` (bool).
+    """
+    values = _to_utc_datetime64(dates)
+
+    days = values.astype('datetime64[D]')
+    months = values.astype('datetime64[M]')
+    month = (months.astype(np.int64) % 12 + 1).astype(np.intp)
+    day = ((days - months.astype('datetime64[D]')).astype(np.int64) + 1).astype(np.intp)
+    minutes = (values - days).astype('timedelta64[m]').astype(np.int64)
+    hour = minutes // 60
+
+    # Saison : table de correspondance (mois, jour)
+    season = SEASON_TABLE[month, day]
+
+    # Vacances : recherche dichotomique dans les intervalles triés
+    idx = np.searchsorted(_VACANCES_START, values, side='right') - 1
+    vacances = (idx >= 0) & (values < _VACANCES_END[np.maximum(idx, 0)])
+
+    # Heures de pointe
+    heure_de_pointe = ((hour >= 7) & (hour < 10)) | ((hour >= 17) & (hour < 20))
+
+    # Nuit : heure fractionnaire comparée aux seuils de la saison
+    frac_hour = hour + (minutes % 60) / 60
+    nuit = (frac_hour >= _NIGHT_START[season]) | (frac_hour < _NIGHT_END[season])
+
+    return {
+        'saison': season,
+        'vacances': vacances,
+        'heure_de_pointe': heure_de_pointe,
+        'nuit': nuit,
+    }
+
+
+def add_calendar_features(df, date_col='date_et_heure_de_comptage'):
+    """
+    Vectorized equivalent of the ``saison``/``vacances``/``heure_de_pointe``/``nuit``
+    columns built row by row with get_season_from_date, is_vacances, is_rush_hour and is_night.
+    """
+    codes = calendar_codes(df[date_col])
+    df['saison'] = pd.Series(SEASON_NAMES[codes['saison']], index=df.index)
+    df['vacances'] = codes['vacances']
+    df['heure_de_pointe'] = codes['heure_de_pointe']
+    df['nuit'] = codes['nuit']
+    return df
@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data.dtypes import FEATURE_DTYPES, downcast_features
+from data.feature_store import LagFeatureStore
+from data.raw_store import normalize_columns, sniff_separator
+from data.preprocessing import VELIB_FEATURES, clean_raw_data
+
+
+SITE_COL = "identifiant_du_site_de_comptage"
+DATE_COL = "date_et_heure_de_comptage"
+TARGET_COL = "comptage_horaire"
+
+
+class SiteStatsAccumulator:
+    """
+    Streaming per-site mean/std/max/min of ``comptage_horaire``.
+
+    Chunk statistics are merged with the parallel variance formula
+    (Chan et al.), so the result matches ``static_features`` on the full data.
+    """
+
+    def __init__(self):
+        self.stats = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        g = df.groupby(SITE_COL)[TARGET_COL]
+        chunk = pd.DataFrame({
+            "n": g.count().astype(np.float64),
+            "mean": g.mean(),
+            "m2": g.var(ddof=0) * g.count(),
+            "max": g.max(),
+            "min": g.min(),
+        })
+        if self.stats is None:
+            self.stats = chunk
+            return
+
+        a, b = self.stats.align(chunk, join="outer")
+        a = a.fillna({"n": 0, "mean": 0, "m2": 0})
+        b = b.fillna({"n": 0, "mean": 0, "m2": 0})
+        n = a["n"] + b["n"]
+        delta = b["mean"] - a["mean"]
+        self.stats = pd.DataFrame({
+            "n": n,
+            "mean": a["mean"] + delta * b["n"] / n,
+            "m2": a["m2"] + b["m2"] + delta ** 2 * a["n"] * b["n"] / n,
+            "max": np.fmax(a["max"], b["max"]),
+            "min": np.fmin(a["min"], b["min"]),
+        })
+
+    def result(self) -> pd.DataFrame:
+        """Same columns as static_features: site_mean_usage, site_usage_variability, site_max_usage, site_min_usage."""
+        s = self.stats
+        std = np.sqrt(s["m2"] / (s["n"] - 1)).where(s["n"] > 1)
+        out = pd.DataFrame({
+            "site_mean_usage": s["mean"],
+            "site_usage_variability": std,
+            "site_max_usage": s["max"],
+            "site_min_usage": s["min"],
+        })
+        out.index.name = SITE_COL
+        return out
+
+
+def _spill_by_month(csv_path: str, spill_dir: Path, chunksize: int, sep: str) -> SiteStatsAccumulator:
+    # Passe 1 : nettoyage par chunk, partition mensuelle sur disque, statistiques par site
+    stats = SiteStatsAccumulator()
+    for i, chunk in enumerate(pd.read_csv(csv_path, sep=sep, chunksize=chunksize)):
+        chunk = clean_raw_data(normalize_columns(chunk))
+        if chunk.empty:
+            continue
+        # Seules les colonnes brutes lues par le plan de features sont conservées
+        chunk = chunk[VELIB_FEATURES.raw_columns]
+        # Type stable d'un chunk à l'autre (int64 sans NaN, float64 sinon)
+        chunk[TARGET_COL] = chunk[TARGET_COL].astype(np.float64)
+        stats.update(chunk)
+        month = chunk[DATE_COL].dt.strftime("%Y-%m")
+        for key, part in chunk.groupby(month, sort=False):
+            part_dir = spill_dir / f"month={key}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            part.to_parquet(part_dir / f"part-{i:05d}.parquet", index=False)
+        print(f"Chunk {i}: {len(chunk)} rows")
+    return stats
+
+
+def preprocess_csv_chunked(
+    csv_path: str,
+    out_path: str,
+    chunksize: int = 200_000,
+    sep: Optional[str] = None,
+    tmp_dir: Optional[str] = None,
+) -> List[str]:
+    """
+    Bounded-memory equivalent of ``preprocess_data`` for CSVs larger than memory.
+
+    Pass 1 reads the CSV in chunks, cleans them, accumulates the per-site
+    statistics and spills the slim rows to a month-partitioned Parquet area.
+    Pass 2 walks the months in chronological order: time and weather features,
+    site statistics, lag features carried across months by a LagFeatureStore,
+    cyclic encoding, then appends the month to ``out_path`` (Parquet). Peak
+    memory is one CSV chunk or one month of rows, whatever the history length.
+
+    Parameters
+    ----------
+    csv_path : str
+        Raw CSV export (``;`` or ``,`` separated).
+    out_path : str
+        Output Parquet file with the encoded features.
+    chunksize : int
+        CSV rows per chunk in pass 1.
+    sep : str, optional
+        CSV separator, sniffed from the header if None.
+    tmp_dir : str, optional
+        Where to create the spill area (system temp dir by default).
+
+    Returns
+    -------
+    list of str
+        Feature columns, as returned by preprocess_data.
+    """
+    print('Chunked preprocessing has started.')
+    sep = sep or sniff_separator(csv_path)
+    spill_dir = Path(tempfile.mkdtemp(prefix="velib_spill_", dir=tmp_dir))
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    writer = None
+    features: List[str] = []
+    try:
+        site_stats = _spill_by_month(csv_path, spill_dir, chunksize, sep).result()
+        lag_store = LagFeatureStore()
+
+        for month_dir in sorted(spill_dir.glob("month=*")):
+            # Même plan que preprocess_data ; statistiques par site de la passe 1, lags portés d'un mois à l'autre
+            df, features = VELIB_FEATURES.transform(
+                pd.read_parquet(month_dir),
+                clean=False,
+                overrides={
+                    "site_stats": lambda d: d.merge(site_stats, on=SITE_COL, how='left'),
+                    "lags": lag_store.update,
+                },
+                finalize=False,
+            )
+            # Même plan de types que preprocess_data, comptages en float32 pour un schéma stable entre mois
+            df = downcast_features(df, schema={**FEATURE_DTYPES, TARGET_COL: "float32"}, verbose=False)
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out_path, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            print(f"{month_dir.name.split('=')[1]}: {len(df)} rows written")
+    finally:
+        if writer is not None:
+            writer.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    return features
@@ -0,0 +1,69 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class CyclicEncoder:
+    """
+    Sin/cos encoding of small integer features by table lookup.
+
+    For each feature the tables hold ``sin(2*pi*k/period)`` and
+    ``cos(2*pi*k/period)`` for every admissible value ``k`` (computed once in
+    float64 with the same formula as the row-wise version, stored in float32).
+    ``encode`` then fills a preallocated float32 block by integer gather, with
+    no temporary float64 arrays. Values outside the table give NaN.
+
+    Parameters
+    ----------
+    specs : dict
+        ``{column: (output_prefix, period, n_values)}``; ``n_values`` is the table
+        size, e.g. 32 for a day of month encoded with a weekly period.
+    """
+
+    def __init__(self, specs: Dict[str, Tuple[str, int, int]]):
+        self.specs = specs
+        self.tables = {}
+        for col, (_, period, n_values) in specs.items():
+            angles = 2 * np.pi * np.arange(n_values) / period
+            # ligne 0 : sin, ligne 1 : cos, dernière colonne : NaN pour les valeurs hors table
+            table = np.full((2, n_values + 1), np.nan, dtype=np.float32)
+            table[0, :n_values] = np.sin(angles)
+            table[1, :n_values] = np.cos(angles)
+            self.tables[col] = table
+
+    @property
+    def output_columns(self) -> List[str]:
+        return [f"{prefix}_{fn}" for prefix, _, _ in self.specs.values() for fn in ("sin", "cos")]
+
+    def encode(self, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        """Float32 block (n_rows, 2 * n_features), columns in ``output_columns`` order."""
+        n = len(next(iter(codes.values())))
+        block = np.empty((n, 2 * len(self.specs)), dtype=np.float32, order="F")
+        for j, (col, (_, _, n_values)) in enumerate(self.specs.items()):
+            idx = np.asarray(codes[col])
+            idx = np.where((idx >= 0) & (idx < n_values), idx, n_values).astype(np.intp, copy=False)
+            table = self.tables[col]
+            np.take(table[0], idx, out=block[:, 2 * j])
+            np.take(table[1], idx, out=block[:, 2 * j + 1])
+        return block
+
+    def add_to_frame(self, df: pd.DataFrame, codes: Dict[str, np.ndarray], drop: List[str] = ()) -> pd.DataFrame:
+        """Append the encoded columns to ``df`` (after dropping ``drop``) as one float32 block."""
+        encoded = pd.DataFrame(self.encode(codes), columns=self.output_columns, index=df.index, copy=False)
+        return pd.concat([df.drop(columns=list(drop)), encoded], axis=1)
+
+
+# data/preprocessing.py : jour (jour du mois, période 7), mois, heure, saison
+VELIB_CYCLIC = CyclicEncoder({
+    "jour": ("jour", 7, 32),
+    "mois": ("mois", 12, 13),
+    "heure": ("heure", 24, 24),
+    "saison": ("saison", 4, 4),
+})
+
+# my_utils.preprocess_data : hour, month
+UTILS_CYCLIC = CyclicEncoder({
+    "hour": ("hour", 24, 24),
+    "month": ("month", 12, 13),
+})
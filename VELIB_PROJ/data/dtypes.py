@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+
+SITE_COL = "identifiant_du_site_de_comptage"
+TARGET_COL = "comptage_horaire"
+
+# Plan de types du frame encodé (les deux versions de preprocess_data).
+# Les colonnes absentes sont ignorées ; les autres float64 passent en float32.
+# "site_id" : identifiants numériques en entier non signé compact, catégorie sinon.
+# Un dtype category ferait basculer TargetEncoder (qui n'encode que les colonnes
+# object/category) et changerait le modèle ; les catégories du store Parquet
+# sont donc ramenées aux mêmes entiers que la lecture CSV.
+FEATURE_DTYPES = {
+    SITE_COL: "site_id",
+    TARGET_COL: "uint16",
+    # data/preprocessing.py
+    "vacances": "bool",
+    "heure_de_pointe": "bool",
+    "nuit": "bool",
+    "pluie": "bool",
+    "vent": "bool",
+    "neige": "bool",
+    # my_utils.preprocess_data
+    "hour": "int8",
+    "day": "int8",
+    "month": "int8",
+    "weekday": "int8",
+    "season": "int8",
+    "year": "int16",
+    "is_rush_hour": "int8",
+    "is_night": "int8",
+    "is_weekend": "int8",
+    "is_holiday": "int8",
+}
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def _fits(series: pd.Series, dtype: str) -> bool:
+    # Conversion entière sans perte : pas de NaN, valeurs entières dans les bornes du type
+    if series.isna().any():
+        return False
+    values = series.to_numpy()
+    if values.dtype.kind == "f" and not np.array_equal(values, np.round(values)):
+        return False
+    info = np.iinfo(dtype)
+    return len(values) == 0 or (values.min() >= info.min and values.max() <= info.max)
+
+
+def _site_ids(series: pd.Series) -> pd.Series:
+    numeric = pd.to_numeric(series.astype("string"), errors="coerce")
+    if numeric.notna().all() and _fits(numeric, "uint32"):
+        return numeric.astype(np.uint32)
+    return series.astype("category")
+
+
+def downcast_features(df: pd.DataFrame, schema: dict = None, verbose: bool = True) -> pd.DataFrame:
+    """
+    Apply the compact dtype plan to an encoded feature frame.
+
+    Columns listed in ``schema`` (``FEATURE_DTYPES`` by default) get their
+    declared type: compact site ids, bool/int8 flags and calendar fields,
+    uint16 counts. Integer targets are only narrowed when every value fits
+    (otherwise float32). Every other float64 column becomes float32.
+
+    Returns
+    -------
+    pd.DataFrame
+        A new frame; the memory before/after is printed when ``verbose``.
+    """
+    schema = FEATURE_DTYPES if schema is None else schema
+    before = memory_mb(df) if verbose else None
+
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        target = schema.get(col)
+        if target is None:
+            if series.dtype == np.float64:
+                converted[col] = series.astype(np.float32)
+            continue
+        if target == "site_id":
+            converted[col] = _site_ids(series)
+        elif target in ("category", "bool"):
+            if target == "bool" and series.isna().any():
+                continue
+            converted[col] = series.astype(target)
+        elif np.dtype(target).kind in "iu":
+            if _fits(series, target):
+                converted[col] = series.astype(target)
+            elif series.dtype == np.float64:
+                converted[col] = series.astype(np.float32)
+        else:
+            converted[col] = series.astype(target)
+
+    df = df.assign(**converted) if converted else df.copy()
+
+    if verbose:
+        print(f"Feature frame memory: {before:.1f} MB -> {memory_mb(df):.1f} MB")
+    return df
@@ -0,0 +1,169 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+SITE_COL = "identifiant_du_site_de_comptage"
+DATE_COL = "date_et_heure_de_comptage"
+TARGET_COL = "comptage_horaire"
+
+
+class LagFeatureStore:
+    """
+    Persistent per-site state for the ``lag_1``, ``lag_24`` and ``rolling_mean_24`` features.
+
+    For every site the last ``window`` hourly counts are kept in a float32 ring
+    buffer (one row per site). ``update`` computes the features of a new batch
+    from that state and then pushes the batch into the buffers, so the cost is
+    O(new rows) whatever the length of the history.
+
+    Lags are row-based per site, like ``groupby(site).shift(k)``: ``lag_1`` is the
+    previous count of the same site, ``lag_24`` the count 24 rows back and
+    ``rolling_mean_24`` the mean of the 24 previous counts (NaN until 24 are known).
+
+    Parameters
+    ----------
+    window : int
+        Number of past counts kept per site (must cover the largest lag and rolling window).
+    """
+
+    def __init__(self, window: int = 24):
+        if window < 24:
+            raise ValueError("window must be >= 24 to serve lag_24 and rolling_mean_24")
+        self.window = window
+        self.site_index = {}
+        self.buffer = np.full((0, window), np.nan, dtype=np.float32)
+        self.head = np.zeros(0, dtype=np.int32)          # prochain slot à écrire
+        self.last_time = np.zeros(0, dtype="datetime64[ns]")
+
+    def __len__(self):
+        return len(self.site_index)
+
+    # ------------------------------------------------------------------ state
+    def _site_rows(self, sites: np.ndarray) -> np.ndarray:
+        keys = sites.astype(str)
+        new_sites = [s for s in pd.unique(keys) if s not in self.site_index]
+        if new_sites:
+            start = len(self.site_index)
+            for i, s in enumerate(new_sites):
+                self.site_index[s] = start + i
+            n_new = len(new_sites)
+            self.buffer = np.vstack([self.buffer, np.full((n_new, self.window), np.nan, dtype=np.float32)])
+            self.head = np.concatenate([self.head, np.zeros(n_new, dtype=np.int32)])
+            self.last_time = np.concatenate([self.last_time, np.full(n_new, np.datetime64("NaT"), dtype="datetime64[ns]")])
+        return np.fromiter((self.site_index[s] for s in keys), dtype=np.int64, count=len(keys))
+
+    def history(self, site_rows: np.ndarray) -> np.ndarray:
+        """Last ``window`` counts of each site, oldest first (NaN where unknown)."""
+        cols = (self.head[site_rows, None] + np.arange(self.window)) % self.window
+        return self.buffer[site_rows[:, None], cols]
+
+    # ------------------------------------------------------------------ update
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add lag features to a new batch and append it to the state.
+
+        Rows not newer than the last timestamp already stored for their site
+        (overlapping fetch windows) are dropped.
+
+        Returns
+        -------
+        pd.DataFrame
+            The batch sorted by site and date with ``lag_1``, ``lag_24`` and ``rolling_mean_24``.
+        """
+        if not pd.api.types.is_datetime64_any_dtype(df[DATE_COL]):
+            # Dates brutes de l'API (ISO avec offset) -> UTC naïf, comme preprocess_data
+            df = df.assign(**{DATE_COL: pd.to_datetime(df[DATE_COL].astype(str), utc=True).dt.tz_convert(None)})
+        df = df.sort_values([SITE_COL, DATE_COL], kind="stable")
+        rows = self._site_rows(df[SITE_COL].to_numpy())
+        times = df[DATE_COL].to_numpy(dtype="datetime64[ns]")
+
+        last = self.last_time[rows]
+        fresh = np.isnat(last) | (times > last)
+        if not fresh.all():
+            df, rows, times = df[fresh], rows[fresh], times[fresh]
+
+        df = df.copy()
+        values = df[TARGET_COL].to_numpy(dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            for col in ("lag_1", "lag_24", "rolling_mean_24"):
+                df[col] = np.array([], dtype=np.float64)
+            return df
+
+        # Segments contigus par site dans le lot trié
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        seg_rows = rows[starts]
+        seg_len = np.diff(np.r_[starts, n])
+        rank = np.arange(n) - np.repeat(starts, seg_len)   # position dans le segment
+
+        # Tableau étendu : [historique (window valeurs), nouvelles valeurs] par site
+        w = self.window
+        ext_len = seg_len + w
+        ext_start = np.r_[0, np.cumsum(ext_len)[:-1]]
+        ext = np.empty(ext_len.sum(), dtype=np.float64)
+        hist_pos = (ext_start[:, None] + np.arange(w)).ravel()
+        ext[hist_pos] = self.history(seg_rows).ravel()
+        pos = np.repeat(ext_start, seg_len) + w + rank
+        ext[pos] = values
+
+        lag_1 = ext[pos - 1]
+        lag_24 = ext[pos - 24]
+
+        # Moyenne glissante par sommes cumulées ; NaN si une valeur manque dans la fenêtre
+        isnan = np.isnan(ext)
+        csum = np.r_[0.0, np.cumsum(np.where(isnan, 0.0, ext))]
+        cnan = np.r_[0, np.cumsum(isnan)]
+        rolling = (csum[pos] - csum[pos - 24]) / 24
+        rolling[(cnan[pos] - cnan[pos - 24]) > 0] = np.nan
+
+        df["lag_1"] = lag_1
+        df["lag_24"] = lag_24
+        df["rolling_mean_24"] = rolling
+
+        # Écriture dans les buffers circulaires (seules les `window` dernières valeurs comptent)
+        keep = rank >= np.repeat(seg_len, seg_len) - w
+        slots = (self.head[rows[keep]] + rank[keep]) % w
+        self.buffer[rows[keep], slots] = values[keep]
+        self.head[seg_rows] = (self.head[seg_rows] + seg_len) % w
+        self.last_time[seg_rows] = times[starts + seg_len - 1]
+
+        return df
+
+    # ------------------------------------------------------------------ I/O
+    def save(self, path: str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sites = np.array(sorted(self.site_index, key=self.site_index.get), dtype=str)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                window=np.array(self.window),
+                sites=sites,
+                buffer=self.buffer,
+                head=self.head,
+                last_time=self.last_time,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "LagFeatureStore":
+        with np.load(path) as data:
+            store = cls(window=int(data["window"]))
+            store.site_index = {s: i for i, s in enumerate(data["sites"].tolist())}
+            store.buffer = data["buffer"]
+            store.head = data["head"]
+            store.last_time = data["last_time"]
+        return store
+
+
+def update_lag_features(df: pd.DataFrame, state_path: str, window: int = 24) -> pd.DataFrame:
+    """
+    Compute lag features for a new batch (e.g. the output of fetch_velib_data)
+    from the persisted per-site state, then save the updated state.
+    """
+    state_path = Path(state_path)
+    store = LagFeatureStore.load(state_path) if state_path.exists() else LagFeatureStore(window=window)
+    out = store.update(df)
+    store.save(state_path)
+    return out
@@ -1,7 +1,14 @@
+import os
+import threading
 import time
 import requests
 import pandas as pd
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+from data.profiling import record_request, timed
+from data.sources import VELIB_URL, WEATHER_URL, get_data_source
 
 
 # VELIB_URL = "https://opendata.paris.fr/api/explore/v2.1/catalog/datasets/comptage-velo-donnees-compteurs/records"
@@ -58,8 +65,6 @@ from typing import List, Dict, Optional
 #     return df
 
 
-VELIB_URL = "https://opendata.paris.fr/api/explore/v2.1/catalog/datasets/comptage-velo-donnees-compteurs/records"
-
 col_map = {
     "id_compteur": "identifiant_du_compteur",
     "nom_compteur": "nom_du_compteur",
@@ -80,6 +85,7 @@ col_map = {
 }
 
 # Velib API expects: YYYY/MM/DD, not not ISO: YYYY-MM-DD
+@timed("fetch_velib_data")
 def fetch_velib_data(
     start_date: str,
     end_date: Optional[str] = None,
@@ -124,7 +130,8 @@ def fetch_velib_data(
             "offset": offset,
         }
 
-        response = requests.get(VELIB_URL, params=params, timeout=10)
+        response = requests.get(get_data_source().records_url, params=params, timeout=10)
+        record_request(response)
 
         if response.status_code != 200:
             raise RuntimeError(f"Velib API error {response.status_code}")
@@ -202,8 +209,7 @@ def fetch_velib_data(
 
 #     return df_weather
 
-WEATHER_URL = "https://archive-api.open-meteo.com/v1/archive"
-
+@timed("fetch_weather_data")
 def fetch_weather_data(
     start_date: str,
     end_date: Optional[str] = None,
@@ -239,7 +245,8 @@ def fetch_weather_data(
         "hourly": "rain,snowfall,apparent_temperature,wind_speed_10m",
     }
 
-    response = requests.get(WEATHER_URL, params=params, timeout=10)
+    response = requests.get(get_data_source().weather_url, params=params, timeout=10)
+    record_request(response)
 
     if response.status_code != 200:
         raise RuntimeError(f"Weather API error {response.status_code}")
@@ -258,6 +265,271 @@ def fetch_weather_data(
     return df_weather
 
 
+# ---------------------------------------------------------------------------
+# Parallel, resumable download
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the overall request rate.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second (sustained requests per second).
+    capacity : int, optional
+        Maximum burst size. Defaults to ``max(1, int(rate))``.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def split_date_range(
+    start_date: str,
+    end_date: Optional[str] = None,
+    freq: str = "D",
+) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Split [start_date, end_date] (both days included) into half-open windows.
+
+    Parameters
+    ----------
+    start_date : str
+        Start date (YYYY/MM/DD or YYYY-MM-DD)
+    end_date : str, optional
+        End date, included. If None, only start_date.
+    freq : str
+        Window size: "D" (day) or "h" (hour).
+
+    Returns
+    -------
+    list of (pd.Timestamp, pd.Timestamp)
+    """
+    if end_date is None:
+        end_date = start_date
+
+    start = pd.Timestamp(start_date.replace("/", "-")).normalize()
+    end = pd.Timestamp(end_date.replace("/", "-")).normalize() + pd.Timedelta(days=1)
+    bounds = pd.date_range(start, end, freq=freq)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _window_where(window_start: pd.Timestamp, window_end: pd.Timestamp) -> str:
+    return (
+        f"date >= date'{window_start:%Y-%m-%dT%H:%M:%S}' "
+        f"AND date < date'{window_end:%Y-%m-%dT%H:%M:%S}'"
+    )
+
+
+def _window_path(checkpoint_dir: Path, window_start: pd.Timestamp) -> Path:
+    return checkpoint_dir / f"velib_{window_start:%Y%m%dT%H%M}.pkl"
+
+
+# Les bornes des fenêtres sont des dates locales de Paris (naïves)
+WINDOW_TZ = "Europe/Paris"
+
+
+def _window_end_utc(window_end: pd.Timestamp) -> pd.Timestamp:
+    # heure ambiguë du passage à l'heure d'hiver : la première des deux
+    return window_end.tz_localize(WINDOW_TZ, ambiguous=True, nonexistent="shift_forward").tz_convert("UTC")
+
+
+def _partial_path(path: Path) -> Path:
+    # fenêtre pas encore figée : relue par l'appel en cours, jamais considérée comme faite
+    return path.with_name(path.stem + ".partial.pkl")
+
+
+def _get_with_retry(
+    session: requests.Session,
+    url: str,
+    params: Dict,
+    bucket: TokenBucket,
+    retries: int,
+    timeout: float,
+) -> Dict:
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+            record_request(response)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code == 200:
+                return response.json()
+            # 429 / 5xx : on réessaie, le reste est une erreur définitive
+            if (response.status_code != 429 and response.status_code < 500) or attempt == retries:
+                raise RuntimeError(f"Velib API error {response.status_code}")
+        time.sleep(min(2 ** attempt * 0.5, 10))
+
+
+def _fetch_window(
+    session: requests.Session,
+    url: str,
+    window: Tuple[pd.Timestamp, pd.Timestamp],
+    limit: int,
+    bucket: TokenBucket,
+    retries: int,
+    timeout: float,
+) -> pd.DataFrame:
+    where_clause = _window_where(*window)
+
+    offset = 0
+    frames: List[pd.DataFrame] = []
+
+    while True:
+        params = {
+            "where": where_clause,
+            "limit": limit,
+            "offset": offset,
+        }
+        data = _get_with_retry(session, url, params, bucket, retries, timeout)
+        results = data.get("results", [])
+        total_count = data.get("total_count", 0)
+
+        if not results:
+            break
+
+        frames.append(pd.DataFrame(results))
+        offset += len(results)
+
+        if offset >= total_count:
+            break
+
+    if not frames:
+        return pd.DataFrame(columns=list(col_map.values()))
+    return pd.concat(frames, ignore_index=True).rename(columns=col_map)
+
+
+@timed("fetch_velib_data_parallel")
+def fetch_velib_data_parallel(
+    start_date: str,
+    end_date: Optional[str] = None,
+    checkpoint_dir: str = "artifacts/velib_checkpoints",
+    freq: str = "D",
+    max_workers: int = 8,
+    rate: float = 10.0,
+    limit: int = 100,
+    url: Optional[str] = None,
+    retries: int = 3,
+    timeout: float = 10,
+    return_frame: bool = True,
+    publication_lag: float = 48,
+):
+    """
+    Fetch Velib data for a date range with concurrent, resumable window downloads.
+
+    The range is split into day (or hour) windows fetched through a bounded thread
+    pool sharing one ``requests.Session``. The global request rate is capped by a
+    token bucket. Each finished window is written to ``checkpoint_dir``, so a
+    rerun after a crash only downloads the missing windows. Windows that may
+    still change are saved as ``.partial.pkl`` and fetched again by the next
+    run: those ending less than ``publication_lag`` hours before now (today's
+    partial day, days not yet published) and empty ones. Window bounds are
+    Paris local dates (``WINDOW_TZ``) and are compared with now in UTC. The
+    partial file of a window is removed once its final file is written.
+
+    Parameters
+    ----------
+    start_date : str
+        Start date (YYYY/MM/DD)
+    end_date : str, optional
+        End date (YYYY/MM/DD), included. If None, fetch only start_date.
+    checkpoint_dir : str
+        Directory holding one pickled DataFrame per finished window.
+    freq : str
+        Window size: "D" (day) or "h" (hour).
+    max_workers : int
+        Number of concurrent windows.
+    rate : float
+        Maximum requests per second across all workers.
+    limit : int
+        Records per API call.
+    url : str, optional
+        Records endpoint (default: ``get_data_source().records_url``).
+    retries : int
+        Retries per request on network errors, 429 and 5xx responses.
+    timeout : float
+        Per-request timeout in seconds.
+    return_frame : bool
+        If False, return the list of checkpoint files instead of loading them.
+    publication_lag : float
+        Hours after which a window is considered complete on the API side.
+
+    Returns
+    -------
+    pd.DataFrame or list of Path
+    """
+    checkpoint_path = Path(checkpoint_dir)
+    checkpoint_path.mkdir(parents=True, exist_ok=True)
+
+    windows = split_date_range(start_date, end_date, freq=freq)
+    paths = [_window_path(checkpoint_path, w[0]) for w in windows]
+    todo = [(w, p) for w, p in zip(windows, paths) if not p.exists()]
+    for p in paths:
+        if p.exists():
+            # partiel laissé par une version précédente alors que la fenêtre finale existe
+            _partial_path(p).unlink(missing_ok=True)
+    settled = pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=publication_lag)
+    print(f"{len(windows) - len(todo)}/{len(windows)} windows already fetched")
+
+    bucket = TokenBucket(rate)
+    url = url or get_data_source().records_url
+
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        def run(window, path):
+            df = _fetch_window(session, url, window, limit, bucket, retries, timeout)
+            final = not df.empty and _window_end_utc(window[1]) <= settled
+            if not final:
+                path = _partial_path(path)
+            # Écriture atomique : un fichier présent est toujours complet
+            tmp = path.with_suffix(".tmp")
+            df.to_pickle(tmp)
+            os.replace(tmp, path)
+            if final:
+                # le partiel d'un appel précédent ne doit plus être relu
+                _partial_path(path).unlink(missing_ok=True)
+            return window, path, len(df)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run, w, p) for w, p in todo]
+            for future in as_completed(futures):
+                window, path, n_records = future.result()
+                partial = " (not final, refetched next run)" if path.name.endswith(".partial.pkl") else ""
+                print(f"Fetched window {window[0]:%Y-%m-%d %H:%M} ({n_records} records){partial}")
+
+    paths = [p if p.exists() else _partial_path(p) for p in paths]
+    if not return_frame:
+        return paths
+
+    frames = [pd.read_pickle(p) for p in paths]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(col_map.values()))
+
+
 if __name__ == "__main__":
     # Quick local tests (only run when module executed directly)
     print(fetch_velib_data("2026/01/30"))  # Works
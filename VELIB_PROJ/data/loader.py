@@ -0,0 +1,36 @@
+import os
+
+import streamlit as st
+
+from data.aggregates import load_aggregates
+from data.preprocessing import preprocess_data
+from data.raw_store import DEFAULT_STORE_DIR, convert_csv_to_parquet, is_store_fresh, read_raw_parquet
+
+
+CSV_PATH = "comptage_velo_donnees_compteurs.csv"
+
+
+def ensure_raw_store(csv_path=CSV_PATH, store_dir=DEFAULT_STORE_DIR):
+    # Le CSV n'est converti qu'une fois (puis à chaque mise à jour) : un simple stat tant qu'il ne change pas
+    if os.path.exists(csv_path) and not is_store_fresh(csv_path, store_dir):
+        convert_csv_to_parquet(csv_path, store_dir)
+    return store_dir
+
+
+@st.cache_data
+def load_raw_data(csv_path=CSV_PATH, store_dir=DEFAULT_STORE_DIR, columns=None, start=None, end=None):
+    # ensuite lecture Parquet typée, filtres poussés jusqu'aux partitions
+    ensure_raw_store(csv_path, store_dir)
+    return read_raw_parquet(store_dir, columns=columns, start=start, end=end)
+
+
+@st.cache_data
+def load_processed_data(raw_df):
+    processed_df, feature_names = preprocess_data(raw_df)
+    return processed_df, feature_names
+
+
+@st.cache_data
+def load_dashboard_aggregates(version, store_dir=DEFAULT_STORE_DIR):
+    # clé du cache : la version (hash du manifest du store), jamais les données
+    return load_aggregates(store_dir, version=version)[1]
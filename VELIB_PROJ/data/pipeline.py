@@ -0,0 +1,197 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from data.profiling import stage
+
+
+class FeatureTransform:
+    """
+    One feature-engineering step with declared input and output columns.
+
+    ``fn(df)`` must return a frame that contains every column of ``outputs``.
+    """
+
+    def __init__(self, name: str, inputs: Sequence[str], outputs: Sequence[str], fn: Callable[[pd.DataFrame], pd.DataFrame]):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.fn = fn
+
+    def __repr__(self):
+        return f"FeatureTransform({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+class FeatureRegistry:
+    """
+    Registry of feature transforms indexed by the columns they produce.
+
+    A column not produced by any transform is a raw input column.
+    """
+
+    def __init__(self):
+        self.transforms: Dict[str, FeatureTransform] = {}
+        self.producers: Dict[str, str] = {}
+
+    def register(self, name: str, inputs: Sequence[str], outputs: Sequence[str]):
+        """Decorator registering ``fn(df) -> df`` as transform ``name``."""
+        def decorator(fn):
+            if name in self.transforms:
+                raise ValueError(f"Transform '{name}' is already registered")
+            for col in outputs:
+                if col in self.producers:
+                    raise ValueError(f"Column '{col}' is already produced by '{self.producers[col]}'")
+                self.producers[col] = name
+            self.transforms[name] = FeatureTransform(name, inputs, outputs, fn)
+            return fn
+        return decorator
+
+    def resolve(self, columns: Iterable[str]) -> List[FeatureTransform]:
+        """
+        Transforms needed to produce ``columns``, dependencies first.
+
+        Transforms whose outputs are never needed (dead features) are left out;
+        independent transforms keep their registration order.
+        """
+        needed = set()
+        visiting = set()
+
+        def visit(col):
+            name = self.producers.get(col)
+            if name is None or name in needed:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through transform '{name}'")
+            visiting.add(name)
+            for dep in self.transforms[name].inputs:
+                visit(dep)
+            visiting.discard(name)
+            needed.add(name)
+
+        for col in columns:
+            visit(col)
+
+        # Ordre topologique stable : ordre d'enregistrement, dépendances d'abord
+        ordered, done = [], set()
+
+        def emit(name):
+            if name in done:
+                return
+            for dep in self.transforms[name].inputs:
+                producer = self.producers.get(dep)
+                if producer is not None:
+                    emit(producer)
+            done.add(name)
+            ordered.append(self.transforms[name])
+
+        for name in self.transforms:
+            if name in needed:
+                emit(name)
+        return ordered
+
+
+class FeatureSet:
+    """
+    A named list of output columns compiled against a FeatureRegistry.
+
+    ``transform`` runs: ``clean`` (row cleaning and date parsing), the resolved
+    transforms, the selection of ``columns`` (in that order), the ``post`` steps
+    (row filters or fills over the selected frame), the optional final sort and
+    ``finalize`` (e.g. dtype downcasting). Columns that are not needed are never
+    computed.
+
+    Parameters
+    ----------
+    name : str
+    columns : list of str
+        Output columns (features plus passthrough columns such as the target).
+    passthrough : list of str
+        Output columns that are not model features.
+    clean, post, finalize : callables ``df -> df``
+    sort_by : str or list, optional
+    """
+
+    def __init__(
+        self,
+        name: str,
+        columns: Sequence[str],
+        passthrough: Sequence[str],
+        registry: FeatureRegistry,
+        clean: Optional[Callable] = None,
+        post: Sequence[Callable] = (),
+        sort_by=None,
+        finalize: Optional[Callable] = None,
+    ):
+        self.name = name
+        self.columns = list(columns)
+        self.passthrough = list(passthrough)
+        self.registry = registry
+        self.clean = clean
+        self.post = list(post)
+        self.sort_by = sort_by
+        self.finalize = finalize
+        self.plan = registry.resolve(self.columns)
+
+    @property
+    def features(self) -> List[str]:
+        return [c for c in self.columns if c not in self.passthrough]
+
+    @property
+    def raw_columns(self) -> List[str]:
+        """Raw input columns the plan reads (everything else in the input can be skipped)."""
+        produced = {c for t in self.plan for c in t.outputs}
+        needed = [c for t in self.plan for c in t.inputs] + self.columns
+        return list(dict.fromkeys(c for c in needed if c not in produced))
+
+    def describe(self) -> str:
+        return " -> ".join(t.name for t in self.plan)
+
+    def transform(
+        self,
+        df: pd.DataFrame,
+        clean: bool = True,
+        overrides: Optional[Dict[str, Callable]] = None,
+        finalize: bool = True,
+    ):
+        """
+        Build the feature frame.
+
+        Parameters
+        ----------
+        clean : bool
+            Run the ``clean`` step (disable for already cleaned chunks).
+        overrides : dict, optional
+            ``{transform_name: fn}`` replacing a transform, e.g. lags served
+            from a LagFeatureStore or site statistics computed on a full pass.
+        finalize : bool
+            Run the ``finalize`` step.
+
+        Returns
+        -------
+        (pd.DataFrame, list of str)
+            The frame restricted to ``columns`` and the feature list.
+        """
+        overrides = overrides or {}
+        # Une étape chronométrée par transform (data/profiling.py), lignes en sortie
+        with stage(f"features:{self.name}") as total:
+            if clean and self.clean is not None:
+                with stage("clean") as s:
+                    df = self.clean(df)
+                    s.rows = len(df)
+            for t in self.plan:
+                with stage(t.name) as s:
+                    df = overrides.get(t.name, t.fn)(df)
+                    s.rows = len(df)
+            df = df[self.columns]
+            for step in self.post:
+                with stage(getattr(step, "__name__", "post")) as s:
+                    df = step(df)
+                    s.rows = len(df)
+            if self.sort_by is not None:
+                df = df.sort_values(by=self.sort_by, ascending=True)
+            df = df.reset_index(drop=True)
+            if finalize and self.finalize is not None:
+                with stage("finalize"):
+                    df = self.finalize(df)
+            total.rows = len(df)
+        return df, self.features
@@ -2,6 +2,18 @@ import pandas as pd
 import numpy as np
 import requests
 
+from data.calendar_features import NIGHT_HOURS, SEASON_NAMES, VACANCES_PERIODS, add_calendar_features
+from data.cyclic import UTILS_CYCLIC, VELIB_CYCLIC
+from data.pipeline import FeatureRegistry, FeatureSet
+from data.weather_cache import get_weather_store
+from data.window_features import add_window_features
+from data.dtypes import downcast_features
+
+
+SITE_COL = 'identifiant_du_site_de_comptage'
+DATE_COL = 'date_et_heure_de_comptage'
+TARGET_COL = 'comptage_horaire'
+COORD_COL = 'coordonnées_géographiques'
 
 # Function to determine the season from a date
 def get_season_from_date(date):
@@ -29,13 +41,8 @@ def get_season_from_date(date):
         return 'winter'
     
 def is_night(row):
-    # Example rough night hours per season (24h format)
-    night_hours = {
-        'winter':    {'start': 17, 'end': 8},
-        'spring':{'start': 20.5, 'end': 6},   # 20:30
-        'summer':      {'start': 22, 'end': 5},
-        'autumn':  {'start': 19, 'end': 7},
-    }
+    # Example rough night hours per season (24h format), see NIGHT_HOURS
+    night_hours = NIGHT_HOURS
 
     season = row['saison'].lower()
     dt = row['date_et_heure_de_comptage']
@@ -54,15 +61,8 @@ def is_night(row):
 
 # Define function to test if date falls in a holiday
 def is_vacances(date):
-    # Define vacation periods inside the function
-    vacances_periods = [
-        ('2024-10-19', '2024-11-05'),  # Toussaint
-        ('2024-12-21', '2025-01-07'),  # Noël
-        ('2025-02-15', '2025-03-04'),  # Hiver
-        ('2025-04-12', '2025-04-29'),  # Printemps
-        ('2025-05-29', '2025-06-01'),  # Ascension + pont (29, 30, 31)
-        ('2025-07-05', '2025-09-02'),  # Summer begins 5 July to 1 Sept
-    ]
+    # Vacation periods are shared with the vectorized version (VACANCES_PERIODS)
+    vacances_periods = VACANCES_PERIODS
     
     # Convert to datetime timestamps
     vacances_intervals = [
@@ -82,24 +82,30 @@ def is_rush_hour(dt):
     return (7 <= hour < 10) or (17 <= hour < 20)
 
 # Les valeurs par défaut sont les valeurs maximales pour couvrir tout le dataset
+# Les jours déjà téléchargés sont servis depuis le cache local (data/weather_cache.py)
 def query_weather_api(start="2024-08-01", end="2025-10-07"):
-    # API endpoint
-    url = f"https://archive-api.open-meteo.com/v1/archive?latitude=48.8575&longitude=2.3514&start_date={start}&end_date={end}&hourly=rain,snowfall,apparent_temperature,wind_speed_10m"
-    # Send GET request
-    response = requests.get(url)
-    if response.status_code == 200:
-        print("Weather data retrieved successfully.")
-        data = response.json()
-        records = data["hourly"]
-        # Convert list of dicts to DataFrame
-        df_weather = pd.DataFrame(records)
-        df_weather['time'] = pd.to_datetime(df_weather['time'], utc=True)
-        df_weather['time'] = df_weather['time'].dt.tz_convert(None)
-        return df_weather
+    try:
+        df_weather = get_weather_store().get(
+            48.8575, 2.3514, start, end,
+            hourly=['rain', 'snowfall', 'apparent_temperature', 'wind_speed_10m'],
+        )
+    except (RuntimeError, requests.RequestException) as e:
+        print("Error:", e)
+        return pd.DataFrame(columns=['time', 'rain', 'snowfall', 'apparent_temperature', 'wind_speed_10m'])
+    print("Weather data retrieved successfully.")
+    return df_weather
 
-    else:
-        print("Error:", response.status_code)
-    return pd.DataFrame(columns=['time', 'rain', 'snowfall', 'apparent_temperature', 'wind_speed_10m'])
+# Météo horaire à une position donnée, en UTC naïf comme les dates de comptage (features du modèle)
+def query_station_weather(latitude, longitude, start_date, end_date):
+    try:
+        weather_df = get_weather_store().get(
+            latitude, longitude, start_date, end_date,
+            hourly=["temperature_2m", "precipitation", "wind_speed_10m"],
+        )
+    except (RuntimeError, requests.RequestException) as e:
+        print("⚠️ Weather API error:", e)
+        return None
+    return weather_df.rename(columns={"time": DATE_COL})
 
 def static_features(df):
     site_stats = (
@@ -116,90 +122,212 @@ def static_features(df):
     return df
  
 def time_varying_features(df):
-    # Time-varying features per site
-    df = df.sort_values(['identifiant_du_site_de_comptage', 'date_et_heure_de_comptage'])
-
-    df['lag_1'] = df.groupby('identifiant_du_site_de_comptage')['comptage_horaire'].shift(1)
-    df['lag_24'] = df.groupby('identifiant_du_site_de_comptage')['comptage_horaire'].shift(24)
-    df['rolling_mean_24'] = (
-        df.groupby('identifiant_du_site_de_comptage')['comptage_horaire']
-        .shift(1).rolling(24).mean()
-    )
-    return df
+    # Time-varying features per site (lag_1, lag_24, rolling_mean_24), windows never cross sites
+    return add_window_features(df, lags=(1, 24), windows=(24,), stats=('mean',))
 
 
 #Fonction pour encodage cyclique
-def add_cyclic_features(df):
-
-    # Encodage cyclique pour mois (1-12)
-    df['jour_sin'] = np.sin(2 * np.pi * df['jour'] / 7)
-    df['jour_cos'] = np.cos(2 * np.pi * df['jour'] / 7)
-
-    # Encodage cyclique pour mois (1-12)
-    df['mois_sin'] = np.sin(2 * np.pi * df['mois'] / 12)
-    df['mois_cos'] = np.cos(2 * np.pi * df['mois'] / 12)
-
-    # Encodage cyclique pour heure (0-23)
-    df['heure_sin'] = np.sin(2 * np.pi * df['heure'] / 24)
-    df['heure_cos'] = np.cos(2 * np.pi * df['heure'] / 24)
-
-    # Encodage cyclique pour saison 
-    df["saison_sin"]  = np.sin(2 * np.pi * df["saison"].map({'winter':0, 'spring':1, 'summer':2, 'autumn':3}) / 4)
-    df["saison_cos"]  = np.cos(2 * np.pi * df["saison"].map({'winter':0, 'spring':1, 'summer':2, 'autumn':3}) / 4)
-
-    df = df.drop(columns=["jour", "saison", "heure", "mois"])
+def cyclic_codes(df):
+    # jour (période 7), mois (1-12), heure (0-23) et saison (winter=0 ... autumn=3)
+    return {
+        'jour': df['jour'].to_numpy(),
+        'mois': df['mois'].to_numpy(),
+        'heure': df['heure'].to_numpy(),
+        'saison': (df['saison'].cat.set_categories(SEASON_NAMES).cat.codes.to_numpy()
+                   if isinstance(df['saison'].dtype, pd.CategoricalDtype)
+                   else pd.Categorical(df['saison'], categories=SEASON_NAMES).codes),
+    }
 
-    return df
+def add_cyclic_features(df):
+    # par lecture dans des tables sin/cos précalculées (data/cyclic.py), bloc float32
+    return VELIB_CYCLIC.add_to_frame(df, cyclic_codes(df), drop=["jour", "saison", "heure", "mois"])
 
-# Load and preprocess data
-def preprocess_data(df):
-    print('Preprocessing has started.')
+# Lignes incomplètes retirées, dates converties en UTC naïf
+def clean_raw_data(df):
     df = df.dropna().copy()
+    # Dates déjà typées (store Parquet, data/raw_store.py) : déjà en UTC naïf, pas de reparsing
+    if pd.api.types.is_datetime64_dtype(df['date_et_heure_de_comptage']):
+        return df
     df['date_et_heure_de_comptage'] = pd.to_datetime(df['date_et_heure_de_comptage'].astype(str), errors='coerce', utc=True)
     df = df.dropna(subset=['date_et_heure_de_comptage']).copy()
     df['date_et_heure_de_comptage'] = df['date_et_heure_de_comptage'].dt.tz_convert(None)
+    return df
 
-    # Features temporelles
-    df['heure'] = df['date_et_heure_de_comptage'].dt.hour
-    df['mois'] = df['date_et_heure_de_comptage'].dt.month
-    df['jour'] = df['date_et_heure_de_comptage'].dt.day
-    # df['nom_jour'] = df['date_et_heure_de_comptage'].dt.day_name(locale='fr_FR.UTF-8')
-    df['saison'] = df['date_et_heure_de_comptage'].apply(get_season_from_date)
-    df['vacances'] = df['date_et_heure_de_comptage'].apply(is_vacances)
-    df['heure_de_pointe'] = df['date_et_heure_de_comptage'].apply(is_rush_hour)
-    df['nuit'] = df.apply(is_night, axis=1)
-
-    # Coordonnées
-    coords = df["coordonnées_géographiques"].str.split(",", expand=True)
-    df["latitude"] = coords[0].astype(float)
-    df["longitude"] = coords[1].astype(float)
-
-    # Ajout météo
+# Ajout météo (jointure sur l'heure UTC)
+def add_weather_features(df):
     df_weather = query_weather_api(df["date_et_heure_de_comptage"].min().strftime("%Y-%m-%d"),
                                    df["date_et_heure_de_comptage"].max().strftime("%Y-%m-%d"))
     df_merged = pd.merge(df, df_weather, how="left", left_on="date_et_heure_de_comptage", right_on="time").drop(columns=["time"])
     df_merged['pluie'] = (df_merged['rain'] > 0)
     df_merged['vent'] = (df_merged['wind_speed_10m'] > 30)
     df_merged['neige'] = (df_merged['snowfall'] > 0)
+    return df_merged
+
+
+# ===========================================================
+#  REGISTRE DES FEATURES
+# ===========================================================
+# Chaque transformation déclare ses colonnes d'entrée et de sortie. Un FeatureSet
+# (data/pipeline.py) ne calcule que les transformations nécessaires à ses colonnes,
+# dans l'ordre des dépendances : les colonnes jamais utilisées (latitude/longitude
+# pour le dashboard, météo brute...) ne sont plus calculées puis supprimées.
+FEATURES = FeatureRegistry()
+
+SITE_STATS = ['site_mean_usage', 'site_usage_variability', 'site_max_usage', 'site_min_usage']
+LAG_FEATURES = ['lag_1', 'lag_24', 'rolling_mean_24']
+MODEL_WEATHER = ['temperature_2m', 'precipitation', 'wind_speed_10m']
+
+
+@FEATURES.register('site_stats', inputs=[SITE_COL, TARGET_COL], outputs=SITE_STATS)
+def _site_stats(df):
+    return static_features(df)
+
+@FEATURES.register('lags', inputs=[SITE_COL, DATE_COL, TARGET_COL], outputs=LAG_FEATURES)
+def _lags(df):
+    return time_varying_features(df)
+
+# --- Dashboard (data/preprocessing.py) : features en français ---
 
-    # Nettoyage colonnes inutiles
-    df_merged = df_merged.drop(columns=["latitude", "longitude", "date_d'installation_du_site_de_comptage",
-                                        "identifiant_technique_compteur", "mois_annee_comptage", "identifiant_du_compteur",
-                                        "nom_du_site_de_comptage", "nom_du_compteur", "snowfall", "rain",
-                                        "wind_speed_10m", 'lien_vers_photo_du_site_de_comptage', 'id_photos',
-                                        'test_lien_vers_photos_du_site_de_comptage_', 'id_photo_1', 'url_sites', 'type_dimage',
-                                        "coordonnées_géographiques"])
-
-    # Ajout des features statiques et dynamiques
-    df_merged = static_features(df_merged)
-    df_merged = time_varying_features(df_merged)
-    df_merged = df_merged.dropna()
-
-    # Ajout des features cycliques
-    df_encoded = add_cyclic_features(df_merged)
-    print("df_encoded:",df_encoded.columns)
-
-    # Sélection des features
-    features = [col for col in df_encoded.columns if col not in ['comptage_horaire', 'date_et_heure_de_comptage']]
-    df_encoded = df_encoded.sort_values(by='date_et_heure_de_comptage', ascending=True).reset_index(drop = True)
-    return df_encoded, features
\ No newline at end of file
+@FEATURES.register('temps', inputs=[DATE_COL], outputs=['heure', 'mois', 'jour'])
+def _temps(df):
+    df['heure'] = df[DATE_COL].dt.hour
+    df['mois'] = df[DATE_COL].dt.month
+    df['jour'] = df[DATE_COL].dt.day
+    return df
+
+# saison, vacances, heure_de_pointe et nuit en une seule passe vectorisée
+# (équivalent exact de get_season_from_date, is_vacances, is_rush_hour et is_night)
+@FEATURES.register('calendrier', inputs=[DATE_COL], outputs=['saison', 'vacances', 'heure_de_pointe', 'nuit'])
+def _calendrier(df):
+    return add_calendar_features(df)
+
+@FEATURES.register('meteo', inputs=[DATE_COL], outputs=['apparent_temperature', 'pluie', 'vent', 'neige'])
+def _meteo(df):
+    return add_weather_features(df)
+
+@FEATURES.register('cycliques', inputs=['jour', 'mois', 'heure', 'saison'], outputs=VELIB_CYCLIC.output_columns)
+def _cycliques(df):
+    return VELIB_CYCLIC.add_to_frame(df, cyclic_codes(df))
+
+# --- Modèle (my_utils.preprocess_data : entraînement, évaluation, prédiction) ---
+
+@FEATURES.register('model_time', inputs=[DATE_COL], outputs=['hour', 'day', 'month', 'weekday', 'year'])
+def _model_time(df):
+    dates = df[DATE_COL].dt
+    df['hour'] = dates.hour
+    df['day'] = dates.day
+    df['month'] = dates.month
+    df['weekday'] = dates.weekday
+    df['year'] = dates.year
+    return df
+
+@FEATURES.register('model_calendar', inputs=['hour', 'month', 'weekday'],
+                   outputs=['season', 'is_rush_hour', 'is_night', 'is_weekend', 'is_holiday'])
+def _model_calendar(df):
+    hour = df['hour']
+    df['season'] = df['month'] % 12 // 3 + 1
+    df['is_rush_hour'] = (hour.between(7, 9) | hour.between(16, 19)).astype(np.int64)
+    df['is_night'] = ((hour <= 5) | (hour >= 22)).astype(np.int64)
+    df['is_weekend'] = (df['weekday'] >= 5).astype(np.int64)
+    # vacances simplifiées : août
+    df['is_holiday'] = (df['month'] == 8).astype(np.int64)
+    return df
+
+@FEATURES.register('coordinates', inputs=[COORD_COL], outputs=['latitude', 'longitude'])
+def _coordinates(df):
+    if COORD_COL in df.columns:
+        coords = df[COORD_COL].astype(str).str.split(",", expand=True)
+        df['latitude'] = pd.to_numeric(coords[0], errors="coerce")
+        df['longitude'] = pd.to_numeric(coords[1], errors="coerce")
+    for col in ('latitude', 'longitude'):
+        if col not in df.columns:
+            df[col] = np.nan
+    return df
+
+# Position de la station météo du modèle : celle du premier site qui en a une
+def station_position(df):
+    lat, lon = df['latitude'].dropna(), df['longitude'].dropna()
+    return (float(lat.iloc[0]), float(lon.iloc[0])) if len(lat) and len(lon) else None
+
+# Météo à une position (par défaut celle du premier site), valeurs manquantes remplacées
+# par les médianes données ou, à défaut, par celles du frame
+def add_model_weather(df, position=None, medians=None):
+    position = station_position(df) if position is None else position
+    if position is not None and len(df):
+        weather_df = query_station_weather(position[0], position[1],
+                                           df[DATE_COL].dt.date.min().strftime("%Y-%m-%d"),
+                                           df[DATE_COL].dt.date.max().strftime("%Y-%m-%d"))
+        if weather_df is not None:
+            df = df.merge(weather_df, on=DATE_COL, how="left")
+    for col in MODEL_WEATHER:
+        if col not in df.columns:
+            df[col] = np.nan
+        df[col] = df[col].fillna(df[col].median() if medians is None else medians[col])
+    return df
+
+@FEATURES.register('model_weather', inputs=[DATE_COL, 'latitude', 'longitude'], outputs=MODEL_WEATHER)
+def _model_weather(df):
+    return add_model_weather(df)
+
+@FEATURES.register('model_cyclic', inputs=['hour', 'month'], outputs=UTILS_CYCLIC.output_columns)
+def _model_cyclic(df):
+    return UTILS_CYCLIC.add_to_frame(df, {'hour': df['hour'].to_numpy(), 'month': df['month'].to_numpy()})
+
+
+# Dates ramenées en UTC naïf comme dans le store brut (offsets +01:00/+02:00 de l'export CSV),
+# seules les lignes sans date sont retirées
+def clean_model_input(df):
+    df = df.copy()
+    dates = df[DATE_COL]
+    if isinstance(dates.dtype, pd.DatetimeTZDtype):
+        df[DATE_COL] = dates.dt.tz_convert(None)
+    elif not pd.api.types.is_datetime64_dtype(dates):
+        df[DATE_COL] = pd.to_datetime(dates.astype(str), errors="coerce", utc=True).dt.tz_convert(None)
+    return df.dropna(subset=[DATE_COL])
+
+def drop_incomplete_rows(df):
+    return df.dropna()
+
+def fill_lag_medians(df):
+    for col in LAG_FEATURES:
+        df[col] = df[col].fillna(df[col].median())
+    return df
+
+
+# Features du dashboard (app.py, data/loader.py, data/chunked.py)
+VELIB_FEATURES = FeatureSet(
+    'velib',
+    columns=[SITE_COL, TARGET_COL, DATE_COL, 'vacances', 'heure_de_pointe', 'nuit',
+             'apparent_temperature', 'pluie', 'vent', 'neige', *SITE_STATS, *LAG_FEATURES,
+             *VELIB_CYCLIC.output_columns],
+    passthrough=[TARGET_COL, DATE_COL],
+    registry=FEATURES,
+    clean=clean_raw_data,
+    post=[drop_incomplete_rows],
+    sort_by=DATE_COL,
+    finalize=downcast_features,
+)
+
+# Features du modèle LightGBM (models/train.py, predict.py, evaluation.py, streamlit_app.py)
+MODEL_FEATURES = FeatureSet(
+    'model',
+    columns=[SITE_COL, TARGET_COL, DATE_COL, 'hour', 'day', 'month', 'weekday', 'year',
+             'season', 'is_rush_hour', 'is_night', 'is_weekend', 'is_holiday',
+             *MODEL_WEATHER, *LAG_FEATURES, *UTILS_CYCLIC.output_columns],
+    passthrough=[TARGET_COL, DATE_COL],
+    registry=FEATURES,
+    clean=clean_model_input,
+    post=[fill_lag_medians],
+    finalize=downcast_features,
+)
+
+
+# Load and preprocess data
+def preprocess_data(df):
+    print('Preprocessing has started.')
+    print('Feature plan:', VELIB_FEATURES.describe())
+    # nettoyage, features calendaires, météo, statistiques par site, lags,
+    # suppression des lignes incomplètes, encodage cyclique, tri par date, types compacts
+    df_encoded, features = VELIB_FEATURES.transform(df)
+    print("df_encoded:", df_encoded.columns)
+    return df_encoded, features
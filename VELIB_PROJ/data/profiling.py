@@ -0,0 +1,257 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of the process in MB (None where ``resource`` is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident memory in MB (Linux only, None elsewhere)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StageStats:
+    """Totals of one stage path over all its calls."""
+
+    __slots__ = ("calls", "seconds", "cpu_seconds", "rows", "rss_delta_mb", "peak_delta_mb", "requests", "bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows = None
+        self.rss_delta_mb = None
+        self.peak_delta_mb = None
+        self.requests = 0
+        self.bytes = 0
+
+
+class Stage:
+    """Handle yielded by ``stage()``: set ``rows`` to record how many rows the stage produced."""
+
+    __slots__ = ("path", "rows")
+
+    def __init__(self, path: Tuple[str, ...], rows: Optional[int] = None):
+        self.path = path
+        self.rows = rows
+
+
+class Tracer:
+    """
+    Aggregated stage timings for the process.
+
+    Stages nest per thread: a stage opened inside another is recorded under
+    the path ``outer/inner``, and repeated calls of the same path are summed.
+    For each path the tracer keeps calls, wall and CPU seconds, rows, the
+    change of resident memory and of the peak-memory high-water mark, and
+    the HTTP requests and bytes recorded while it was the innermost stage.
+    Requests made from worker threads without a stage of their own are
+    charged to the innermost stage of the thread that created the tracer.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats: Dict[Tuple[str, ...], StageStats] = {}
+        self.local = threading.local()
+        self.main_stack = self._stack()
+        self.started = time.time()
+
+    def _stack(self) -> list:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        stack = self._stack()
+        handle = Stage((*(stack[-1].path if stack else ()), name), rows)
+        stack.append(handle)
+        with self.lock:
+            # entrée créée à l'ouverture : le rapport suit l'ordre d'exécution, parents avant enfants
+            self.stats.setdefault(handle.path, StageStats())
+        rss0, peak0 = rss_mb(), peak_memory_mb()
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield handle
+        finally:
+            seconds, cpu = time.perf_counter() - t0, time.process_time() - c0
+            rss1, peak1 = rss_mb(), peak_memory_mb()
+            stack.pop()
+            with self.lock:
+                s = self.stats.setdefault(handle.path, StageStats())
+                s.calls += 1
+                s.seconds += seconds
+                s.cpu_seconds += cpu
+                if handle.rows is not None:
+                    s.rows = (s.rows or 0) + int(handle.rows)
+                if rss0 is not None and rss1 is not None:
+                    s.rss_delta_mb = (s.rss_delta_mb or 0.0) + rss1 - rss0
+                if peak0 is not None and peak1 is not None:
+                    s.peak_delta_mb = (s.peak_delta_mb or 0.0) + peak1 - peak0
+
+    def reset(self) -> None:
+        """Forget the recorded stats (open stages keep running and are recorded when they close)."""
+        with self.lock:
+            self.stats.clear()
+        self.started = time.time()
+
+    def record_request(self, n_bytes: int) -> None:
+        stack = self._stack() or self.main_stack
+        path = stack[-1].path if stack else ("(no stage)",)
+        with self.lock:
+            s = self.stats.setdefault(path, StageStats())
+            s.requests += 1
+            s.bytes += int(n_bytes)
+
+    def report(self) -> dict:
+        """Trace dict: one entry per stage path (order of first entry) with self time, plus network totals."""
+        with self.lock:
+            items = list(self.stats.items())
+        child_seconds: Dict[Tuple[str, ...], float] = {}
+        for path, s in items:
+            if len(path) > 1:
+                child_seconds[path[:-1]] = child_seconds.get(path[:-1], 0.0) + s.seconds
+        stages = []
+        for path, s in items:
+            stages.append({
+                "stage": "/".join(path),
+                "calls": s.calls,
+                "seconds": round(s.seconds, 6),
+                "self_seconds": round(max(s.seconds - child_seconds.get(path, 0.0), 0.0), 6),
+                "cpu_seconds": round(s.cpu_seconds, 6),
+                "rows": s.rows,
+                "rss_delta_mb": None if s.rss_delta_mb is None else round(s.rss_delta_mb, 1),
+                "peak_delta_mb": None if s.peak_delta_mb is None else round(s.peak_delta_mb, 1),
+                "requests": s.requests,
+                "bytes": s.bytes,
+            })
+        return {
+            "command": sys.argv,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": round(time.time() - self.started, 3),
+            "peak_memory_mb": peak_memory_mb(),
+            "network": {"requests": sum(s["requests"] for s in stages), "bytes": sum(s["bytes"] for s in stages)},
+            "stages": stages,
+        }
+
+    def folded(self) -> str:
+        """Stage self times as collapsed stacks (``a;b;c microseconds``), the ``py-spy --format raw`` / flamegraph.pl input."""
+        lines = []
+        for s in self.report()["stages"]:
+            micros = int(s["self_seconds"] * 1e6)
+            if micros:
+                lines.append(f"{s['stage'].replace('/', ';')} {micros}")
+        return "\n".join(lines) + "\n"
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer shared by every instrumented module."""
+    return _tracer
+
+
+def stage(name: str, rows: Optional[int] = None):
+    """``with stage("weather merge") as s: ...; s.rows = len(df)`` times a block under the current stage."""
+    return _tracer.stage(name, rows)
+
+
+def _result_rows(result) -> Optional[int]:
+    # DataFrame, ou tuple (DataFrame, features) comme preprocess_data
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    return len(result) if hasattr(result, "__len__") and hasattr(result, "columns") else None
+
+
+def timed(name: Optional[str] = None):
+    """Decorator timing every call as a stage (rows taken from a returned DataFrame)."""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracer.stage(label) as s:
+                result = fn(*args, **kwargs)
+                s.rows = _result_rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def record_request(response) -> None:
+    """Count one HTTP request and its payload size (a ``requests.Response`` or a byte count)."""
+    n_bytes = response if isinstance(response, int) else len(getattr(response, "content", b"") or b"")
+    _tracer.record_request(n_bytes)
+
+
+@contextmanager
+def trace_run(trace_path: Optional[str], name: Optional[str] = None, profile: bool = False):
+    """
+    Run a CLI under a root stage and write its trace.
+
+    The trace JSON goes to ``trace_path`` (nothing is written if None).
+    With ``profile``, the run is also profiled with cProfile into
+    ``<trace>.prof`` (pstats: snakeviz, ``python -m pstats``) and the stage
+    self times are written as collapsed stacks to ``<trace>.folded``
+    (flamegraph.pl, speedscope, inferno).
+    """
+    profiler = cProfile.Profile() if profile else None
+    name = name or Path(sys.argv[0]).stem
+    try:
+        with _tracer.stage(name):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield _tracer
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    finally:
+        if trace_path:
+            os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+            with open(trace_path, "w", encoding="utf-8") as f:
+                json.dump(_tracer.report(), f, indent=2)
+            base = os.path.splitext(trace_path)[0]
+            if profiler is not None:
+                profiler.dump_stats(base + ".prof")
+                with open(base + ".folded", "w", encoding="utf-8") as f:
+                    f.write(_tracer.folded())
+            print("Trace saved to:", trace_path)
+            print_summary(_tracer.report())
+
+
+def print_summary(report: dict, top: int = 8) -> None:
+    stages = sorted(report["stages"], key=lambda s: s["self_seconds"], reverse=True)[:top]
+    print(f"{'stage':<60} {'calls':>6} {'self s':>8} {'total s':>8} {'rows':>10} {'peak +MB':>9}")
+    for s in stages:
+        rows = "" if s["rows"] is None else f"{s['rows']:,}"
+        peak = "" if s["peak_delta_mb"] is None else f"{s['peak_delta_mb']:.0f}"
+        name = s["stage"] if len(s["stage"]) <= 60 else "..." + s["stage"][-57:]
+        print(f"{name:<60} {s['calls']:>6} {s['self_seconds']:>8.2f} {s['seconds']:>8.2f} {rows:>10} {peak:>9}")
+    net = report["network"]
+    if net["requests"]:
+        print(f"Network: {net['requests']} requests, {net['bytes'] / 2**20:.1f} MB")
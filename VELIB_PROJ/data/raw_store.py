@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+SITE_COL = "identifiant_du_site_de_comptage"
+DATE_COL = "date_et_heure_de_comptage"
+TARGET_COL = "comptage_horaire"
+COORD_COL = "coordonnées_géographiques"
+
+DEFAULT_STORE_DIR = "artifacts/raw_parquet"
+PARTITION_COLS = ["month", "site"]
+MANIFEST = "_manifest.json"
+
+
+def sniff_separator(csv_path: str) -> str:
+    """The Open Data export uses ';', files written by pandas use ','."""
+    with open(csv_path, "r", encoding="utf-8-sig") as f:
+        header = f.readline()
+    return ";" if header.count(";") > header.count(",") else ","
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # "Comptage horaire" (export avec libellés) -> "comptage_horaire"
+    df.columns = [c.strip().replace(" ", "_").lower() for c in df.columns]
+    return df
+
+
+def _typed_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    df = normalize_columns(df)
+    if DATE_COL in df.columns:
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL].astype(str), errors="coerce", utc=True).dt.tz_convert(None)
+    if TARGET_COL in df.columns:
+        df[TARGET_COL] = pd.to_numeric(df[TARGET_COL], errors="coerce").astype(np.float32)
+    if SITE_COL in df.columns:
+        df[SITE_COL] = df[SITE_COL].astype("string")
+    if COORD_COL in df.columns:
+        coords = df[COORD_COL].astype("string").str.split(",", expand=True, n=1)
+        df["latitude"] = pd.to_numeric(coords[0], errors="coerce")
+        df["longitude"] = pd.to_numeric(coords[1], errors="coerce") if coords.shape[1] > 1 else np.nan
+    for col in df.columns:
+        if df[col].dtype == object or isinstance(df[col].dtype, pd.StringDtype):
+            df[col] = df[col].astype("string")
+
+    # Clés de partition (hive) : mois du comptage et site
+    df["month"] = df[DATE_COL].dt.strftime("%Y-%m").astype("string")
+    df["site"] = df[SITE_COL]
+    return df
+
+
+def _source_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"source": str(Path(csv_path).resolve()), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def is_store_fresh(csv_path: str, store_dir: str = DEFAULT_STORE_DIR) -> bool:
+    manifest = Path(store_dir) / MANIFEST
+    if not manifest.exists():
+        return False
+    with open(manifest, "r", encoding="utf-8") as f:
+        return json.load(f).get("signature") == _source_signature(csv_path)
+
+
+def store_fingerprint(store_dir: str = DEFAULT_STORE_DIR) -> str:
+    """
+    Short hash identifying the contents of a Parquet store, without reading the data.
+
+    Taken from the manifest (source CSV size/mtime) when there is one, else
+    from the names, sizes and mtimes of the Parquet files.
+    """
+    store_path = Path(store_dir)
+    manifest = store_path / MANIFEST
+    if manifest.exists():
+        payload = manifest.read_text(encoding="utf-8")
+    else:
+        files = sorted(store_path.rglob("*.parquet")) if store_path.is_dir() else [store_path]
+        payload = json.dumps([(str(p.relative_to(store_path) if store_path.is_dir() else p.name), p.stat().st_size, p.stat().st_mtime) for p in files])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _month_batches(table: pa.Table) -> Iterator[pa.RecordBatch]:
+    # Un lot par mois : chaque lot écrit touche au plus un répertoire par site (limite max_partitions d'Arrow)
+    table = table.sort_by("month")
+    months = table.column("month").to_pandas().fillna("")
+    bounds = np.flatnonzero(months.ne(months.shift()).to_numpy()).tolist() + [len(months)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield from table.slice(start, end - start).to_batches()
+
+
+def convert_csv_to_parquet(
+    csv_path: str,
+    store_dir: str = DEFAULT_STORE_DIR,
+    chunksize: int = 500_000,
+    sep: Optional[str] = None,
+    force: bool = False,
+) -> Path:
+    """
+    Convert the raw CSV export once into a typed Parquet dataset partitioned by month and site.
+
+    Columns are typed at conversion time: ``date_et_heure_de_comptage`` as
+    datetime64 (UTC, naive), ``comptage_horaire`` as float32, site ids as
+    strings read back as categoricals, and ``latitude``/``longitude`` split out
+    of ``coordonnées_géographiques``. The CSV is streamed in chunks into a single
+    dataset writer, one month at a time: an unsorted chunk spanning many
+    months would otherwise write into more month/site directories at once
+    than Arrow allows. A manifest records the source size/mtime so the conversion
+    is skipped while the CSV is unchanged.
+
+    Returns
+    -------
+    Path
+        The dataset directory.
+    """
+    store_path = Path(store_dir)
+    if not force and is_store_fresh(csv_path, store_dir):
+        print("Raw Parquet store is up to date:", store_path)
+        return store_path
+
+    sep = sep or sniff_separator(csv_path)
+    if store_path.exists():
+        shutil.rmtree(store_path)
+    store_path.mkdir(parents=True)
+
+    chunks = pd.read_csv(csv_path, sep=sep, chunksize=chunksize, dtype=str)
+    first = pa.Table.from_pandas(_typed_chunk(next(chunks)), preserve_index=False)
+    schema = first.schema.remove_metadata()
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        yield from _month_batches(first.cast(schema))
+        for i, chunk in enumerate(chunks, start=1):
+            table = pa.Table.from_pandas(_typed_chunk(chunk), preserve_index=False)
+            yield from _month_batches(table.select(schema.names).cast(schema))
+            print(f"Converted chunk {i}")
+
+    ds.write_dataset(
+        batches(),
+        store_path,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([schema.field(c) for c in PARTITION_COLS]), flavor="hive"),
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=1_000_000,
+    )
+
+    with open(store_path / MANIFEST, "w", encoding="utf-8") as f:
+        json.dump({"signature": _source_signature(csv_path)}, f, indent=2)
+
+    print("Raw Parquet store written:", store_path)
+    return store_path
+
+
+def read_raw_parquet(
+    store_dir: str = DEFAULT_STORE_DIR,
+    columns: Optional[List[str]] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    sites: Optional[Iterable] = None,
+) -> pd.DataFrame:
+    """
+    Read raw counts from the Parquet store, pushing the filters down to the partitions.
+
+    Parameters
+    ----------
+    columns : list of str, optional
+        Columns to load (all raw columns by default, partition keys excluded).
+    start, end : str, optional
+        Inclusive date bounds (YYYY-MM-DD) on ``date_et_heure_de_comptage``.
+    sites : iterable, optional
+        Site ids to keep.
+    """
+    dataset = ds.dataset(store_dir, format="parquet", partitioning="hive", exclude_invalid_files=True)
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c not in PARTITION_COLS]
+
+    # Les filtres sur month/site éliminent des répertoires entiers avant lecture
+    expr = None
+    conditions = []
+    if start is not None:
+        start_ts = pd.Timestamp(start)
+        conditions.append(ds.field("month") >= f"{start_ts:%Y-%m}")
+        conditions.append(ds.field(DATE_COL) >= start_ts)
+    if end is not None:
+        end_ts = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        conditions.append(ds.field("month") <= f"{pd.Timestamp(end):%Y-%m}")
+        conditions.append(ds.field(DATE_COL) < end_ts)
+    if sites is not None:
+        conditions.append(ds.field("site").isin([str(s) for s in sites]))
+    for cond in conditions:
+        expr = cond if expr is None else expr & cond
+
+    table = dataset.to_table(columns=columns, filter=expr)
+    categories = [SITE_COL] if SITE_COL in columns else []
+    return table.to_pandas(categories=categories)
+
+
+def iter_raw_chunks(
+    path: str,
+    chunk_rows: int = 200_000,
+    columns: Optional[List[str]] = None,
+    sites: Optional[Iterable] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read raw counts in chronological chunks of at most ``chunk_rows`` rows.
+
+    A Parquet store is walked one ``month`` partition at a time. Each month is
+    sorted by date and cut into chunks, so peak memory is one month of raw
+    rows whatever the length of the archive. A single Parquet file is read
+    batch by batch in file order. CSV exports are not sorted: convert them
+    with ``convert_csv_to_parquet`` first. ``sites`` keeps only those site ids.
+    """
+    path = Path(path)
+    sites = None if sites is None else [str(s) for s in sites]
+    if path.suffix == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            df = batch.to_pandas()
+            yield df if sites is None else df[df[SITE_COL].astype(str).isin(sites)]
+        return
+    if not path.is_dir():
+        raise ValueError(f"Chunked reading needs a Parquet store or file, got {path} (see convert_csv_to_parquet)")
+
+    dataset = ds.dataset(path, format="parquet", partitioning="hive", exclude_invalid_files=True)
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c not in PARTITION_COLS]
+    months = sorted(p.name.split("=", 1)[1] for p in path.glob("month=*"))
+    for month in months:
+        expr = ds.field("month") == month
+        if sites is not None:
+            expr = expr & ds.field("site").isin(sites)
+        table = dataset.to_table(columns=columns, filter=expr)
+        categories = [SITE_COL] if SITE_COL in columns else []
+        df = table.to_pandas(categories=categories)
+        df = df.sort_values(DATE_COL, kind="stable").reset_index(drop=True)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def read_raw_input(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read raw counts from either a Parquet store directory/file or a CSV export (separator sniffed).
+    """
+    path = Path(path)
+    if path.is_dir():
+        return read_raw_parquet(str(path), columns=columns)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+    df = normalize_columns(pd.read_csv(path, sep=sniff_separator(str(path))))
+    return df[columns] if columns is not None else df
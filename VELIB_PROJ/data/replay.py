@@ -0,0 +1,274 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from data.ingestion import col_map
+from data.preprocessing import COORD_COL, DATE_COL, TARGET_COL
+from data.raw_store import read_raw_input
+from data.sources import DataSource, set_data_source
+from data.synthetic import make_raw_counts, synthetic_weather
+from data.weather_cache import WeatherStore
+
+
+# Clauses acceptées dans ``where`` : comparaisons de date jointes par AND (celles des fetchers)
+_DATE_CLAUSE = re.compile(r"^date\s*(>=|<=|>|<|=)\s*date'([^']+)'$", re.IGNORECASE)
+
+
+def _json_default(value):
+    # scalaires numpy / pandas restés dans les enregistrements
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class RecordsBackend:
+    """
+    Paginated ``/records`` responses of the Paris Open Data API over a frame of export rows.
+
+    Rows are returned with the API field names (``col_map`` reversed), the
+    date in UTC ISO format and the coordinates as ``{"lon", "lat"}``, sorted
+    by date. ``where`` supports the date comparisons joined by ``AND`` that
+    the fetchers send. The API limits are enforced: ``limit`` at most
+    ``max_limit`` and ``offset + limit`` at most ``max_window``.
+    """
+
+    def __init__(self, df: pd.DataFrame, max_limit: int = 100, max_window: int = 10_000):
+        self.max_limit = max_limit
+        self.max_window = max_window
+
+        dates = pd.to_datetime(df[DATE_COL].astype(str), errors="coerce", utc=True).dt.tz_convert(None)
+        keep = dates.notna().to_numpy()
+        df, dates = df[keep], dates[keep]
+        order = np.argsort(dates.to_numpy(), kind="stable")
+        df, dates = df.iloc[order].reset_index(drop=True), dates.iloc[order].reset_index(drop=True)
+        self.dates = dates.to_numpy()
+
+        api = {}
+        for export_name, api_name in ((v, k) for k, v in col_map.items()):
+            if export_name == DATE_COL:
+                api[api_name] = dates.dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+            elif export_name == COORD_COL and export_name in df.columns:
+                coords = df[COORD_COL].astype(str).str.split(",", n=1, expand=True)
+                lat, lon = pd.to_numeric(coords[0], errors="coerce"), pd.to_numeric(coords[1], errors="coerce")
+                api[api_name] = [None if np.isnan(a) else {"lon": o, "lat": a} for a, o in zip(lat, lon)]
+            elif export_name == TARGET_COL:
+                api[api_name] = pd.to_numeric(df[TARGET_COL], errors="coerce")
+            elif export_name in df.columns:
+                api[api_name] = df[export_name].astype(str).where(df[export_name].notna(), None)
+        frame = pd.DataFrame(api)
+        self.frame = frame.astype(object).where(frame.notna(), None)
+
+    @classmethod
+    def from_raw(cls, path: str, **kwargs) -> "RecordsBackend":
+        """Replay a recorded export: raw CSV or Parquet store."""
+        return cls(read_raw_input(path), **kwargs)
+
+    @classmethod
+    def synthetic(cls, n_sites: int = 20, n_hours: int = 24 * 28, start: str = "2024-09-01", seed: int = 42, **kwargs) -> "RecordsBackend":
+        return cls(make_raw_counts(n_sites, n_hours, start, seed), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def _bounds(self, where: Optional[str]) -> Tuple[int, int]:
+        lo, hi = 0, len(self.dates)
+        if not where or not where.strip():
+            return lo, hi
+        for clause in re.split(r"\s+AND\s+", where.strip(), flags=re.IGNORECASE):
+            match = _DATE_CLAUSE.match(clause.strip())
+            if match is None:
+                raise ValueError(f"Unsupported where clause: {clause!r} (date comparisons joined by AND only)")
+            op, value = match.groups()
+            ts = pd.Timestamp(value.replace("/", "-"))
+            if ts.tzinfo is not None:
+                ts = ts.tz_convert(None)
+            t = ts.asm8
+            if op in (">=", "="):
+                lo = max(lo, int(np.searchsorted(self.dates, t, "left")))
+            if op == ">":
+                lo = max(lo, int(np.searchsorted(self.dates, t, "right")))
+            if op in ("<=", "="):
+                hi = min(hi, int(np.searchsorted(self.dates, t, "right")))
+            if op == "<":
+                hi = min(hi, int(np.searchsorted(self.dates, t, "left")))
+        return lo, max(lo, hi)
+
+    def query(self, where: Optional[str] = None, limit: int = 10, offset: int = 0) -> Dict:
+        """One page: ``{"total_count": ..., "results": [...]}``. Invalid parameters raise ValueError."""
+        if not 0 < limit <= self.max_limit:
+            raise ValueError(f"Invalid value for limit API parameter: {limit} (1 to {self.max_limit})")
+        if offset < 0 or offset + limit > self.max_window:
+            raise ValueError(f"Invalid value for offset API parameter: offset + limit must be at most {self.max_window}")
+        lo, hi = self._bounds(where)
+        page = self.frame.iloc[min(lo + offset, hi):min(lo + offset + limit, hi)]
+        return {"total_count": hi - lo, "results": page.to_dict("records")}
+
+
+def _not_recorded(latitude, longitude, start_date, end_date, hourly, timezone=None, url=None):
+    raise RuntimeError(f"No recorded weather for ({latitude}, {longitude}) from {start_date} to {end_date}")
+
+
+def recorded_weather(cache_dir: str):
+    """Fetcher replaying the days of an existing weather cache directory (RuntimeError for days never fetched)."""
+    store = WeatherStore(cache_dir, fetcher=_not_recorded)
+
+    def fetcher(latitude, longitude, start_date, end_date, hourly, timezone=None, url=None):
+        return store.get(latitude, longitude, start_date, end_date, hourly, timezone)
+    return fetcher
+
+
+class WeatherBackend:
+    """
+    Open-Meteo ``/v1/archive`` responses built by a fetcher with the signature of ``fetch_weather_archive``.
+
+    The default fetcher is ``synthetic_weather``; ``recorded_weather(cache_dir)``
+    replays a weather cache.
+    """
+
+    def __init__(self, fetcher=synthetic_weather):
+        self.fetcher = fetcher
+
+    def archive(self, params: Dict[str, str]) -> Dict:
+        missing = [p for p in ("latitude", "longitude", "start_date", "end_date") if p not in params]
+        if missing:
+            raise ValueError(f"Parameter {missing[0]} is required")
+        latitude, longitude = float(params["latitude"]), float(params["longitude"])
+        if pd.Timestamp(params["start_date"]) > pd.Timestamp(params["end_date"]):
+            raise ValueError("Parameter 'start_date' must be before 'end_date'")
+        timezone = params.get("timezone")
+        response = {"latitude": latitude, "longitude": longitude, "timezone": timezone or "GMT"}
+        hourly = [v for v in params.get("hourly", "").split(",") if v]
+        if not hourly:
+            return response
+
+        df = self.fetcher(latitude, longitude, params["start_date"], params["end_date"], hourly, timezone)
+        block = {"time": pd.to_datetime(df["time"]).dt.strftime("%Y-%m-%dT%H:%M").tolist()}
+        for var in hourly:
+            values = df[var].astype(float)
+            block[var] = [None if np.isnan(v) else v for v in values.tolist()]
+        response["hourly_units"] = {"time": "iso8601"}
+        response["hourly"] = block
+        return response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    replay: "ReplayServer" = None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        status, payload = self.replay.handle(parts.path, params)
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    """
+    Local HTTP stand-in for the Paris Open Data ``/records`` API and the Open-Meteo archive.
+
+    It serves the same paths as the real APIs (``data.sources``), from a
+    RecordsBackend and a WeatherBackend, with one thread per connection.
+    Each response waits ``latency`` seconds plus up to ``jitter`` seconds,
+    and a share ``error_rate`` of the requests gets a 503, to exercise
+    retries. Used as a context manager, the server starts and points every
+    fetcher at itself (``set_data_source``) until the block exits.
+
+    Examples
+    --------
+    >>> with ReplayServer(RecordsBackend.synthetic(10, 24 * 7), latency=0.05):
+    ...     df = fetch_velib_data("2024/09/01", "2024/09/03")
+    """
+
+    def __init__(
+        self,
+        records: Optional[RecordsBackend] = None,
+        weather: Optional[WeatherBackend] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.records = records
+        self.weather = weather or WeatherBackend()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        handler = type("ReplayHandler", (_Handler,), {"replay": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+        self._previous = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def source(self) -> DataSource:
+        return DataSource.at(self.url)
+
+    def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, Dict]:
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self.jitter * self.rng.random()
+            fail = self.rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return 503, {"error_code": "ServiceUnavailable", "message": "Injected failure"}
+        # corps d'erreur au format de chaque API
+        if path.endswith("/records") and self.records is not None:
+            try:
+                return 200, self.records.query(params.get("where"), int(params.get("limit", 10)), int(params.get("offset", 0)))
+            except ValueError as e:
+                return 400, {"error_code": "InvalidRESTParameterError", "message": str(e)}
+        if path.endswith("/archive"):
+            try:
+                return 200, self.weather.archive(params)
+            except (ValueError, RuntimeError) as e:
+                return 400, {"error": True, "reason": str(e)}
+        return 404, {"error_code": "NotFound", "message": f"Unknown path {path}"}
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "ReplayServer":
+        self.start()
+        self._previous = set_data_source(self.source)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        set_data_source(self._previous)
+        self.stop()
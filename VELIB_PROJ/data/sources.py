@@ -0,0 +1,61 @@
+import os
+from typing import Optional
+
+
+# Chemins des API réelles ; un serveur local (data/replay.py) sert les mêmes chemins
+RECORDS_PATH = "/api/explore/v2.1/catalog/datasets/comptage-velo-donnees-compteurs/records"
+ARCHIVE_PATH = "/v1/archive"
+
+VELIB_URL = "https://opendata.paris.fr" + RECORDS_PATH
+WEATHER_URL = "https://archive-api.open-meteo.com" + ARCHIVE_PATH
+
+
+class DataSource:
+    """
+    Endpoints the fetchers talk to: the Paris Open Data ``/records`` API and the Open-Meteo archive.
+
+    ``DataSource.at(base_url)`` keeps the real paths under another host,
+    e.g. a local replay server.
+    """
+
+    def __init__(self, records_url: str = VELIB_URL, weather_url: str = WEATHER_URL):
+        self.records_url = records_url
+        self.weather_url = weather_url
+
+    @classmethod
+    def at(cls, base_url: str) -> "DataSource":
+        base_url = base_url.rstrip("/")
+        return cls(base_url + RECORDS_PATH, base_url + ARCHIVE_PATH)
+
+    @property
+    def is_live(self) -> bool:
+        return self.records_url == VELIB_URL and self.weather_url == WEATHER_URL
+
+    def __repr__(self) -> str:
+        return f"DataSource(records_url={self.records_url!r}, weather_url={self.weather_url!r})"
+
+
+LIVE = DataSource()
+
+_source: Optional[DataSource] = None
+
+
+def get_data_source() -> DataSource:
+    """
+    Source used by ``fetch_velib_data``, ``fetch_weather_data``, ``fetch_velib_data_parallel`` and the weather store.
+
+    ``set_data_source`` wins; otherwise ``VELIB_DATA_SOURCE`` (base URL, e.g.
+    ``http://127.0.0.1:8765``) points every fetcher at a local server;
+    otherwise the live APIs. Resolved at each call, so it can change at run time.
+    """
+    if _source is not None:
+        return _source
+    base_url = os.environ.get("VELIB_DATA_SOURCE")
+    return DataSource.at(base_url) if base_url else LIVE
+
+
+def set_data_source(source: Optional[DataSource]) -> Optional[DataSource]:
+    """Override the data source for the process (None restores the default); returns the previous override."""
+    global _source
+    previous, _source = _source, source
+    return previous
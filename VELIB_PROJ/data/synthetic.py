@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from data.preprocessing import COORD_COL, DATE_COL, SITE_COL, TARGET_COL
+
+
+# Emprise de Paris intra-muros (compteurs de la Ville)
+PARIS_LAT = (48.816, 48.901)
+PARIS_LON = (2.255, 2.415)
+STREETS = ["boulevard de Sébastopol", "rue de Rivoli", "quai de Jemmapes", "avenue de la Grande Armée",
+           "boulevard Voltaire", "rue de Rennes", "avenue Denfert Rochereau", "quai d'Austerlitz",
+           "boulevard Magenta", "rue La Fayette", "pont d'Iéna", "avenue des Champs Elysées"]
+DIRECTIONS = ["N-S", "S-N", "E-O", "O-E", "NE-SO", "SO-NE"]
+
+
+def synthetic_weather(latitude, longitude, start_date, end_date, hourly, timezone=None, url=None) -> pd.DataFrame:
+    """
+    Deterministic hourly weather with the signature of ``fetch_weather_archive`` (offline stand-in).
+
+    Values depend only on the UTC hour and the position: seasonal and daily
+    temperature cycles, rain showers drawn from a hash of the hour, wind.
+    The same hour therefore gets the same weather whatever the request
+    window, as with the real archive. Like the archive, ``time`` is naive
+    UTC, or naive local time of ``timezone`` for the local days requested,
+    so a request in the wrong timezone shows up as shifted values.
+    """
+    times = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize() + pd.Timedelta(hours=23), freq="h")
+    if timezone is not None:
+        # heures locales demandées -> instants UTC (jours de changement d'heure : 23 ou 25 heures)
+        first = times[0].tz_localize(timezone, nonexistent="shift_forward", ambiguous=True).tz_convert(None)
+        last = times[-1].tz_localize(timezone, nonexistent="shift_forward", ambiguous=False).tz_convert(None)
+        utc = pd.date_range(first, last, freq="h")
+        times = utc.tz_localize("UTC").tz_convert(timezone).tz_localize(None)
+    else:
+        utc = times
+    hours = utc.to_numpy().astype("datetime64[h]").astype(np.int64)
+    # cycles en heure solaire de Paris (~UTC+1), indépendants du fuseau de la requête
+    solar = utc + pd.Timedelta(hours=1)
+    doy, hod = solar.dayofyear.to_numpy(), solar.hour.to_numpy()
+    offset = (round(float(latitude), 2) * 100 + round(float(longitude), 2) * 1000) % 7
+
+    # Bruit pseudo-aléatoire stable : hash entier de l'heure (et de la position)
+    noise = ((hours * 2654435761 + int(offset * 1000)) % 2**32) / 2**32
+    temperature = 12.5 - 8 * np.cos(2 * np.pi * (doy - 15) / 365) - 4 * np.cos(2 * np.pi * (hod - 3) / 24) + 6 * (noise - 0.5)
+    showers = (((hours // 6) * 40503) % 2**16) / 2**16 < 0.3        # épisodes de 6 h
+    precipitation = np.where(showers & (noise < 0.7), np.round(0.2 + 5 * noise, 1), 0.0)
+    wind = np.round(4 + 28 * (((hours // 12) * 69069) % 2**16) / 2**16 + 8 * noise, 1)
+
+    values = {
+        "temperature_2m": np.round(temperature, 1),
+        "apparent_temperature": np.round(temperature - 0.1 * wind, 1),
+        "precipitation": precipitation,
+        "rain": precipitation * (temperature > 1),
+        "snowfall": np.round(precipitation * (temperature <= 1) * 0.7, 2),
+        "wind_speed_10m": wind,
+    }
+    df = pd.DataFrame({"time": times})
+    for var in hourly:
+        df[var] = values.get(var, np.round(noise, 3))
+    return df
+
+
+def make_sites(n_sites: int, seed: int = 42) -> pd.DataFrame:
+    """Counting sites: ids, names, coordinates inside Paris, installation dates and photo links."""
+    rng = np.random.default_rng(seed)
+    site_ids = 100_003_000 + rng.choice(900_000, n_sites, replace=False)
+    streets = rng.choice(STREETS, n_sites)
+    numbers = rng.integers(1, 200, n_sites)
+    installed = pd.Timestamp("2013-01-01") + pd.to_timedelta(rng.integers(0, 3650, n_sites), unit="D")
+    return pd.DataFrame({
+        SITE_COL: site_ids,
+        "nom_du_site_de_comptage": [f"{n} {s}" for n, s in zip(numbers, streets)],
+        "latitude": rng.uniform(*PARIS_LAT, n_sites),
+        "longitude": rng.uniform(*PARIS_LON, n_sites),
+        "installation": installed.strftime("%Y-%m-%d"),
+        "level": rng.lognormal(4.0, 0.6, n_sites),            # trafic moyen du site
+        "direction": rng.choice(DIRECTIONS, n_sites),
+        "photo": [rng.bytes(16).hex() for _ in range(n_sites)],
+    })
+
+
+def make_raw_counts(
+    n_sites: int = 20,
+    n_hours: int = 24 * 28,
+    start: str = "2024-09-01",
+    seed: int = 42,
+) -> pd.DataFrame:
+    """
+    Synthetic hourly counts with the schema of the ``comptage_velo_donnees_compteurs`` export.
+
+    All 16 columns are present, with the export formats: ISO dates with the
+    Paris offset, ``"lat,lon"`` coordinates, installation dates, photo links
+    and ``mois_annee_comptage``. Counts follow weekday commute peaks and
+    weekend afternoons, and they drop in the rain and the cold of
+    ``synthetic_weather``, so trained models have a signal to learn.
+    Rows are sorted by site then date, like the export.
+    """
+    rng = np.random.default_rng(seed)
+    sites = make_sites(n_sites, seed)
+    dates = pd.date_range(pd.Timestamp(start).tz_localize("Europe/Paris"), periods=n_hours, freq="h")
+    local = dates.tz_localize(None)
+    weather = synthetic_weather(48.8575, 2.3514, local[0], local[-1], ["temperature_2m", "precipitation"])
+    weather = weather.set_index("time").reindex(local, method="nearest")
+
+    hod, weekend = local.hour.to_numpy(), local.weekday.to_numpy() >= 5
+    commute = np.exp(-((hod - 8.5) ** 2) / 2) + 0.9 * np.exp(-((hod - 18) ** 2) / 3)
+    leisure = np.exp(-((hod - 15) ** 2) / 12)
+    profile = 0.08 + np.where(weekend, 0.6 * leisure, commute + 0.3 * leisure)
+    meteo = np.exp(-0.25 * weather["precipitation"].to_numpy()) * np.clip(0.5 + weather["temperature_2m"].to_numpy() / 30, 0.3, 1.1)
+
+    expected = sites["level"].to_numpy()[:, None] * profile[None, :] * meteo[None, :] * 2
+    counts = rng.poisson(expected)
+
+    iso = dates.strftime("%Y-%m-%dT%H:%M:%S%z").str.replace(r"(\d\d)(\d\d)$", r"\1:\2", regex=True)
+    n = n_sites * n_hours
+    rep = lambda col: np.repeat(sites[col].to_numpy(), n_hours)
+    site_ids = rep(SITE_COL)
+    counter_ids = np.repeat(200_000_000 + np.arange(n_sites) * 7919, n_hours)
+    photo = rep("photo")
+    return pd.DataFrame({
+        "identifiant_du_compteur": [f"{s}-{c}" for s, c in zip(site_ids, counter_ids)],
+        "nom_du_compteur": [f"{name} {d}" for name, d in zip(rep("nom_du_site_de_comptage"), rep("direction"))],
+        SITE_COL: site_ids,
+        "nom_du_site_de_comptage": rep("nom_du_site_de_comptage"),
+        TARGET_COL: counts.ravel(),
+        DATE_COL: np.tile(iso.to_numpy(), n_sites),
+        "date_d'installation_du_site_de_comptage": rep("installation"),
+        "lien_vers_photo_du_site_de_comptage": [f"https://filer.eco-counter-tools.com/file/{p[:2]}/{p}.jpg" for p in photo],
+        COORD_COL: [f"{lat:.6f},{lon:.6f}" for lat, lon in zip(rep("latitude"), rep("longitude"))],
+        "identifiant_technique_compteur": [f"Y2H{c % 10**8:08d}" for c in counter_ids],
+        "id_photos": [f"https%3A%2F%2Fwww.eco-visio.net%2FPhotos%2F{s}%2F{p}.jpg" for s, p in zip(site_ids, photo)],
+        "test_lien_vers_photos_du_site_de_comptage_": [f"https://www.eco-visio.net/Photos/{s}/{p}.jpg" for s, p in zip(site_ids, photo)],
+        "id_photo_1": [f"https%3A%2F%2Fwww.eco-visio.net%2FPhotos%2F{s}%2F{p}.jpg" for s, p in zip(site_ids, photo)],
+        "url_sites": [f"https://www.eco-visio.net/Photos/{s}" for s in site_ids],
+        "type_dimage": np.full(n, "jpg"),
+        "mois_annee_comptage": np.tile(local.strftime("%Y-%m").to_numpy(), n_sites),
+    })
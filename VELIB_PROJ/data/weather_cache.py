@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from data.profiling import record_request, timed
+from data.sources import WEATHER_URL, get_data_source
+
+
+DEFAULT_CACHE_DIR = os.environ.get("VELIB_WEATHER_CACHE", "artifacts/weather_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+@timed("fetch_weather_archive")
+def fetch_weather_archive(
+    latitude: float,
+    longitude: float,
+    start_date: str,
+    end_date: str,
+    hourly: Iterable[str],
+    timezone: Optional[str] = None,
+    url: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Fetch hourly weather from the Open-Meteo archive (no caching).
+
+    ``url`` defaults to the archive of ``get_data_source()``.
+
+    Returns
+    -------
+    pd.DataFrame
+        ``time`` (naive timestamps, UTC or ``timezone`` local time) plus one column per variable.
+    """
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "start_date": start_date,
+        "end_date": end_date,
+        "hourly": ",".join(hourly),
+    }
+    if timezone is not None:
+        params["timezone"] = timezone
+
+    response = requests.get(url or get_data_source().weather_url, params=params, timeout=30)
+    record_request(response)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Weather API error {response.status_code}")
+
+    data = response.json()
+    if "hourly" not in data:
+        raise RuntimeError("Weather API error: no 'hourly' block in response")
+
+    df_weather = pd.DataFrame(data["hourly"])
+    df_weather["time"] = pd.to_datetime(df_weather["time"])
+    return df_weather
+
+
+class WeatherStore:
+    """
+    Content-addressed on-disk store of hourly Open-Meteo archive data.
+
+    One Parquet file per (latitude, longitude, variable set, timezone, source) key holds
+    every day fetched so far. ``get`` only requests the missing days from the API,
+    merges them into the file and serves the rest from disk. Historical weather
+    does not change, so cached days are never refetched. Only complete days are
+    cached: every hour present with a value for every requested variable. Days
+    the archive has not fully published yet (today, the last days) are served
+    but fetched again on the next call. Data served by another
+    archive than the live one (``get_data_source()``, e.g. a local replay
+    server) is kept under separate keys.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory holding the Parquet files.
+    max_bytes : int
+        Size limit of the directory; least recently used files are evicted.
+    fetcher : callable
+        Function with the signature of ``fetch_weather_archive`` (override for tests).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, fetcher=fetch_weather_archive):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.fetcher = fetcher
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ keys
+    @staticmethod
+    def key(
+        latitude: float,
+        longitude: float,
+        hourly: Iterable[str],
+        timezone: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> str:
+        payload = {
+            "lat": round(float(latitude), 4),
+            "lon": round(float(longitude), 4),
+            "hourly": sorted(hourly),
+            "tz": timezone,
+        }
+        # archive autre que l'API réelle (serveur local) : fichiers distincts, les clés existantes restent valides
+        if source is not None and source != WEATHER_URL:
+            payload["source"] = source
+        payload = json.dumps(payload, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"weather_{key}.parquet"
+
+    # ------------------------------------------------------------------ I/O
+    def _read(self, path: Path) -> Optional[pd.DataFrame]:
+        if not path.exists():
+            return None
+        df = pd.read_parquet(path)
+        os.utime(path)  # LRU : l'accès rafraîchit la date de modification
+        return df
+
+    def _write(self, path: Path, df: pd.DataFrame) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+
+    def _evict(self, keep: Path) -> None:
+        files = sorted(self.cache_dir.glob("weather_*.parquet"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for p in files:
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            total -= p.stat().st_size
+            p.unlink(missing_ok=True)
+            self.evictions += 1
+
+    # ------------------------------------------------------------------ API
+    @staticmethod
+    def _missing_ranges(days: pd.DatetimeIndex, cached: set) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        # Regroupe les jours manquants en plages contiguës -> une requête par plage
+        ranges = []
+        for day in days:
+            if day in cached:
+                continue
+            if ranges and ranges[-1][1] + pd.Timedelta(days=1) == day:
+                ranges[-1] = (ranges[-1][0], day)
+            else:
+                ranges.append((day, day))
+        return ranges
+
+    @timed("weather_store.get")
+    def get(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: str,
+        end_date: str,
+        hourly: Iterable[str],
+        timezone: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Hourly weather for [start_date, end_date] (days included), fetching only missing days.
+
+        An empty range (``start_date`` after ``end_date``) gives an empty frame
+        with the ``time`` and ``hourly`` columns, without any request.
+        """
+        hourly = list(hourly)
+        days = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), freq="D")
+        if days.empty:
+            return pd.DataFrame({"time": pd.Series(dtype="datetime64[ns]"), **{v: pd.Series(dtype="float64") for v in hourly}})
+        source = get_data_source().weather_url if self.fetcher is fetch_weather_archive else None
+        path = self._path(self.key(latitude, longitude, hourly, timezone, source))
+
+        with self._lock:
+            stored = self._read(path)
+            cached = set() if stored is None else set(stored["time"].dt.normalize().unique())
+            ranges = self._missing_ranges(days, cached)
+
+            n_missing = sum((end - start).days + 1 for start, end in ranges)
+            self.misses += n_missing
+            self.hits += len(days) - n_missing
+
+            if ranges:
+                fetched = []
+                for start, end in ranges:
+                    self.requests += 1
+                    df_new = self.fetcher(
+                        latitude, longitude, f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}", hourly, timezone
+                    )
+                    fetched.append(df_new)
+
+                df_new = pd.concat(fetched, ignore_index=True)
+                # Jours incomplets (pas encore publiés, ou en partie) : servis mais pas mis en cache.
+                # En heure locale, le jour du passage à l'heure d'été n'a que 23 heures.
+                day = df_new["time"].dt.normalize()
+                hours_needed = 24 if timezone is None else 23
+                complete = df_new[hourly].notna().all(axis=1)
+                published = (
+                    complete.groupby(day).transform("all")
+                    & (df_new["time"].dt.hour.groupby(day).transform("nunique") >= hours_needed)
+                )
+                if published.any():
+                    parts = [df for df in (stored, df_new[published]) if df is not None]
+                    stored = pd.concat(parts, ignore_index=True).sort_values("time").reset_index(drop=True)
+                    self._write(path, stored)
+                parts = [df for df in (stored, df_new[~published]) if df is not None]
+                result = pd.concat(parts, ignore_index=True)
+            else:
+                result = stored
+
+        mask = (result["time"] >= days[0]) & (result["time"] < days[-1] + pd.Timedelta(days=1))
+        return result.loc[mask, ["time"] + hourly].sort_values("time").reset_index(drop=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "requests": self.requests,
+            "evictions": self.evictions,
+        }
+
+
+_default_store: Optional[WeatherStore] = None
+
+
+def get_weather_store() -> WeatherStore:
+    """Process-wide store shared by every preprocessing entry point."""
+    global _default_store
+    if _default_store is None:
+        _default_store = WeatherStore()
+    return _default_store
@@ -0,0 +1,150 @@
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+SITE_COL = "identifiant_du_site_de_comptage"
+DATE_COL = "date_et_heure_de_comptage"
+TARGET_COL = "comptage_horaire"
+
+
+def _block_rank(groups: np.ndarray) -> np.ndarray:
+    # Position de chaque ligne dans son bloc contigu (groupes déjà triés)
+    n = len(groups)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]) if n else np.array([], dtype=np.int64)
+    lengths = np.diff(np.r_[starts, n])
+    return np.arange(n) - np.repeat(starts, lengths)
+
+
+def _window_sum(values: np.ndarray, window: int) -> np.ndarray:
+    # Somme sur [i - window + 1, i] pour i >= window - 1, par différence de sommes cumulées
+    csum = np.concatenate([np.zeros(1, dtype=values.dtype), np.cumsum(values)])
+    return csum[window:] - csum[:-window]
+
+
+def _pad(col: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(n, np.nan)
+    out[n - len(col):] = col
+    return out
+
+
+def grouped_window_features(
+    groups: np.ndarray,
+    values: np.ndarray,
+    lags: Iterable[int] = (1, 24),
+    windows: Iterable[int] = (24,),
+    stats: Iterable[str] = ("mean",),
+    shift: int = 1,
+) -> dict:
+    """
+    Lag and rolling-window features per group in one pass over sorted arrays.
+
+    ``groups`` must be sorted so that each group is a contiguous block, and rows
+    inside a block must be in time order. Rolling windows are computed on the
+    series shifted by ``shift`` (only past values), from cumulative sums over the
+    flat array; windows that would cross a block boundary or contain a missing
+    value are NaN, like ``groupby(group).shift(shift).rolling(window)`` would give.
+
+    Parameters
+    ----------
+    groups : np.ndarray
+        Group key per row (sorted, contiguous blocks).
+    values : np.ndarray
+        Values per row.
+    lags : iterable of int
+        Lags to build (``lag_{k}``).
+    windows : iterable of int
+        Rolling window lengths, e.g. (3, 24, 168).
+    stats : iterable of str
+        Any of "mean", "std", "min", "max" (``rolling_{stat}_{window}``).
+    shift : int
+        Offset applied before the rolling windows.
+
+    Returns
+    -------
+    dict of np.ndarray
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    rank = _block_rank(np.asarray(groups))
+    out = {}
+
+    for k in lags:
+        col = np.full(n, np.nan)
+        col[k:] = values[:-k] if k else values
+        col[rank < k] = np.nan
+        out[f"lag_{k}"] = col
+
+    shifted = np.full(n, np.nan)
+    shifted[shift:] = values[:n - shift] if shift else values
+    isnan = np.isnan(shifted)
+    clean = np.where(isnan, 0.0, shifted)
+    nan_count = np.r_[0, np.cumsum(isnan)]
+
+    # Comptages entiers : sommes cumulées en int64, moyenne et variance exactes.
+    # Sinon, centrage pour limiter la perte de précision sur les carrés.
+    integral = n > 0 and np.abs(clean).max() < 2 ** 31 and np.array_equal(clean, np.round(clean))
+    if integral:
+        base = clean.astype(np.int64)
+        center = 0.0
+    else:
+        center = clean[~isnan].mean() if (~isnan).any() else 0.0
+        base = np.where(isnan, 0.0, shifted - center)
+
+    for w in windows:
+        invalid = rank < shift + w - 1
+        has_nan = np.ones(n, dtype=bool)
+        has_nan[w - 1:] = (nan_count[w:] - nan_count[:-w]) > 0
+        invalid |= has_nan
+
+        if "mean" in stats or "std" in stats:
+            s1 = _window_sum(base, w)
+        if "mean" in stats:
+            col = _pad(s1 / w + center, n)
+            col[invalid] = np.nan
+            out[f"rolling_mean_{w}"] = col
+        if "std" in stats:
+            s2 = _window_sum(base * base, w)
+            # w * var * (w - 1) = w * S2 - S1^2 (exact en entiers)
+            num = w * s2 - s1 * s1
+            var = num / (w * (w - 1)) if w > 1 else np.full(len(num), np.nan)
+            col = _pad(np.sqrt(np.maximum(var, 0.0)), n)
+            col[invalid] = np.nan
+            out[f"rolling_std_{w}"] = col
+        for stat, reducer, fill in (("min", np.min, np.inf), ("max", np.max, -np.inf)):
+            if stat not in stats:
+                continue
+            col = np.full(n, np.nan)
+            if n >= w:
+                col[w - 1:] = reducer(sliding_window_view(np.where(isnan, fill, shifted), w), axis=1)
+            col[invalid] = np.nan
+            out[f"rolling_{stat}_{w}"] = col
+
+    return out
+
+
+def add_window_features(
+    df: pd.DataFrame,
+    lags: Iterable[int] = (1, 24),
+    windows: Iterable[int] = (24,),
+    stats: Iterable[str] = ("mean",),
+    group_col: str = SITE_COL,
+    date_col: str = DATE_COL,
+    value_col: str = TARGET_COL,
+) -> pd.DataFrame:
+    """
+    Sort by (site, date) and add per-site lag and rolling features with grouped_window_features.
+    """
+    df = df.sort_values([group_col, date_col], kind="stable")
+    features = grouped_window_features(
+        df[group_col].to_numpy(),
+        df[value_col].to_numpy(dtype=np.float64),
+        lags=lags,
+        windows=windows,
+        stats=stats,
+    )
+    for name, col in features.items():
+        df[name] = col
+    return df
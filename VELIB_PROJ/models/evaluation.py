@@ -1,76 +1,278 @@
 import argparse
 import json
 import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from pathlib import Path
 import sys
 # Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from utils.my_utils import preprocess_data, load_model
+from data.calendar_features import SEASON_NAMES, calendar_codes
+from data.preprocessing import DATE_COL, SITE_COL, TARGET_COL
+from data.raw_store import DEFAULT_STORE_DIR, convert_csv_to_parquet, read_raw_input
+from data.profiling import stage, trace_run
+from models.predict import fill_values, score_chunks
+
+
+# Seuils des indicateurs météo (unités Open-Meteo : mm, km/h, °C)
+WINDY_KMH = 30.0
+COLD_C = 5.0
+
+
+def slice_keys(df_encoded: pd.DataFrame) -> dict:
+    """Slice value of every row for each breakdown: site, hour, season, vacances and weather flags."""
+    codes = calendar_codes(df_encoded[DATE_COL])
+    return {
+        "site": df_encoded[SITE_COL].astype(str).to_numpy(),
+        "hour": df_encoded["hour"].to_numpy(),
+        "season": SEASON_NAMES[codes["saison"]],
+        "vacances": codes["vacances"],
+        "pluie": df_encoded["precipitation"].to_numpy() > 0,
+        "vent": df_encoded["wind_speed_10m"].to_numpy() >= WINDY_KMH,
+        "froid": df_encoded["temperature_2m"].to_numpy() < COLD_C,
+    }
+
+
+def _natural_key(value: str):
+    # "2" avant "10" pour les heures, ordre alphabétique sinon
+    try:
+        return (0, float(value), "")
+    except ValueError:
+        return (1, 0.0, value)
+
+
+class MetricAccumulator:
+    """
+    Streaming MAE/RMSE/R2/bias, overall and per slice, from sufficient statistics.
+
+    For each slice value only the row count, the sums of errors, absolute
+    errors and squared errors, and the mean and M2 of the target are kept.
+    Batches (or shards) are merged by adding the sums and combining the
+    target moments with the parallel variance formula, as
+    ``SiteStatsAccumulator`` does, so the metrics do not depend on how the
+    rows were split. Slice values are stored as strings so partial results
+    round-trip through JSON.
+    """
+
+    STATS = ["n", "sum_err", "sum_abs", "sum_sq", "y_mean", "y_m2"]
+
+    def __init__(self):
+        self.slices = {}
+
+    def update(self, y: np.ndarray, preds: np.ndarray, keys: dict) -> None:
+        y = np.asarray(y, dtype=np.float64)
+        err = np.asarray(preds, dtype=np.float64) - y
+        for dim, values in {"all": np.zeros(len(y), dtype=np.int8), **keys}.items():
+            codes, uniques = pd.factorize(np.asarray(values))
+            size = len(uniques)
+            n = np.bincount(codes, minlength=size).astype(np.float64)
+            y_mean = np.bincount(codes, y, minlength=size) / n
+            chunk = pd.DataFrame({
+                "n": n,
+                "sum_err": np.bincount(codes, err, minlength=size),
+                "sum_abs": np.bincount(codes, np.abs(err), minlength=size),
+                "sum_sq": np.bincount(codes, err ** 2, minlength=size),
+                "y_mean": y_mean,
+                "y_m2": np.bincount(codes, (y - y_mean[codes]) ** 2, minlength=size),
+            }, index=pd.Index(np.asarray(uniques).astype(str), name=dim))
+            self.slices[dim] = self._combine(self.slices.get(dim), chunk)
+
+    @staticmethod
+    def _combine(a, b):
+        if a is None:
+            return b
+        a, b = a.align(b, join="outer", fill_value=0.0)
+        n = a["n"] + b["n"]
+        delta = b["y_mean"] - a["y_mean"]
+        return pd.DataFrame({
+            "n": n,
+            "sum_err": a["sum_err"] + b["sum_err"],
+            "sum_abs": a["sum_abs"] + b["sum_abs"],
+            "sum_sq": a["sum_sq"] + b["sum_sq"],
+            "y_mean": a["y_mean"] + delta * b["n"] / n,
+            "y_m2": a["y_m2"] + b["y_m2"] + delta ** 2 * a["n"] * b["n"] / n,
+        })
+
+    def merge(self, other: "MetricAccumulator") -> "MetricAccumulator":
+        for dim, stats in other.slices.items():
+            self.slices[dim] = self._combine(self.slices.get(dim), stats)
+        return self
+
+    @staticmethod
+    def _metrics(s: pd.DataFrame) -> pd.DataFrame:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return pd.DataFrame({
+                "n_rows": s["n"].astype(np.int64),
+                "MAE": s["sum_abs"] / s["n"],
+                "RMSE": np.sqrt(s["sum_sq"] / s["n"]),
+                "R2": (1 - s["sum_sq"] / s["y_m2"]).where(s["y_m2"] > 0),
+                "bias": s["sum_err"] / s["n"],
+            }, index=s.index)
+
+    def slice_table(self) -> pd.DataFrame:
+        """One row per (slice, value) with n_rows, MAE, RMSE, R2 and bias."""
+        frames = []
+        for dim, stats in self.slices.items():
+            if dim == "all":
+                continue
+            table = self._metrics(stats.loc[sorted(stats.index, key=_natural_key)])
+            frames.append(table.rename_axis("value").reset_index().assign(slice=dim))
+        table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["slice", "value"])
+        return table[["slice", "value", *[c for c in table.columns if c not in ("slice", "value")]]]
+
+    def result(self) -> dict:
+        """Overall metrics (MAE, RMSE, R2, n_rows) plus ``slices``: {slice: {value: metrics}}."""
+        overall = self._metrics(self.slices["all"]).iloc[0]
+        out = {
+            "MAE": float(overall["MAE"]),
+            "RMSE": float(overall["RMSE"]),
+            "R2": float(overall["R2"]),
+            "n_rows": int(overall["n_rows"]),
+            "slices": {},
+        }
+        table = self.slice_table()
+        for dim, part in table.groupby("slice", sort=False):
+            out["slices"][dim] = {
+                row["value"]: {k: (None if pd.isna(row[k]) else float(row[k])) if k != "n_rows" else int(row[k])
+                               for k in ("n_rows", "MAE", "RMSE", "R2", "bias")}
+                for _, row in part.iterrows()
+            }
+        return out
+
+    def to_dict(self) -> dict:
+        return {dim: {"index": stats.index.tolist(), **{c: stats[c].tolist() for c in self.STATS}}
+                for dim, stats in self.slices.items()}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "MetricAccumulator":
+        acc = cls()
+        for dim, cols in state.items():
+            acc.slices[dim] = pd.DataFrame({c: cols[c] for c in cls.STATS}, index=pd.Index(cols["index"], name=dim))
+        return acc
+
+
+def shard_sites(data: str, n_shards: int) -> list:
+    """
+    Split the site ids in ``n_shards`` groups (stable hash).
+
+    Lags are per site, so a shard computes them alone; the fill medians and
+    the weather station depend on every site and are computed once over the
+    whole store (``fill_values``) and passed to each shard.
+    """
+    sites = read_raw_input(data, columns=[SITE_COL])[SITE_COL].astype(str).unique()
+    shards = [[] for _ in range(n_shards)]
+    for site in sites:
+        shards[zlib.crc32(site.encode()) % n_shards].append(site)
+    return shards
+
+
+def evaluate_chunked(model, data: str, chunk_rows: int = 200_000, sites=None, fill=None) -> MetricAccumulator:
+    """One streaming pass over the Parquet store: each chunk is scored, accumulated and dropped."""
+    acc = MetricAccumulator()
+    for df_encoded, _, preds in score_chunks(model, data, chunk_rows, sites=sites, fill=fill):
+        acc.update(df_encoded[TARGET_COL].to_numpy(), preds, slice_keys(df_encoded))
+    return acc
+
+
+def _evaluate_shard(model_path: str, data: str, chunk_rows: int, sites: list, fill: dict) -> dict:
+    return evaluate_chunked(load_model(model_path), data, chunk_rows, sites, fill).to_dict()
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--data", default="comptage_velo_donnees_compteurs.csv", help="Path to raw CSV to evaluate on (default: comptage_velo_donnees_compteurs.csv). Run `python scripts/update_data.py` to fetch data if missing.")
-    parser.add_argument("--model", default="artifacts/model.pkl", help="Path to trained model.pkl")
+    parser.add_argument("--data", default="comptage_velo_donnees_compteurs.csv", help="Path to raw CSV or Parquet store to evaluate on (default: comptage_velo_donnees_compteurs.csv). Run `python scripts/update_data.py` to fetch data if missing.")
+    parser.add_argument("--model", default="artifacts/model", help="Path to trained model (artifact directory or legacy .pkl)")
     parser.add_argument("--out", default="artifacts/eval_metrics.json", help="Where to save eval metrics")
+    parser.add_argument("--slices-out", default="artifacts/eval_slices.csv", help="Where to save the per-slice metrics table")
+    parser.add_argument("--chunk-rows", type=int, default=None,
+                        help="Stream the input in chunks of this many rows (default: evaluate the whole frame at once)")
+    parser.add_argument("--shards", type=int, default=1, help="Site shards evaluated in parallel processes (streaming only)")
+    parser.add_argument("--max-workers", type=int, default=None, help="Processes for --shards (default: one per core)")
+    parser.add_argument("--raw-store", default=DEFAULT_STORE_DIR, help="Parquet store a CSV is converted to before streaming")
+    parser.add_argument("--partial-out", default=None, help="Also save the accumulated statistics (JSON) for a later --merge")
+    parser.add_argument("--merge", nargs="+", default=None, help="Merge --partial-out files from other runs instead of evaluating")
+    parser.add_argument("--trace-out", default=None, help="Stage timings JSON (default: eval_trace.json next to --out)")
+    parser.add_argument("--profile", action="store_true", help="Also dump a cProfile .prof and collapsed stacks (.folded) next to the trace")
     args = parser.parse_args()
 
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    trace_out = args.trace_out or os.path.join(os.path.dirname(args.out) or ".", "eval_trace.json")
+    with trace_run(trace_out, profile=args.profile):
+        run(args)
 
-    model_path = Path(args.model)
-    if not model_path.exists():
-        raise FileNotFoundError(
-            f"Model file '{args.model}' not found. Train a model first with:\n  python models/train.py --data <raw_csv> --model-out {args.model}\nOr pass a different path via --model."
-        )
 
-    model = load_model(args.model)
+def run(args):
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
 
-    data_path = Path(args.data)
-    if not data_path.exists():
-        raise FileNotFoundError(
-            f"Data file '{args.data}' not found. Run `python scripts/update_data.py` to fetch raw data, or pass --data with the correct CSV path."
-        )
+    if args.merge:
+        acc = MetricAccumulator()
+        for path in args.merge:
+            with open(path, "r", encoding="utf-8") as f:
+                acc.merge(MetricAccumulator.from_dict(json.load(f)))
+    else:
+        model_path = Path(args.model)
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"Model file '{args.model}' not found. Train a model first with:\n  python models/train.py --data <raw_csv> --model-out {args.model}\nOr pass a different path via --model."
+            )
 
-    # Try reading CSV; if the file uses semicolons (common for exported CSV), try that as a fallback
-    try:
-        df_raw = pd.read_csv(args.data)
-    except Exception as e:
-        try:
-            df_raw = pd.read_csv(args.data, sep=";")
-        except Exception as e2:
-            raise RuntimeError(
-                f"Failed to read data file '{args.data}': {e}; also tried sep=';' -> {e2}"
+        data_path = Path(args.data)
+        if not data_path.exists():
+            raise FileNotFoundError(
+                f"Data file '{args.data}' not found. Run `python scripts/update_data.py` to fetch raw data, or pass --data with the correct CSV path."
             )
 
-    df_encoded, features = preprocess_data(df_raw)
+        if args.chunk_rows or args.shards > 1:
+            data = args.data
+            if not data_path.is_dir() and data_path.suffix != ".parquet":
+                # Export CSV non trié : conversion (en chunks) vers le store partitionné par mois
+                data = str(convert_csv_to_parquet(data, args.raw_store))
+            chunk_rows = args.chunk_rows or 200_000
+            # médianes de remplissage et station météo du store entier : mêmes métriques quel que soit le découpage
+            fill = fill_values(data, chunk_rows)
+            if args.shards > 1:
+                shards = [s for s in shard_sites(data, args.shards) if s]
+                acc = MetricAccumulator()
+                with ProcessPoolExecutor(max_workers=args.max_workers) as pool:
+                    for state in pool.map(_evaluate_shard, *zip(*[(args.model, data, chunk_rows, s, fill) for s in shards])):
+                        acc.merge(MetricAccumulator.from_dict(state))
+            else:
+                acc = evaluate_chunked(load_model(args.model), data, chunk_rows, fill=fill)
+        else:
+            # CSV (separator sniffed from the header, ';' for the Open Data export) or Parquet store
+            try:
+                df_raw = read_raw_input(args.data)
+            except Exception as e:
+                raise RuntimeError(f"Failed to read data file '{args.data}': {e}")
 
-    if "comptage_horaire" not in df_encoded.columns:
-        raise ValueError(
-            f"Cannot evaluate: 'comptage_horaire' not found after preprocessing. Columns present after preprocess: {list(df_encoded.columns)}"
-        )
+            df_encoded, features = preprocess_data(df_raw)
 
-    X = df_encoded[features]
-    y = df_encoded["comptage_horaire"]
+            if "comptage_horaire" not in df_encoded.columns:
+                raise ValueError(
+                    f"Cannot evaluate: 'comptage_horaire' not found after preprocessing. Columns present after preprocess: {list(df_encoded.columns)}"
+                )
 
-    preds = model.predict(X)
+            with stage("predict", rows=len(df_encoded)):
+                preds = load_model(args.model).predict(df_encoded[features])
+            acc = MetricAccumulator()
+            acc.update(df_encoded["comptage_horaire"].to_numpy(), preds, slice_keys(df_encoded))
 
-    metrics = {
-        "MAE": float(mean_absolute_error(y, preds)),
-        "RMSE": float(np.sqrt(mean_squared_error(y, preds))),
-        "R2": float(r2_score(y, preds)),
-        "n_rows": int(len(df_encoded)),
-    }
+    if args.partial_out:
+        with open(args.partial_out, "w", encoding="utf-8") as f:
+            json.dump(acc.to_dict(), f)
 
+    metrics = acc.result()
     with open(args.out, "w", encoding="utf-8") as f:
         json.dump(metrics, f, indent=2)
+    if args.slices_out:
+        acc.slice_table().to_csv(args.slices_out, index=False)
 
     print(" Evaluation done.")
     print("Saved:", args.out)
-    print(metrics)
+    print({k: v for k, v in metrics.items() if k != "slices"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMRegressor
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import load_model
+from data.raw_store import read_raw_input
+from data.preprocessing import DATE_COL, LAG_FEATURES, MODEL_FEATURES, SITE_COL, TARGET_COL
+from models.serve import ScoringService, _hour_index, _site_key, lag_features
+
+
+def _forecast_frame(keys, hours, preds) -> pd.DataFrame:
+    """Long format: one row per (site, hour), sites major."""
+    n_sites, horizon = preds.shape
+    return pd.DataFrame({
+        SITE_COL: np.repeat(keys, horizon),
+        DATE_COL: np.tile(hours.astype("datetime64[h]").astype("datetime64[us]"), n_sites),
+        "horizon": np.tile(np.arange(1, horizon + 1), n_sites),
+        "prediction_comptage_horaire": preds.ravel(),
+    })
+
+
+class RecursiveForecaster:
+    """
+    Multi-hour forecasts from the one-step model, every site advanced together.
+
+    The 24 known counts before ``start`` and the ``horizon`` predicted ones
+    sit in one preallocated (sites x 24 + horizon) array. At each step the
+    lag features are read from its sliding 24-hour window, the hour-level
+    features come from the service's hour table, and all sites are scored in
+    one ``predict`` call whose output becomes the next step's ``lag_1``.
+    Features are built exactly as ScoringService does (same medians for
+    unknown lags), so a step predicts what the service would.
+    """
+
+    def __init__(self, service: ScoringService):
+        self.service = service
+        self.features = service.features
+        self.site_col = self.features.index(SITE_COL)
+        self.hour_cols = [self.features.index(c) for c in service.hour_features]
+        self.lag_cols = [self.features.index(c) for c in LAG_FEATURES]
+        self.lag_medians = np.array([service.lag_medians[c] for c in LAG_FEATURES])
+
+    def forecast_array(self, sites, start, horizon: int) -> np.ndarray:
+        keys = [_site_key(s) for s in sites]
+        h0 = int(_hour_index([pd.Timestamp(start).to_datetime64()])[0])
+        hours = h0 + np.arange(horizon)
+
+        counts = np.empty((len(keys), 24 + horizon), dtype=np.float64)
+        counts[:, :24] = self.service.state.recent_counts(keys, np.full(len(keys), h0))
+        hour_rows = self.service._table_rows(hours)
+
+        X = np.empty((len(keys), len(self.features)), dtype=np.float64)
+        X[:, self.site_col] = pd.to_numeric(pd.Series(keys), errors="coerce").to_numpy()
+        frame = pd.DataFrame(X, columns=self.features, copy=False)
+        for t in range(horizon):
+            lags = lag_features(counts[:, t:t + 24])
+            values = np.column_stack([lags[c] for c in LAG_FEATURES])
+            X[:, self.lag_cols] = np.where(np.isnan(values), self.lag_medians, values)
+            X[:, self.hour_cols] = hour_rows[t]
+            counts[:, 24 + t] = self.service.model.predict(frame)
+        return counts[:, 24:]
+
+    def forecast(self, sites, start, horizon: int) -> pd.DataFrame:
+        keys = [_site_key(s) for s in sites]
+        h0 = int(_hour_index([pd.Timestamp(start).to_datetime64()])[0])
+        return _forecast_frame(keys, h0 + np.arange(horizon), self.forecast_array(keys, start, horizon))
+
+
+class DirectForecaster:
+    """
+    Direct multi-horizon model: one LightGBM fed with the lags known at the
+    forecast origin, the hour-level features of the target hour and the
+    horizon, so all (site, hour) pairs of a forecast are scored in a single
+    ``predict`` call and errors do not compound from step to step.
+
+    Training pairs are drawn from the history: every (site, origin hour) with
+    ``horizons_per_origin`` random horizons in 1..``horizon`` whose target
+    count is known.
+    """
+
+    def __init__(self, service: ScoringService, horizon: int = 48, model_params=None, horizons_per_origin: int = 4, seed: int = 42):
+        self.service = service
+        self.horizon = horizon
+        self.horizons_per_origin = horizons_per_origin
+        self.seed = seed
+        self.features = [SITE_COL, *service.hour_features, *LAG_FEATURES, "horizon"]
+        self.lag_medians = np.array([service.lag_medians[c] for c in LAG_FEATURES])
+        self.model = LGBMRegressor(**(model_params or dict(
+            n_estimators=400, learning_rate=0.05, num_leaves=63, subsample=0.8, subsample_freq=1,
+            colsample_bytree=0.8, random_state=seed, n_jobs=-1, verbose=-1,
+        )))
+
+    def _matrix(self, site_values, hour_rows, lags, horizons) -> pd.DataFrame:
+        lags = np.where(np.isnan(lags), self.lag_medians, lags)
+        X = np.column_stack([site_values, hour_rows, lags, horizons]).astype(np.float64)
+        return pd.DataFrame(X, columns=self.features, copy=False)
+
+    def fit(self, history: pd.DataFrame) -> "DirectForecaster":
+        encoded, _ = MODEL_FEATURES.transform(history)
+        keys = encoded[SITE_COL].map(_site_key).to_numpy()
+        sites, rows = np.unique(keys, return_inverse=True)
+        hours = _hour_index(encoded[DATE_COL].to_numpy())
+        first = int(hours.min())
+        grid = np.full((len(sites), int(hours.max()) - first + 1), np.nan)
+        grid[rows, hours - first] = encoded[TARGET_COL].to_numpy(dtype=np.float64)
+
+        # origines : chaque heure ayant 24 h d'historique, horizons tirés au hasard
+        rng = np.random.default_rng(self.seed)
+        site_idx, origin = np.meshgrid(np.arange(len(sites)), np.arange(24, grid.shape[1]), indexing="ij")
+        site_idx, origin = np.repeat(site_idx.ravel(), self.horizons_per_origin), np.repeat(origin.ravel(), self.horizons_per_origin)
+        horizons = rng.integers(1, self.horizon + 1, len(origin))
+        target = origin + horizons - 1
+        keep = target < grid.shape[1]
+        site_idx, origin, horizons, target = site_idx[keep], origin[keep], horizons[keep], target[keep]
+        y = grid[site_idx, target]
+        keep = ~np.isnan(y)
+        site_idx, origin, horizons, target, y = site_idx[keep], origin[keep], horizons[keep], target[keep], y[keep]
+
+        windows = grid[site_idx[:, None], origin[:, None] - np.arange(24, 0, -1)]
+        lags = lag_features(windows)
+        X = self._matrix(
+            pd.to_numeric(pd.Series(sites[site_idx]), errors="coerce").to_numpy(),
+            self.service._table_rows(first + target),
+            np.column_stack([lags[c] for c in LAG_FEATURES]),
+            horizons,
+        )
+        self.model.fit(X, y)
+        return self
+
+    def forecast_array(self, sites, start, horizon: int) -> np.ndarray:
+        if horizon > self.horizon:
+            raise ValueError(f"Direct model trained for {self.horizon} hours, {horizon} requested")
+        keys = [_site_key(s) for s in sites]
+        h0 = int(_hour_index([pd.Timestamp(start).to_datetime64()])[0])
+        lags = lag_features(self.service.state.recent_counts(keys, np.full(len(keys), h0)))
+        lags = np.column_stack([lags[c] for c in LAG_FEATURES])
+        X = self._matrix(
+            np.repeat(pd.to_numeric(pd.Series(keys), errors="coerce").to_numpy(), horizon),
+            np.tile(self.service._table_rows(h0 + np.arange(horizon)), (len(keys), 1)),
+            np.repeat(lags, horizon, axis=0),
+            np.tile(np.arange(1, horizon + 1), len(keys)),
+        )
+        return self.model.predict(X).reshape(len(keys), horizon)
+
+    def forecast(self, sites, start, horizon: int) -> pd.DataFrame:
+        keys = [_site_key(s) for s in sites]
+        h0 = int(_hour_index([pd.Timestamp(start).to_datetime64()])[0])
+        return _forecast_frame(keys, h0 + np.arange(horizon), self.forecast_array(keys, start, horizon))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast the next hours of every counting site")
+    parser.add_argument("--model", default="artifacts/model", help="Path to trained model (artifact directory or legacy .pkl)")
+    parser.add_argument("--history", required=True, help="Raw CSV or Parquet store: lag state, weather and, for --method direct, training pairs")
+    parser.add_argument("--method", choices=["recursive", "direct"], default="recursive")
+    parser.add_argument("--horizon", type=int, default=48, help="Hours to forecast")
+    parser.add_argument("--start", default=None, help="First forecast hour (default: the hour after the last observation)")
+    parser.add_argument("--out", default="artifacts/forecast.csv", help="Output CSV path")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    history = read_raw_input(args.history)
+    service = ScoringService(load_model(args.model), history)
+    sites = list(service.state.site_index)
+    start = args.start or str(pd.Timestamp(int(service.state.hours.max()) + 1, unit="h"))
+
+    if args.method == "direct":
+        t0 = time.perf_counter()
+        forecaster = DirectForecaster(service, horizon=args.horizon).fit(history)
+        print(f"Direct model trained in {time.perf_counter() - t0:.1f}s")
+    else:
+        forecaster = RecursiveForecaster(service)
+
+    t0 = time.perf_counter()
+    forecast = forecaster.forecast(sites, start, args.horizon)
+    print(f"{args.method}: {len(sites)} sites x {args.horizon} h from {start} in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+    forecast.to_csv(args.out, index=False)
+    print(" Forecast saved to:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,276 @@
 import argparse
 import os
+import queue
+import threading
+import time
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from pathlib import Path
 import sys
 # Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from utils.my_utils import preprocess_data, load_model
+from data.dtypes import downcast_features
+from data.feature_store import LagFeatureStore
+from data.preprocessing import (
+    DATE_COL,
+    LAG_FEATURES,
+    MODEL_FEATURES,
+    MODEL_WEATHER,
+    SITE_COL,
+    TARGET_COL,
+    add_model_weather,
+    station_position,
+)
+from data.raw_store import DEFAULT_STORE_DIR, convert_csv_to_parquet, iter_raw_chunks, read_raw_input
+from data.profiling import peak_memory_mb, stage, trace_run
+
+
+def prediction_frame(df_encoded: pd.DataFrame, preds: np.ndarray) -> pd.DataFrame:
+    out = {
+        DATE_COL: df_encoded[DATE_COL].to_numpy(),
+        SITE_COL: df_encoded[SITE_COL].astype(str).to_numpy(),
+        "prediction_comptage_horaire": preds,
+    }
+    if TARGET_COL in df_encoded.columns:
+        actual = df_encoded[TARGET_COL].to_numpy(dtype=np.float64)
+        out["actual_comptage_horaire"] = actual
+        out["abs_error"] = np.abs(actual - preds)
+    return pd.DataFrame(out)
+
+
+class BackgroundWriter:
+    """
+    Appends prediction chunks to a Parquet or CSV file (chosen by extension) from a background thread.
+
+    At most ``max_pending`` chunks wait in the queue: when the disk is
+    slower than scoring, ``write`` blocks instead of piling chunks up in
+    memory. An error in the writer thread is raised by the next ``write``
+    or by ``close``.
+    """
+
+    def __init__(self, path: str, max_pending: int = 2):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.error is not None:
+            raise self.error
+        t0 = time.perf_counter()
+        self.queue.put(df)
+        self.wait_seconds += time.perf_counter() - t0
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.worker.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self) -> None:
+        writer, handle = None, None
+        try:
+            while (df := self.queue.get()) is not None:
+                if self.error is not None:
+                    continue  # on vide la file pour ne pas bloquer le producteur
+                t0 = time.perf_counter()
+                try:
+                    if self.parquet:
+                        table = pa.Table.from_pandas(df, preserve_index=False)
+                        if writer is None:
+                            writer = pq.ParquetWriter(self.path, table.schema)
+                        writer.write_table(table.cast(writer.schema))
+                    else:
+                        if handle is None:
+                            handle = open(self.path, "w", encoding="utf-8", newline="")
+                        df.to_csv(handle, index=False, header=self.rows == 0)
+                    self.rows += len(df)
+                except Exception as e:
+                    self.error = e
+                self.busy_seconds += time.perf_counter() - t0
+        finally:
+            if writer is not None:
+                writer.close()
+            if handle is not None:
+                handle.close()
+
+
+def _median_of_counts(counts: pd.Series) -> float:
+    # médiane de pandas à partir des effectifs par valeur : moyenne des deux valeurs centrales si n est pair
+    counts = counts.groupby(level=0).sum().sort_index()
+    n = int(counts.sum())
+    if n == 0:
+        return np.nan
+    cum, values = counts.cumsum().to_numpy(), counts.index.to_numpy(dtype=np.float64)
+    lo = values[np.searchsorted(cum, (n - 1) // 2, side="right")]
+    hi = values[np.searchsorted(cum, n // 2, side="right")]
+    return float((lo + hi) / 2)
+
+
+def fill_values(data: str, chunk_rows: int = 200_000) -> dict:
+    """
+    Weather station position and fill medians of a whole raw Parquet store, for ``score_chunks(fill=...)``.
+
+    One pass over the store builds the lags of every row and counts the
+    values of each lag and the rows of each hour, so the medians of
+    ``LAG_FEATURES`` and of ``MODEL_WEATHER`` (weighted by rows, as after the
+    merge) are exact with memory bounded by the number of distinct values.
+    The position is that of the first site of the first chunk.
+    """
+    lag_store = LagFeatureStore()
+    lag_counts = {c: [] for c in LAG_FEATURES}
+    hour_counts, position = [], None
+
+    def count_lags(df):
+        df = lag_store.update(df)
+        for col in LAG_FEATURES:
+            lag_counts[col].append(df[col].value_counts())
+        return df
+
+    def count_hours(df):
+        nonlocal position
+        position = station_position(df) if position is None else position
+        hour_counts.append(df[DATE_COL].value_counts())
+        return df.assign(**{c: np.nan for c in MODEL_WEATHER})
+
+    with stage("fill_values") as s:
+        rows = 0
+        for raw in iter_raw_chunks(data, chunk_rows):
+            df, _ = MODEL_FEATURES.transform(raw, overrides={"lags": count_lags, "model_weather": count_hours}, finalize=False)
+            rows += len(df)
+        s.rows = rows
+
+    weather = {c: np.nan for c in MODEL_WEATHER}
+    if position is not None and hour_counts:
+        hours = pd.concat(hour_counts).groupby(level=0).sum().rename("n").rename_axis(DATE_COL).reset_index()
+        merged = add_model_weather(hours, position, medians=weather)
+        weather = {c: _median_of_counts(merged.set_index(c)["n"]) for c in MODEL_WEATHER}
+    return {
+        "position": position,
+        "lags": {c: _median_of_counts(pd.concat(lag_counts[c])) if lag_counts[c] else np.nan for c in LAG_FEATURES},
+        "weather": weather,
+    }
+
+
+def score_chunks(model, data: str, chunk_rows: int = 200_000, sites=None, fill=None):
+    """
+    Yield ``(df_encoded, features, preds)`` for the raw Parquet store, chunk by chunk with bounded memory.
+
+    Chunks come in chronological order (``iter_raw_chunks``). Lags are
+    carried from one chunk to the next by a LagFeatureStore, so they are
+    the same as on the full frame. Missing lags and weather are filled with
+    the medians of their chunk, unless ``fill`` (``fill_values`` of the whole
+    store) gives the station position and the medians: then every chunk and
+    every subset of sites gets the same fill. ``sites`` restricts scoring to
+    a subset of sites (lags stay exact because they are per site).
+    """
+    lag_store = LagFeatureStore()
+    overrides = {"lags": lag_store.update}
+    if fill is not None:
+        overrides = {
+            "lags": lambda df: lag_store.update(df).fillna(fill["lags"]),
+            "model_weather": lambda df: add_model_weather(df, fill["position"], fill["weather"]),
+        }
+    for raw in iter_raw_chunks(data, chunk_rows, sites=sites):
+        df_encoded, features = MODEL_FEATURES.transform(raw, overrides=overrides, finalize=False)
+        if df_encoded.empty:
+            continue
+        df_encoded = downcast_features(df_encoded, verbose=False)
+        with stage("predict", rows=len(df_encoded)):
+            preds = model.predict(df_encoded[features])
+        yield df_encoded, features, preds
+
+
+def predict_chunked(model, data: str, out: str, chunk_rows: int = 200_000) -> dict:
+    """
+    Score a raw Parquet store with ``score_chunks`` and append the predictions to ``out``.
+
+    A BackgroundWriter writes each chunk while the next one is scored.
+
+    Returns
+    -------
+    dict
+        Rows, chunks, elapsed seconds, rows/sec, writer busy/wait seconds, peak memory (MB).
+    """
+    writer = BackgroundWriter(out)
+    rows, chunks = 0, 0
+    t0 = time.perf_counter()
+    try:
+        for df_encoded, _, preds in score_chunks(model, data, chunk_rows):
+            writer.write(prediction_frame(df_encoded, preds))
+            rows += len(df_encoded)
+            chunks += 1
+            print(f"Chunk {chunks}: {len(df_encoded)} rows, {rows / (time.perf_counter() - t0):,.0f} rows/s")
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - t0
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else float("nan"),
+        "writer_busy_seconds": writer.busy_seconds,
+        "writer_wait_seconds": writer.wait_seconds,
+        "peak_memory_mb": peak_memory_mb(),
+    }
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--data", required=True, help="Path to raw CSV to predict on")
-    parser.add_argument("--model", default="artifacts/model.pkl", help="Path to trained model.pkl")
-    parser.add_argument("--out", default="artifacts/predictions.csv", help="Output CSV path")
+    parser.add_argument("--data", required=True, help="Path to raw CSV or Parquet store to predict on")
+    parser.add_argument("--model", default="artifacts/model", help="Path to trained model (artifact directory or legacy .pkl)")
+    parser.add_argument("--out", default="artifacts/predictions.csv", help="Output path (.csv or .parquet)")
+    parser.add_argument("--chunk-rows", type=int, default=None,
+                        help="Stream the input in chunks of this many rows with bounded memory (default: score everything at once)")
+    parser.add_argument("--raw-store", default=DEFAULT_STORE_DIR, help="Parquet store a CSV is converted to before streaming")
+    parser.add_argument("--trace-out", default=None, help="Stage timings JSON (default: predict_trace.json next to --out)")
+    parser.add_argument("--profile", action="store_true", help="Also dump a cProfile .prof and collapsed stacks (.folded) next to the trace")
     args = parser.parse_args()
 
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    trace_out = args.trace_out or os.path.join(os.path.dirname(args.out) or ".", "predict_trace.json")
+    with trace_run(trace_out, profile=args.profile):
+        run(args)
 
-    model = load_model(args.model)
-
-    df_raw = pd.read_csv(args.data)
-    df_encoded, features = preprocess_data(df_raw)
 
-    X = df_encoded[features]
-    preds = model.predict(X)
+def run(args):
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
 
-    out_df = df_encoded[["date_et_heure_de_comptage", "identifiant_du_site_de_comptage"]].copy()
-    out_df["prediction_comptage_horaire"] = preds
+    model = load_model(args.model)
 
-    if "comptage_horaire" in df_encoded.columns:
-        out_df["actual_comptage_horaire"] = df_encoded["comptage_horaire"].values
-        out_df["abs_error"] = (out_df["actual_comptage_horaire"] - out_df["prediction_comptage_horaire"]).abs()
+    if args.chunk_rows:
+        data = args.data
+        if not Path(data).is_dir() and Path(data).suffix != ".parquet":
+            # Export CSV non trié : conversion (en chunks) vers le store partitionné par mois
+            data = str(convert_csv_to_parquet(data, args.raw_store))
+        stats = predict_chunked(model, data, args.out, args.chunk_rows)
+    else:
+        t0 = time.perf_counter()
+        with stage("read_raw") as s:
+            df_raw = read_raw_input(args.data)
+            s.rows = len(df_raw)
+        df_encoded, features = preprocess_data(df_raw)
+        with stage("predict", rows=len(df_encoded)):
+            out_df = prediction_frame(df_encoded, model.predict(df_encoded[features]))
+        if args.out.endswith(".parquet"):
+            out_df.to_parquet(args.out, index=False)
+        else:
+            out_df.to_csv(args.out, index=False)
+        elapsed = time.perf_counter() - t0
+        stats = {"rows": len(out_df), "seconds": elapsed, "rows_per_second": len(out_df) / elapsed, "peak_memory_mb": peak_memory_mb()}
 
-    out_df.to_csv(args.out, index=False)
+    peak = f"{stats['peak_memory_mb']:.0f} MB" if stats["peak_memory_mb"] is not None else "n/a"
+    print(f"Scored {stats['rows']:,} rows in {stats['seconds']:.1f}s ({stats['rows_per_second']:,.0f} rows/s), peak memory {peak}")
+    if args.chunk_rows:
+        print(f"Writer: {stats['writer_busy_seconds']:.1f}s writing, scoring blocked {stats['writer_wait_seconds']:.1f}s")
     print(" Predictions saved to:", args.out)
 
 
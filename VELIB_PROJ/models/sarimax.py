@@ -0,0 +1,77 @@
+import argparse
+import os
+import time
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import fit_sites_sarimax, load_sarimax, save_sarimax, site_series
+from data.raw_store import read_raw_input
+
+
+def extend_models(models, df):
+    """Filter the observations newer than each model's last timestamp (no refit)."""
+    series = site_series(df, history_days=None)
+    series.columns = series.columns.astype(str)
+    extended = 0
+    for site, model in models.items():
+        if site not in series.columns:
+            continue
+        new = series[site].reindex(pd.date_range(model.end + pd.Timedelta(hours=1), series.index[-1], freq="h"))
+        if len(new):
+            model.extend(new.to_numpy())
+            extended += 1
+    missing = sorted(set(series.columns) - set(models))
+    if missing:
+        print(f"⚠️ {len(missing)} sites without a fitted model (run without --extend to fit them): {missing[:5]}")
+    return extended
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-site seasonal ARIMA baselines (one model per counting site)")
+    parser.add_argument("--data", required=True, help="Path to raw CSV or Parquet store (scripts/convert_raw.py)")
+    parser.add_argument("--out", default="artifacts/sarimax", help="Directory of the fitted models and filter states")
+    parser.add_argument("--extend", action="store_true", help="Update the saved models with the new observations instead of refitting")
+    parser.add_argument("--history-days", type=int, default=28, help="Days of hourly history used for fitting")
+    parser.add_argument("--search", action="store_true", help="Bounded stepwise order search on the seed sites")
+    parser.add_argument("--seeds", type=int, default=None, help="Seed sites fitted first (default: max(workers, 4))")
+    parser.add_argument("--max-workers", type=int, default=None, help="Process pool size (default: one per core)")
+    parser.add_argument("--maxiter", type=int, default=50, help="Optimizer iterations per fit")
+    parser.add_argument("--forecast-hours", type=int, default=0, help="Also write each site's forecast for this many hours")
+    parser.add_argument("--forecast-out", default="artifacts/sarimax_forecast.csv", help="Where to save the forecasts")
+    args = parser.parse_args()
+
+    df = read_raw_input(args.data)
+    t0 = time.perf_counter()
+    if args.extend:
+        models = load_sarimax(args.out)
+        extended = extend_models(models, df)
+        print(f"Extended {extended} site models in {time.perf_counter() - t0:.1f}s")
+    else:
+        models = fit_sites_sarimax(
+            df,
+            history_days=args.history_days,
+            search=args.search,
+            n_seeds=args.seeds,
+            max_workers=args.max_workers,
+            maxiter=args.maxiter,
+        )
+        warm = [m.info for m in models.values() if m.info.get("warm_started")]
+        print(f"Fitted {len(models)} site models in {time.perf_counter() - t0:.1f}s "
+              f"({len(warm)} warm-started from a neighbouring site)")
+    save_sarimax(models, args.out)
+    print("Saved models:", args.out)
+
+    if args.forecast_hours:
+        os.makedirs(os.path.dirname(args.forecast_out) or ".", exist_ok=True)
+        forecasts = pd.concat(
+            {site: model.forecast(args.forecast_hours) for site, model in models.items()}, names=["identifiant_du_site_de_comptage", "date_et_heure_de_comptage"]
+        ).rename("prediction").reset_index()
+        forecasts.to_csv(args.forecast_out, index=False)
+        print("Saved forecasts:", args.forecast_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+import argparse
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import flat_predictor, load_model
+from data.raw_store import read_raw_input
+from data.preprocessing import (
+    DATE_COL,
+    LAG_FEATURES,
+    MODEL_FEATURES,
+    MODEL_WEATHER,
+    SITE_COL,
+    TARGET_COL,
+)
+
+
+def _hour_index(dates) -> np.ndarray:
+    """Absolute hour number of naive timestamps (hours since 1970-01-01)."""
+    return np.asarray(dates, dtype="datetime64[h]").astype(np.int64)
+
+
+def parse_hours(hours) -> np.ndarray:
+    """Requested hours as naive UTC datetime64 (ValueError on an empty list, a missing or unparseable hour)."""
+    if not isinstance(hours, list) or not hours:
+        raise ValueError("'hours' must be a non-empty list")
+    dates = pd.to_datetime(pd.Series(hours, dtype=object).astype(str), utc=True).dt.tz_convert(None)
+    if dates.isna().any():
+        raise ValueError("'hours' contains a missing value")
+    return dates.to_numpy()
+
+
+def _site_key(site) -> str:
+    # 100003096, 100003096.0 et "100003096" désignent le même site
+    try:
+        return str(int(float(site)))
+    except (TypeError, ValueError):
+        return str(site)
+
+
+class HourlyCountState:
+    """
+    In-memory per-site counts of the last ``window`` hours, indexed by absolute hour.
+
+    Serves ``lag_1``, ``lag_24`` and ``rolling_mean_24`` for any requested hour:
+    a lag is known when the count of that exact hour has been observed, NaN
+    otherwise (e.g. hours beyond the last observation).
+    """
+
+    def __init__(self, window: int = 24):
+        if window < 24:
+            raise ValueError("window must be >= 24 to serve lag_24 and rolling_mean_24")
+        self.window = window
+        self.site_index = {}
+        self.counts = np.full((0, window), np.nan, dtype=np.float32)
+        self.hours = np.full((0, window), -1, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def _rows(self, sites, create: bool) -> np.ndarray:
+        keys = [_site_key(s) for s in sites]
+        if create:
+            new_sites = [s for s in dict.fromkeys(keys) if s not in self.site_index]
+            if new_sites:
+                for s in new_sites:
+                    self.site_index[s] = len(self.site_index)
+                n_new = len(new_sites)
+                self.counts = np.vstack([self.counts, np.full((n_new, self.window), np.nan, dtype=np.float32)])
+                self.hours = np.vstack([self.hours, np.full((n_new, self.window), -1, dtype=np.int64)])
+        return np.fromiter((self.site_index.get(s, -1) for s in keys), dtype=np.int64, count=len(keys))
+
+    def observe(self, sites, hours: np.ndarray, counts: np.ndarray) -> None:
+        """Store observed counts; an older hour never overwrites a newer one in its slot."""
+        order = np.argsort(hours, kind="stable")
+        hours, counts = np.asarray(hours)[order], np.asarray(counts, dtype=np.float32)[order]
+        with self.lock:
+            rows = self._rows(np.asarray(sites, dtype=object)[order], create=True)
+            slots = hours % self.window
+            newer = hours >= self.hours[rows, slots]
+            rows, slots = rows[newer], slots[newer]
+            self.counts[rows, slots] = counts[newer]
+            self.hours[rows, slots] = hours[newer]
+
+    def copy(self) -> "HourlyCountState":
+        state = HourlyCountState(self.window)
+        with self.lock:
+            state.site_index = dict(self.site_index)
+            state.counts, state.hours = self.counts.copy(), self.hours.copy()
+        return state
+
+    def recent_counts(self, sites, hours: np.ndarray) -> np.ndarray:
+        """Counts of the 24 hours before each hour, oldest first: column 0 is h-24, column 23 is h-1 (NaN when unknown)."""
+        with self.lock:
+            rows = self._rows(sites, create=False)
+            need = hours[:, None] - np.arange(24, 0, -1)     # h-24 ... h-1
+            slots = need % self.window
+            safe_rows = np.maximum(rows, 0)[:, None]
+            valid = (self.hours[safe_rows, slots] == need) & (rows[:, None] >= 0)
+            return np.where(valid, self.counts[safe_rows, slots], np.nan).astype(np.float64)
+
+    def lag_features(self, sites, hours: np.ndarray) -> dict:
+        """``lag_1``, ``lag_24`` and ``rolling_mean_24`` (float64, NaN when unknown)."""
+        return lag_features(self.recent_counts(sites, hours))
+
+
+def lag_features(values: np.ndarray) -> dict:
+    """LAG_FEATURES of windows of the 24 previous counts (oldest first)."""
+    return {
+        "lag_1": values[:, -1],
+        "lag_24": values[:, 0],
+        "rolling_mean_24": values.mean(axis=1),
+    }
+
+
+class ScoringService:
+    """
+    The trained pipeline plus the state needed to build MODEL_FEATURES online.
+
+    Features that only depend on the hour (calendar, cyclic, weather) are
+    computed once per hour with the shared feature registry and kept in a
+    table indexed by absolute hour; lags come from the in-memory
+    HourlyCountState. A request is then assembled with a few array gathers
+    into one float matrix. Missing lags or weather are filled with the medians
+    of the history, as ``fill_lag_medians`` and the weather fill do in training.
+
+    Parameters
+    ----------
+    model : sklearn Pipeline or ModelArtifact
+    history : pd.DataFrame
+        Raw counts used to seed the lag state, the weather table and the medians.
+    window : int
+        Hours of counts kept per site.
+    horizon_days : int
+        Days after the history covered by the hour table at startup (later
+        hours are added on demand).
+    max_horizon_hours : int
+        Latest hour served, counted from the last observed hour. Hours before
+        the history or beyond it are rejected (``check_hours``), which bounds
+        the size of the hour table.
+    """
+
+    def __init__(self, model, history: pd.DataFrame, window: int = 24, horizon_days: int = 14,
+                 max_horizon_hours: int = 24 * 31):
+        # Prétraitement replié dans un seul passage NumPy devant le booster (sans ColumnTransformer)
+        self.model = flat_predictor(model)
+        self.features = MODEL_FEATURES.features
+        self.hour_features = [c for c in self.features if c != SITE_COL and c not in LAG_FEATURES]
+        self.state = HourlyCountState(window=window)
+        self.table_lock = threading.Lock()
+        self.max_horizon_hours = max_horizon_hours
+        self.last_observed = None
+
+        encoded, _ = MODEL_FEATURES.transform(history)
+        self.lag_medians = {c: float(encoded[c].median()) for c in LAG_FEATURES}
+        weather = encoded.drop_duplicates(DATE_COL).sort_values(DATE_COL)
+        self.weather_hours = _hour_index(weather[DATE_COL].to_numpy())
+        self.weather_values = weather[MODEL_WEATHER].to_numpy(dtype=np.float64)
+        self.weather_medians = np.nanmedian(self.weather_values, axis=0) if len(weather) else np.full(len(MODEL_WEATHER), np.nan)
+
+        # Seules les `window` dernières heures de chaque site sont conservées
+        recent = encoded.groupby(SITE_COL, sort=False, observed=True).tail(window)
+        self.observe(recent[SITE_COL].to_numpy(), recent[DATE_COL].to_numpy(), recent[TARGET_COL].to_numpy())
+
+        first = int(self.weather_hours.min()) if len(self.weather_hours) else int(_hour_index([np.datetime64("now")])[0])
+        last = int(self.weather_hours.max()) if len(self.weather_hours) else first
+        self.first_hour = first
+        if self.last_observed is None:
+            self.last_observed = last
+        self.table_start = first
+        self.table = self._hour_rows(np.arange(first, last + 24 * horizon_days + 1))
+
+    def observe(self, sites, dates, counts) -> None:
+        hours = _hour_index(dates)
+        self.state.observe(sites, hours, counts)
+        if len(hours):
+            latest = int(hours.max())
+            self.last_observed = latest if self.last_observed is None else max(self.last_observed, latest)
+
+    def check_hours(self, dates) -> None:
+        """ValueError when an hour is before the history or more than ``max_horizon_hours`` after the last observation."""
+        hours = _hour_index(dates)
+        last = self.last_observed + self.max_horizon_hours
+        if int(hours.min()) < self.first_hour or int(hours.max()) > last:
+            raise ValueError(
+                f"hours must be between {pd.Timestamp(self.first_hour, unit='h')} and {pd.Timestamp(last, unit='h')}"
+            )
+
+    def _weather(self, df: pd.DataFrame) -> pd.DataFrame:
+        hours = _hour_index(df[DATE_COL].to_numpy())
+        pos = np.searchsorted(self.weather_hours, hours)
+        found = pos < len(self.weather_hours)
+        found[found] = self.weather_hours[pos[found]] == hours[found]
+        values = np.tile(self.weather_medians, (len(hours), 1))
+        values[found] = self.weather_values[pos[found]]
+        values = np.where(np.isnan(values), self.weather_medians, values)
+        for j, col in enumerate(MODEL_WEATHER):
+            df[col] = values[:, j]
+        return df
+
+    def _hour_rows(self, hours: np.ndarray) -> np.ndarray:
+        """Hour-level features of ``hours`` from the registry transforms (one row per hour)."""
+        df = pd.DataFrame({
+            SITE_COL: np.nan,
+            DATE_COL: hours.astype("datetime64[h]").astype("datetime64[us]"),
+            TARGET_COL: np.nan,
+        })
+        df, _ = MODEL_FEATURES.transform(
+            df,
+            clean=False,
+            overrides={
+                "lags": lambda d: d.assign(**{c: 0.0 for c in LAG_FEATURES}),
+                "coordinates": lambda d: d,
+                "model_weather": self._weather,
+            },
+            finalize=False,
+        )
+        return df[self.hour_features].to_numpy(dtype=np.float64)
+
+    def _table_rows(self, hours: np.ndarray) -> np.ndarray:
+        with self.table_lock:
+            lo = min(self.table_start, int(hours.min()))
+            hi = max(self.table_start + len(self.table) - 1, int(hours.max()))
+            if lo < self.table_start or hi >= self.table_start + len(self.table):
+                # Heures hors table : table étendue une fois, réutilisée ensuite
+                before = self._hour_rows(np.arange(lo, self.table_start)) if lo < self.table_start else self.table[:0]
+                end = self.table_start + len(self.table)
+                after = self._hour_rows(np.arange(end, hi + 1)) if hi >= end else self.table[:0]
+                self.table = np.vstack([before, self.table, after])
+                self.table_start = lo
+            return self.table[hours - self.table_start]
+
+    def feature_frame(self, sites, dates) -> pd.DataFrame:
+        keys = [_site_key(s) for s in sites]
+        hours = _hour_index(pd.to_datetime(pd.Series(dates)).to_numpy())
+
+        X = np.empty((len(keys), len(self.features)), dtype=np.float64)
+        X[:, self.features.index(SITE_COL)] = pd.to_numeric(pd.Series(keys), errors="coerce").to_numpy()
+        X[:, [self.features.index(c) for c in self.hour_features]] = self._table_rows(hours)
+        lags = self.state.lag_features(keys, hours)
+        for col, values in lags.items():
+            X[:, self.features.index(col)] = np.where(np.isnan(values), self.lag_medians[col], values)
+        return pd.DataFrame(X, columns=self.features)
+
+    def predict(self, sites, dates) -> np.ndarray:
+        return self.model.predict(self.feature_frame(sites, dates))
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests into one ``predict`` call.
+
+    A single worker thread takes the first queued request, then keeps
+    collecting requests for at most ``max_wait_ms`` (or until ``max_rows``
+    rows are queued), scores them together and resolves each request's Future
+    with its own slice of the predictions.
+    """
+
+    def __init__(self, predict_fn, max_rows: int = 4096, max_wait_ms: float = 1.0):
+        self.predict_fn = predict_fn
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.n_batches = 0
+        self.n_requests = 0
+        self.n_rows = 0
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, sites, dates) -> Future:
+        future = Future()
+        self.queue.put((list(sites), list(dates), future))
+        return future
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.worker.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            n_rows = len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+            while n_rows < self.max_rows:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch) -> None:
+        sites = [s for b in batch for s in b[0]]
+        dates = [d for b in batch for d in b[1]]
+        try:
+            preds = self.predict_fn(sites, dates)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.n_batches += 1
+        self.n_requests += len(batch)
+        self.n_rows += len(sites)
+        start = 0
+        for b_sites, _, future in batch:
+            future.set_result(preds[start:start + len(b_sites)])
+            start += len(b_sites)
+
+    def reset_stats(self) -> None:
+        """Zero the counters (e.g. after a warm-up), while no request is in flight."""
+        self.n_batches = self.n_requests = self.n_rows = 0
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.n_batches,
+            "requests": self.n_requests,
+            "rows": self.n_rows,
+            "mean_requests_per_batch": self.n_requests / self.n_batches if self.n_batches else 0.0,
+        }
+
+
+def make_handler(service: ScoringService, batcher: MicroBatcher):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        """
+        POST /predict  {"site": 100003096, "hours": ["2025-10-01T08:00", ...]}
+        POST /observe  {"site": ..., "hours": [...], "counts": [...]}
+        GET  /health
+        """
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Réponses courtes : pas d'attente Nagle / ACK retardé sur les connexions persistantes
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._reply(404, {"error": f"unknown path {self.path}"})
+            self._reply(200, {"status": "ok", "sites": len(service.state.site_index), **batcher.stats()})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                req = json.loads(self.rfile.read(length) or b"{}")
+                hours = req["hours"]
+                # Heures validées ici : une heure invalide ne fait échouer que sa requête, pas tout le micro-batch
+                dates = parse_hours(hours)
+                service.check_hours(dates)
+                sites = [req["site"]] * len(hours)
+            except (ValueError, KeyError, TypeError) as e:
+                return self._reply(400, {"error": f"invalid request: {e}"})
+
+            if self.path == "/predict":
+                try:
+                    preds = batcher.submit(sites, dates).result()
+                except Exception as e:
+                    return self._reply(500, {"error": str(e)})
+                return self._reply(200, {"site": req["site"], "hours": hours, "predictions": [float(p) for p in preds]})
+            if self.path == "/observe":
+                try:
+                    counts = np.asarray(req.get("counts", []), dtype=np.float32)
+                    if counts.shape != (len(hours),):
+                        raise ValueError("'counts' must have one value per hour")
+                    service.observe(sites, dates, counts)
+                except (ValueError, TypeError) as e:
+                    return self._reply(400, {"error": f"invalid request: {e}"})
+                return self._reply(200, {"observed": len(hours)})
+            self._reply(404, {"error": f"unknown path {self.path}"})
+
+    return ScoringHandler
+
+
+# ===========================================================
+#  LOAD GENERATOR
+# ===========================================================
+def run_load_test(url: str, sites, start: str, hours_per_request: int = 6, concurrency: int = 8,
+                  n_requests: int = 2000, timeout: float = 10.0) -> dict:
+    """
+    Send ``n_requests`` /predict requests from ``concurrency`` persistent connections.
+
+    Each request asks for ``hours_per_request`` consecutive hours of a random
+    site starting at a random hour of the day after ``start``.
+
+    Returns
+    -------
+    dict
+        Latency percentiles (ms), throughput and error count.
+    """
+    target = urlparse(url)
+    rng = np.random.default_rng(0)
+    starts = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, 24, n_requests), unit="h")
+    picks = rng.integers(0, len(sites), n_requests)
+    bodies = [
+        json.dumps({
+            "site": sites[p],
+            "hours": [str(t) for t in pd.date_range(s, periods=hours_per_request, freq="h")],
+        }).encode("utf-8")
+        for s, p in zip(starts, picks)
+    ]
+
+    def client(worker: int):
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=timeout)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        latencies, errors = [], 0
+        for body in bodies[worker::concurrency]:
+            t0 = time.perf_counter()
+            conn.request("POST", "/predict", body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            latencies.append(time.perf_counter() - t0)
+            errors += resp.status != 200
+        conn.close()
+        return latencies, errors
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    latencies = np.array([lat for lats, _ in results for lat in lats]) * 1000
+    return {
+        "requests": int(len(latencies)),
+        "errors": int(sum(err for _, err in results)),
+        "concurrency": concurrency,
+        "hours_per_request": hours_per_request,
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP scoring service for the trained pipeline")
+    parser.add_argument("--model", default="artifacts/model", help="Path to trained model (artifact directory or legacy .pkl)")
+    parser.add_argument("--history", default=None, help="Raw CSV or Parquet store used to seed lag state, weather and fill medians")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-rows", type=int, default=4096, help="Rows coalesced into one predict call at most")
+    parser.add_argument("--max-wait-ms", type=float, default=1.0, help="How long a batch waits for more requests")
+    parser.add_argument("--max-horizon-hours", type=int, default=24 * 31, help="Latest hour served, after the last observed hour (later hours get a 400)")
+    parser.add_argument("--load-test", action="store_true", help="Start the server, run the load generator against it and exit")
+    parser.add_argument("--url", default=None, help="Load test: target an already running service instead (e.g. http://127.0.0.1:8765)")
+    parser.add_argument("--sites", default=None, help="Load test with --url: comma-separated site ids")
+    parser.add_argument("--start", default=None, help="Load test with --url: first requested hour")
+    parser.add_argument("--concurrency", type=int, default=8, help="Load test: concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="Load test: total requests")
+    parser.add_argument("--hours", type=int, default=6, help="Load test: hours per request")
+    parser.add_argument("--target-p99-ms", type=float, default=20.0, help="Load test: p99 latency target")
+    args = parser.parse_args()
+
+    if args.load_test and args.url:
+        if not args.sites or not args.start:
+            raise ValueError("--url needs --sites and --start")
+        sites = args.sites.split(",")
+        run_load_test(args.url, sites, args.start, args.hours, concurrency=2, n_requests=20)
+        report = run_load_test(args.url, sites, args.start, args.hours, args.concurrency, args.requests)
+        print(json.dumps(report, indent=2))
+        return
+
+    if not args.history:
+        raise ValueError("--history is required to start the service")
+    model_path = Path(args.model)
+    if not model_path.exists():
+        raise FileNotFoundError(
+            f"Model file '{args.model}' not found. Train a model first with:\n  python models/train.py --data <raw_csv> --model-out {args.model}\nOr pass a different path via --model."
+        )
+
+    t0 = time.perf_counter()
+    service = ScoringService(load_model(args.model), read_raw_input(args.history), max_horizon_hours=args.max_horizon_hours)
+    batcher = MicroBatcher(service.predict, max_rows=args.max_batch_rows, max_wait_ms=args.max_wait_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, batcher))
+    server.daemon_threads = True
+    url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"Scoring service ready in {time.perf_counter() - t0:.1f}s on {url} ({len(service.state.site_index)} sites)")
+
+    if not args.load_test:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            batcher.close()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sites = list(service.state.site_index)
+    start = pd.Timestamp(service.weather_hours.max(), unit="h") if len(service.weather_hours) else pd.Timestamp.now().floor("D")
+    # Préchauffage (premier appel LightGBM / sklearn)
+    run_load_test(url, sites, str(start), args.hours, concurrency=2, n_requests=20)
+    batcher.reset_stats()
+    report = run_load_test(url, sites, str(start), args.hours, args.concurrency, args.requests)
+    # compteurs du micro-batcher à part : "requests" reste celui du générateur de charge
+    report["batcher"] = batcher.stats()
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+    print(json.dumps(report, indent=2))
+    status = "OK" if report["p99_ms"] <= args.target_p99_ms else "ABOVE TARGET"
+    print(f"p99 {report['p99_ms']:.1f} ms (target {args.target_p99_ms:.0f} ms): {status}")
+
+
+if __name__ == "__main__":
+    main()
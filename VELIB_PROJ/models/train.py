@@ -7,7 +7,9 @@ from pathlib import Path
 import sys
 # Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from utils.my_utils import preprocess_data, train_final_model, save_model
+from utils.my_utils import preprocess_data, train_final_model, save_model, load_model, warm_start_model
+from data.raw_store import read_raw_input
+from data.profiling import stage, trace_run
 
 
 REQUIRED_COLUMNS = {
@@ -38,21 +40,90 @@ def validate_schema(df: pd.DataFrame):
         )
 
 
+def run_warm_start(args, df_encoded, features, model_params, previous_metrics):
+    """
+    Continue boosting the previous model on the rows ingested since its training.
+
+    Returns ``(model, metrics)``, or ``None`` without a previous model. The
+    test metrics of the last full training are kept and the warm-start
+    metrics go under ``metrics["warm_start"]``; a full retrain is needed when
+    ``metrics["warm_start"]["drift"]["tripped"]`` is set.
+    """
+    previous_path = args.warm_start_from or args.model_out
+    if not os.path.exists(previous_path):
+        print(f"Warm start: no previous model at {previous_path}, full retrain.")
+        return None
+
+    dates = df_encoded["date_et_heure_de_comptage"]
+    if previous_metrics.get("data_end"):
+        since = pd.Timestamp(previous_metrics["data_end"])
+    else:
+        since = dates.max() - pd.Timedelta(days=args.window_days)
+    window = df_encoded[dates > since].sort_values("date_et_heure_de_comptage", kind="stable")
+    if window.empty:
+        print(f"Warm start: no new rows since {since}, model unchanged.")
+        return load_model(previous_path), previous_metrics
+
+    model, warm = warm_start_model(
+        load_model(previous_path),
+        window[features],
+        window["comptage_horaire"],
+        model_params,
+        n_estimators=args.warm_trees,
+        valid_ratio=args.warm_valid_ratio,
+        early_stopping_rounds=args.early_stopping_rounds,
+        encoders=args.encoders,
+        drift_tolerance=args.drift_tolerance,
+    )
+    # référence du drift : le modèle précédent sur les mêmes lignes de validation (pas le MAE du test complet)
+    drift = warm["drift"]
+    print(f"Warm start on {len(window)} rows since {since}: MAE {warm['MAE']:.3f} (previous model {drift['reference_MAE']:.3f})")
+    if drift["tripped"]:
+        print(f"Drift guard tripped (> +{drift['tolerance']:.0%}), full retrain.")
+    metrics = {**previous_metrics, "warm_start": warm, "data_end": str(window["date_et_heure_de_comptage"].max())}
+    return model, metrics
+
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--data", required=True, help="Path to raw training CSV")
-    parser.add_argument("--model-out", default="artifacts/model.pkl", help="Where to save trained model")
+    parser.add_argument("--data", required=True, help="Path to raw training CSV or Parquet store (scripts/convert_raw.py)")
+    parser.add_argument("--model-out", default="artifacts/model", help="Where to save trained model (artifact directory; a .pkl path keeps the pickle format)")
     parser.add_argument("--metrics-out", default="artifacts/metrics.json", help="Where to save metrics json")
     parser.add_argument("--test-ratio", type=float, default=0.10, help="Chronological test split ratio")
+    parser.add_argument("--valid-ratio", type=float, default=0.10, help="Share of the training window held out (at its end) for early stopping; 0 disables it")
+    parser.add_argument("--early-stopping-rounds", type=int, default=100, help="Stop when the validation MAE has not improved for this many trees")
+    parser.add_argument("--time-budget", type=float, default=None, help="Wall-clock budget in seconds for the boosting loop")
+    parser.add_argument("--dataset-cache", default="artifacts/dataset_cache", help="Directory caching the binned LightGBM Dataset between runs")
+    parser.add_argument("--no-dataset-cache", action="store_true", help="Build the LightGBM Dataset from scratch and leave the cache untouched")
+    parser.add_argument("--params", default=None, help="JSON of tuned LightGBM parameters (models/tune.py) overriding the defaults")
+    parser.add_argument("--warm-start", action="store_true", help="Continue boosting the previous model on the rows ingested since it was trained")
+    parser.add_argument("--warm-start-from", default=None, help="Previous model (default: --model-out)")
+    parser.add_argument("--warm-trees", type=int, default=100, help="Trees added at most by a warm start")
+    parser.add_argument("--warm-valid-ratio", type=float, default=0.2, help="Share of the new window held out to check the warm-started model")
+    parser.add_argument("--window-days", type=float, default=1.0, help="New window length when the previous metrics have no data_end")
+    parser.add_argument("--encoders", choices=["frozen", "extend"], default="frozen", help="Keep the previous encoders as is, or add the new target-encoded categories")
+    parser.add_argument("--drift-tolerance", type=float, default=0.2, help="Full retrain when the warm-started MAE exceeds the previous model's MAE on the same rows by this fraction")
+    parser.add_argument("--trace-out", default=None, help="Stage timings JSON (default: trace.json next to --metrics-out)")
+    parser.add_argument("--profile", action="store_true", help="Also dump a cProfile .prof and collapsed stacks (.folded) next to the trace")
     args = parser.parse_args()
 
+    trace_out = args.trace_out or os.path.join(os.path.dirname(args.metrics_out) or ".", "trace.json")
+    with trace_run(trace_out, profile=args.profile):
+        run(args)
+
+
+def run(args):
     os.makedirs(os.path.dirname(args.model_out), exist_ok=True)
     os.makedirs(os.path.dirname(args.metrics_out), exist_ok=True)
 
-    df_raw = pd.read_csv(args.data)
+    with stage("read_raw") as s:
+        df_raw = read_raw_input(args.data)
+        s.rows = len(df_raw)
     validate_schema(df_raw)
 
     df_encoded, features = preprocess_data(df_raw)
+    # preprocess_data trie par site puis date : ordre chronologique pour les blocs test / validation de fin
+    df_encoded = df_encoded.sort_values("date_et_heure_de_comptage", kind="stable").reset_index(drop=True)
 
     X = df_encoded[features]
     y = df_encoded["comptage_horaire"]
@@ -70,6 +141,27 @@ def main():
         random_state=42,
         n_jobs=-1,
     )
+    if args.params:
+        with open(args.params, "r", encoding="utf-8") as f:
+            model_params.update(json.load(f))
+        model_params["n_jobs"] = -1
+
+    previous_metrics = {}
+    if os.path.exists(args.metrics_out):
+        with open(args.metrics_out, "r", encoding="utf-8") as f:
+            previous_metrics = json.load(f)
+
+    result = run_warm_start(args, df_encoded, features, model_params, previous_metrics) if args.warm_start else None
+    if result is not None and not result[1].get("warm_start", {}).get("drift", {}).get("tripped"):
+        pipeline, metrics = result
+        if metrics is not previous_metrics:
+            save_model(pipeline, args.model_out)
+            with open(args.metrics_out, "w", encoding="utf-8") as f:
+                json.dump(metrics, f, indent=2)
+        print("\n Warm start done.")
+        print("Saved model:", args.model_out)
+        print("Metrics:", metrics)
+        return
 
     pipeline, metrics = train_final_model(
         X=X,
@@ -78,9 +170,19 @@ def main():
         target_cols=target_cols,
         numeric_cols=numeric_cols,
         test_size_ratio=args.test_ratio,
+        valid_ratio=args.valid_ratio,
+        early_stopping_rounds=args.early_stopping_rounds if args.valid_ratio > 0 else None,
+        time_budget=args.time_budget,
+        dataset_cache=None if args.no_dataset_cache else args.dataset_cache,
     )
+    # dernière date vue à l'entraînement : début de la fenêtre du prochain --warm-start
+    split_idx = int(len(X) * (1 - args.test_ratio))
+    metrics["data_end"] = str(df_encoded["date_et_heure_de_comptage"].iloc[:split_idx].max())
+    if result is not None:
+        metrics["warm_start_fallback"] = result[1]["warm_start"]["drift"]
 
-    save_model(pipeline, args.model_out)
+    with stage("save_model"):
+        save_model(pipeline, args.model_out)
 
     with open(args.metrics_out, "w", encoding="utf-8") as f:
         json.dump(metrics, f, indent=2)
@@ -88,6 +190,10 @@ def main():
     print("\n Training done.")
     print("Saved model:", args.model_out)
     print("Saved metrics:", args.metrics_out)
+    training = metrics["training"]
+    if "dataset_cache" in training:
+        print(f"Dataset cache: {training['dataset_cache']} ({training['dataset_seconds']:.1f}s)")
+    print(f"Trees: {training['best_iteration']} kept / {training['trees_built']} built ({training['stopping_reason']}, {training['seconds_per_tree'] * 1e3:.1f} ms/tree)")
     print("Metrics:", metrics)
 
 
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `utils.my_utils` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.my_utils import preprocess_data, tune_hyperparameters
+from data.raw_store import read_raw_input
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward cross-validated hyperparameter search for the LightGBM model")
+    parser.add_argument("--data", required=True, help="Path to raw training CSV or Parquet store (scripts/convert_raw.py)")
+    parser.add_argument("--out", default="artifacts/best_params.json", help="Where to save the best parameters (read by train.py --params)")
+    parser.add_argument("--results-out", default="artifacts/tuning_results.json", help="Where to save every candidate's fold scores")
+    parser.add_argument("--n-iter", type=int, default=20, help="Random search candidates")
+    parser.add_argument("--n-splits", type=int, default=5, help="TimeSeriesSplit folds")
+    parser.add_argument("--gap", type=int, default=0, help="Rows skipped between each fold's training and validation blocks")
+    parser.add_argument("--early-stopping-rounds", type=int, default=50, help="Early stopping patience on each fold")
+    parser.add_argument("--max-estimators", type=int, default=3000, help="Trees cap per fold (early stopping picks the actual count)")
+    parser.add_argument("--max-workers", type=int, default=None, help="Fold workers (default: one per core, LightGBM threads share the rest)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    os.makedirs(os.path.dirname(args.results_out), exist_ok=True)
+
+    df_encoded, features = preprocess_data(read_raw_input(args.data))
+    X = df_encoded[features]
+    y = df_encoded["comptage_horaire"]
+
+    # preprocess_data trie par site puis date : ordre chronologique pour les plis walk-forward
+    order = df_encoded["date_et_heure_de_comptage"].argsort(kind="stable")
+    X, y = X.iloc[order].reset_index(drop=True), y.iloc[order].reset_index(drop=True)
+
+    target_cols = ["identifiant_du_site_de_comptage"]
+    numeric_cols = [c for c in features if c not in target_cols]
+
+    base_params = dict(
+        n_estimators=args.max_estimators,
+        max_depth=-1,
+        random_state=args.seed,
+    )
+
+    best, results = tune_hyperparameters(
+        X,
+        y,
+        target_cols=target_cols,
+        numeric_cols=numeric_cols,
+        base_params=base_params,
+        n_iter=args.n_iter,
+        n_splits=args.n_splits,
+        gap=args.gap,
+        early_stopping_rounds=args.early_stopping_rounds,
+        max_workers=args.max_workers,
+        seed=args.seed,
+    )
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(best, f, indent=2)
+    with open(args.results_out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print("\n Tuning done.")
+    print(f"Best CV MAE: {results[0]['MAE']:.3f} (+/- {results[0]['MAE_std']:.3f})")
+    print("Saved best params:", args.out)
+    print("Best params:", best)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import argparse
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `data.raw_store` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.raw_store import DEFAULT_STORE_DIR, convert_csv_to_parquet
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="comptage_velo_donnees_compteurs.csv", help="Path to raw CSV export")
+    parser.add_argument("--out", default=DEFAULT_STORE_DIR, help="Parquet dataset directory (partitioned by month and site)")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="CSV rows read per chunk")
+    parser.add_argument("--sep", default=None, help="CSV separator (sniffed from the header if omitted)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the store matches the CSV")
+    args = parser.parse_args()
+
+    convert_csv_to_parquet(args.data, args.out, chunksize=args.chunksize, sep=args.sep, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
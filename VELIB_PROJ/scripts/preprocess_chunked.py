@@ -0,0 +1,26 @@
+import argparse
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `data.chunked` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.chunked import preprocess_csv_chunked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="comptage_velo_donnees_compteurs.csv", help="Path to raw CSV export")
+    parser.add_argument("--out", default="artifacts/features.parquet", help="Output Parquet file with encoded features")
+    parser.add_argument("--chunksize", type=int, default=200_000, help="CSV rows read per chunk")
+    parser.add_argument("--sep", default=None, help="CSV separator (sniffed from the header if omitted)")
+    args = parser.parse_args()
+
+    features = preprocess_csv_chunked(args.data, args.out, chunksize=args.chunksize, sep=args.sep)
+
+    print("\n Preprocessing done.")
+    print("Saved features:", args.out)
+    print("Features:", features)
+
+
+if __name__ == "__main__":
+    main()
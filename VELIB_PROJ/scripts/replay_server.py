@@ -0,0 +1,43 @@
+import argparse
+
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path when running as a script so imports like `data.replay` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.replay import RecordsBackend, ReplayServer, WeatherBackend, recorded_weather
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Paris Open Data /records API and the Open-Meteo archive")
+    parser.add_argument("--data", default=None, help="Recorded raw CSV export or Parquet store to serve (default: synthetic counts)")
+    parser.add_argument("--synthetic", default="20x672", help="Synthetic counts as SITESxHOURS when --data is not given")
+    parser.add_argument("--start", default="2024-09-01", help="First hour of the synthetic counts")
+    parser.add_argument("--weather-cache", default=None, help="Weather cache directory to replay (default: synthetic weather)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    args = parser.parse_args()
+
+    if args.data:
+        records = RecordsBackend.from_raw(args.data)
+    else:
+        n_sites, n_hours = (int(v) for v in args.synthetic.lower().split("x"))
+        records = RecordsBackend.synthetic(n_sites, n_hours, args.start)
+    weather = WeatherBackend(recorded_weather(args.weather_cache)) if args.weather_cache else WeatherBackend()
+
+    server = ReplayServer(records, weather, args.host, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"Serving {len(records):,} records on {server.url}")
+    print(f"Point the fetchers at it with: export VELIB_DATA_SOURCE={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"{server.requests} requests served ({server.errors} injected errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,6 @@ set -euo pipefail
 
 PY=${PY:-"../.venv/bin/python"}
 DATA=${1:-"comptage_velo_donnees_compteurs.csv"}
-MODEL=${2:-"artifacts/model.pkl"}
+MODEL=${2:-"artifacts/model"}
 OUT=${3:-"artifacts/predictions.csv"}
 exec "$PY" models/predict.py --data "$DATA" --model "$MODEL" --out "$OUT" "$@"
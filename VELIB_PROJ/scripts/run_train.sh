@@ -3,5 +3,5 @@ set -euo pipefail
 
 PY=${PY:-"../.venv/bin/python"}
 DATA=${1:-"comptage_velo_donnees_compteurs.csv"}
-MODEL_OUT=${2:-"artifacts/model.pkl"}
+MODEL_OUT=${2:-"artifacts/model"}
 exec "$PY" models/train.py --data "$DATA" --model-out "$MODEL_OUT" "$@"
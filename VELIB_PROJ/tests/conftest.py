@@ -0,0 +1,4 @@
+from pathlib import Path
+import sys
+# Ensure project root is on sys.path so imports like `data.raw_store` work
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import data.weather_cache as weather_cache
+from data.raw_store import convert_csv_to_parquet
+from data.synthetic import make_raw_counts, synthetic_weather
+from data.weather_cache import WeatherStore
+
+
+@pytest.fixture
+def offline_weather(tmp_path, monkeypatch):
+    monkeypatch.setattr(weather_cache, "_default_store", WeatherStore(str(tmp_path / "weather"), fetcher=synthetic_weather))
+
+
+@pytest.fixture
+def store_and_model(tmp_path, offline_weather):
+    from utils.my_utils import preprocess_data, save_model, train_final_model
+    from data.preprocessing import SITE_COL, TARGET_COL
+
+    csv = tmp_path / "raw.csv"
+    make_raw_counts(12, 24 * 21, "2024-09-01").to_csv(csv, sep=";", index=False)
+    store = convert_csv_to_parquet(str(csv), str(tmp_path / "store"))
+
+    df, features = preprocess_data(make_raw_counts(12, 24 * 21, "2024-09-01"))
+    numeric = [c for c in features if c != SITE_COL]
+    pipeline, _ = train_final_model(df[features], df[TARGET_COL], dict(n_estimators=30, verbose=-1), [SITE_COL], numeric)
+    save_model(pipeline, str(tmp_path / "model"))
+    return str(store), str(tmp_path / "model")
+
+
+def test_sharded_metrics_match_unsharded(store_and_model):
+    from models.evaluation import MetricAccumulator, _evaluate_shard, evaluate_chunked, shard_sites
+    from models.predict import fill_values
+    from utils.my_utils import load_model
+
+    store, model_path = store_and_model
+    fill = fill_values(store, chunk_rows=500)
+    whole = evaluate_chunked(load_model(model_path), store, chunk_rows=500, fill=fill).result()
+
+    sharded = MetricAccumulator()
+    for sites in shard_sites(store, 3):
+        sharded.merge(MetricAccumulator.from_dict(_evaluate_shard(model_path, store, 500, sites, fill)))
+    sharded = sharded.result()
+
+    assert sharded["n_rows"] == whole["n_rows"]
+    for key in ("MAE", "RMSE", "R2"):
+        assert sharded[key] == pytest.approx(whole[key], rel=1e-12)
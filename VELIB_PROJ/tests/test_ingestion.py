@@ -0,0 +1,39 @@
+import pandas as pd
+
+from data.ingestion import fetch_velib_data_parallel
+from data.replay import RecordsBackend, ReplayServer
+
+
+def _hours_since(ts: pd.Timestamp) -> float:
+    return (pd.Timestamp.now(tz="UTC") - ts) / pd.Timedelta(hours=1)
+
+
+def test_publication_lag_uses_paris_window_bounds(tmp_path):
+    # fin de la fenêtre du 1er septembre : minuit à Paris = 22:00 UTC le 1er
+    end_utc = pd.Timestamp("2024-09-01T22:00", tz="UTC")
+    with ReplayServer(RecordsBackend.synthetic(2, 24 * 3, "2024-09-01")):
+        # fenêtre terminée depuis 30 min au-delà du délai de publication : finale
+        paths = fetch_velib_data_parallel(
+            "2024/09/01", checkpoint_dir=str(tmp_path / "settled"), rate=1000, return_frame=False,
+            publication_lag=_hours_since(end_utc) - 0.5,
+        )
+        assert not paths[0].name.endswith(".partial.pkl")
+
+        # terminée depuis moins que le délai : partielle
+        paths = fetch_velib_data_parallel(
+            "2024/09/01", checkpoint_dir=str(tmp_path / "recent"), rate=1000, return_frame=False,
+            publication_lag=_hours_since(end_utc) + 0.5,
+        )
+        assert paths[0].name.endswith(".partial.pkl")
+
+
+def test_partial_window_is_replaced_by_final(tmp_path):
+    checkpoints = tmp_path / "checkpoints"
+    with ReplayServer(RecordsBackend.synthetic(2, 24 * 3, "2024-09-01")):
+        fetch_velib_data_parallel("2024/09/01", "2024/09/02", checkpoint_dir=str(checkpoints), rate=1000, publication_lag=24 * 365 * 10)
+        assert len(list(checkpoints.glob("*.partial.pkl"))) == 2
+
+        df = fetch_velib_data_parallel("2024/09/01", "2024/09/02", checkpoint_dir=str(checkpoints), rate=1000, publication_lag=0)
+
+    assert sorted(p.name for p in checkpoints.iterdir()) == ["velib_20240901T0000.pkl", "velib_20240902T0000.pkl"]
+    assert len(df) == 2 * 48
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from data.raw_store import DATE_COL, SITE_COL, TARGET_COL, convert_csv_to_parquet, read_raw_parquet
+
+
+def test_convert_more_partitions_than_arrow_default(tmp_path):
+    # 110 sites x 11 mois = 1210 partitions month/site, lignes mélangées comme un export non trié
+    sites = np.arange(100_000_000, 100_000_110)
+    dates = pd.date_range("2024-01-01T12:00", periods=11, freq="MS") + pd.Timedelta(hours=12)
+    df = pd.DataFrame({
+        SITE_COL: np.repeat(sites, len(dates)),
+        DATE_COL: np.tile(dates.strftime("%Y-%m-%dT%H:%M:%S+00:00"), len(sites)),
+        TARGET_COL: np.arange(len(sites) * len(dates)),
+    }).sample(frac=1, random_state=0)
+    csv = tmp_path / "raw.csv"
+    df.to_csv(csv, sep=";", index=False)
+
+    store = convert_csv_to_parquet(str(csv), str(tmp_path / "store"))
+
+    assert len(list(store.glob("month=*/site=*"))) == len(sites) * len(dates)
+    back = read_raw_parquet(str(store))
+    assert len(back) == len(df)
+    assert back[TARGET_COL].sum() == df[TARGET_COL].sum()
@@ -0,0 +1,25 @@
+from data.synthetic import synthetic_weather
+from data.weather_cache import WeatherStore
+
+HOURLY = ["temperature_2m", "precipitation", "wind_speed_10m"]
+
+
+def test_inverted_range_is_empty(tmp_path):
+    store = WeatherStore(str(tmp_path), fetcher=synthetic_weather)
+
+    df = store.get(48.8575, 2.3514, "2024-09-10", "2024-09-01", HOURLY)
+
+    assert df.empty
+    assert list(df.columns) == ["time"] + HOURLY
+    assert store.requests == 0
+
+
+def test_cached_days_are_not_refetched(tmp_path):
+    store = WeatherStore(str(tmp_path), fetcher=synthetic_weather)
+
+    first = store.get(48.8575, 2.3514, "2024-09-01", "2024-09-03", HOURLY)
+    again = store.get(48.8575, 2.3514, "2024-09-02", "2024-09-03", HOURLY)
+
+    assert len(first) == 3 * 24
+    assert again.equals(first.iloc[24:].reset_index(drop=True))
+    assert store.requests == 1
@@ -1,30 +1,334 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
 import pandas as pd
-import requests
 import numpy as np
 
 
+from sklearn.base import BaseEstimator, RegressorMixin
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import TimeSeriesSplit
 
 from category_encoders.target_encoder import TargetEncoder
+import lightgbm as lgb
 from lightgbm import LGBMRegressor
 import pickle
 from sklearn.pipeline import Pipeline
 # import pmdarima as pm
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 
+# Make VELIB_PROJ's `data` package importable when this module is used from the repository root
+_VELIB_PROJ = Path(__file__).resolve().parent / "VELIB_PROJ"
+if _VELIB_PROJ.is_dir() and str(_VELIB_PROJ) not in sys.path:
+    sys.path.insert(0, str(_VELIB_PROJ))
+
+from data.preprocessing import LAG_FEATURES, MODEL_FEATURES, MODEL_WEATHER, query_station_weather
+from data.profiling import stage, timed
+
 
 # ===========================================================
 #  LOAD & SAVE MODEL
 # ===========================================================
+ARTIFACT_FORMAT = "velib-model/1"
+MANIFEST_FILE = "manifest.json"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelArtifact:
+    """
+    Trained pipeline stored as flat files instead of a pickle.
+
+    The directory holds ``manifest.json`` (input feature order, preprocessing
+    blocks, SHA-256 of every file), the LightGBM booster in its native text
+    format and the TargetEncoder / StandardScaler parameters as ``.npy``
+    arrays. Loading only reads the manifest: arrays are memory-mapped and the
+    booster is parsed on first use, each file being checked against its
+    checksum when it is opened.
+
+    ``predict(X)`` reproduces ``Pipeline.predict`` of the
+    ColumnTransformer(TargetEncoder, StandardScaler) + LGBMRegressor pipeline
+    built by ``train_final_model`` through a FlatPredictor.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = Path(path)
+        self.manifest = manifest
+        self.features = manifest["features"]
+        self._booster = None
+        self._flat = None
+        self._arrays = {}
+
+    # ------------------------------------------------------------------ save
+    @classmethod
+    def save(cls, model, path):
+        flat = flat_predictor(model)
+        # écrit à côté puis remplace : le modèle précédent peut encore être mappé en mémoire (warm start)
+        final, path = Path(path), Path(path).parent / f".{Path(path).name}.tmp"
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        files, blocks = {}, []
+
+        def save_array(name, values):
+            np.save(path / name, values)
+            files[name] = _sha256(path / name)
+            return name
+
+        for i, block in enumerate(flat.blocks):
+            block = dict(block)
+            name = block.pop("name", f"block{i}")
+            if block["kind"] == "scaler":
+                block["mean"] = save_array(f"{name}_mean.npy", block["mean"])
+                block["scale"] = save_array(f"{name}_scale.npy", block["scale"])
+            else:
+                block["encoded"] = [dict(enc) for enc in block["encoded"]]
+                for k, enc in enumerate(block["encoded"]):
+                    enc["categories"] = save_array(f"{name}_{k}_categories.npy", enc["categories"])
+                    enc["values"] = save_array(f"{name}_{k}_values.npy", enc["values"])
+            blocks.append(block)
+
+        flat.booster.save_model(str(path / "booster.txt"), num_iteration=flat.num_iteration)
+        files["booster.txt"] = _sha256(path / "booster.txt")
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "features": list(flat.features),
+            "blocks": blocks,
+            "booster": "booster.txt",
+            "num_trees": int(flat.booster.num_trees() if flat.num_iteration is None else flat.num_iteration),
+            "files": files,
+        }
+        with open(path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        if final.exists():
+            shutil.rmtree(final)
+        os.replace(path, final)
+        return cls(final, manifest)
+
+    # ------------------------------------------------------------------ load
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        with open(path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Unsupported model artifact format: {manifest.get('format')!r}")
+        return cls(path, manifest)
+
+    def _verify(self, name, data=None):
+        digest = hashlib.sha256(data).hexdigest() if data is not None else _sha256(self.path / name)
+        if digest != self.manifest["files"][name]:
+            raise ValueError(f"Checksum mismatch for '{self.path / name}': the artifact is corrupted or was modified")
+
+    def array(self, name):
+        if name not in self._arrays:
+            self._verify(name)
+            self._arrays[name] = np.load(self.path / name, mmap_mode="r")
+        return self._arrays[name]
+
+    @property
+    def booster(self):
+        if self._booster is None:
+            # Fichier lu une seule fois : contrôle du checksum puis parsing depuis la mémoire
+            data = (self.path / self.manifest["booster"]).read_bytes()
+            self._verify(self.manifest["booster"], data)
+            self._booster = lgb.Booster(model_str=data.decode("utf-8"))
+        return self._booster
+
+    # ------------------------------------------------------------------ predict
+    @property
+    def flat(self):
+        """FlatPredictor over the memory-mapped arrays (booster parsed on first access)."""
+        if self._flat is None:
+            blocks = []
+            for block in self.manifest["blocks"]:
+                block = dict(block)
+                if block["kind"] == "scaler":
+                    block["mean"], block["scale"] = self.array(block["mean"]), self.array(block["scale"])
+                else:
+                    block["encoded"] = [
+                        {**enc, "categories": self.array(enc["categories"]), "values": self.array(enc["values"])}
+                        for enc in block["encoded"]
+                    ]
+                blocks.append(block)
+            self._flat = FlatPredictor(blocks, self.booster, features=self.features)
+        return self._flat
+
+    def transform(self, X):
+        return self.flat.transform(X)
+
+    def predict(self, X):
+        return self.flat.predict(X)
+
+
+def _pipeline_blocks(pipeline):
+    """
+    Preprocessing parameters of a ColumnTransformer(TargetEncoder, StandardScaler) pipeline as plain arrays.
+
+    Returns one dict per transformer, in ColumnTransformer output order:
+    ``{"kind": "scaler", "columns", "mean", "scale"}`` or
+    ``{"kind": "target_encoder", "columns", "encoded": [{"column", "categories", "values", "unknown_value", "missing_value"}]}``.
+    """
+    blocks = []
+    for name, transformer, cols in pipeline.named_steps["preprocessor"].transformers_:
+        if transformer == "drop" or name == "remainder":
+            continue
+        cols = list(cols)
+        if isinstance(transformer, StandardScaler):
+            blocks.append({
+                "kind": "scaler",
+                "name": name,
+                "columns": cols,
+                "mean": np.asarray(transformer.mean_ if transformer.with_mean else np.zeros(len(cols)), dtype=np.float64),
+                "scale": np.asarray(transformer.scale_ if transformer.with_std else np.ones(len(cols)), dtype=np.float64),
+            })
+        elif isinstance(transformer, TargetEncoder):
+            # Colonnes numériques : non encodées par TargetEncoder (passage tel quel)
+            encoded = []
+            for col in transformer.cols:
+                ordinal = next(m["mapping"] for m in transformer.ordinal_encoder.mapping if m["col"] == col)
+                values = transformer.mapping[col]
+                known = ordinal[ordinal.index.notna()]
+                nan_code = ordinal[ordinal.index.isna()]
+                encoded.append({
+                    "column": col,
+                    "categories": known.index.astype(str).to_numpy(dtype=str),
+                    "values": values.loc[known.to_numpy()].to_numpy(dtype=np.float64),
+                    "unknown_value": float(values.loc[-1]),
+                    "missing_value": float(values.loc[nan_code.iloc[0]] if len(nan_code) else values.loc[-2]),
+                })
+            blocks.append({
+                "kind": "target_encoder",
+                "name": name,
+                "columns": cols,
+                "encoded": encoded,
+                "min_samples_leaf": int(transformer.min_samples_leaf),
+                "smoothing": float(transformer.smoothing),
+            })
+        else:
+            raise TypeError(f"Cannot flatten transformer '{name}' ({type(transformer).__name__})")
+    return blocks
+
+
+class FlatPredictor:
+    """
+    The preprocessing + LightGBM pipeline folded into one NumPy pass in front of the booster.
+
+    Input columns are gathered once into a column-major float64 matrix (which
+    LightGBM reads without copying). Target-encoded columns are mapped through
+    their category table, scaled columns get ``(x - mean) / scale`` computed
+    in the same dtype as StandardScaler (float32 when every scaled column fits
+    in float32), and the booster is called directly, so predictions are
+    identical to ``Pipeline.predict`` without the ColumnTransformer overhead.
+
+    Parameters
+    ----------
+    blocks : list of dict
+        As returned by ``_pipeline_blocks``.
+    booster : lightgbm.Booster
+    num_iteration : int, optional
+        Trees used for prediction (all by default).
+    features : list of str, optional
+        Input feature order of the pipeline (``manifest["features"]``).
+    """
+
+    def __init__(self, blocks, booster, num_iteration=None, features=None):
+        self.blocks = blocks
+        self.booster = booster
+        self.num_iteration = num_iteration
+        self.features = list(features) if features is not None else [c for b in blocks for c in b["columns"]]
+        self.columns = [c for b in blocks for c in b["columns"]]
+        self.tables = {}
+        for block in blocks:
+            for enc in block.get("encoded", []):
+                # Dernière case : valeur des catégories inconnues (get_indexer renvoie -1)
+                self.tables[enc["column"]] = (
+                    pd.Index(enc["categories"]),
+                    np.append(enc["values"], enc["unknown_value"]),
+                    enc["missing_value"],
+                )
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        model = pipeline.named_steps["model"]
+        num_iteration = model.best_iteration_ if getattr(model, "best_iteration_", None) else None
+        features = pipeline.named_steps["preprocessor"].feature_names_in_
+        return cls(_pipeline_blocks(pipeline), model.booster_, num_iteration, features=features)
+
+    def transform(self, X):
+        """Column-major float64 matrix fed to the booster (ColumnTransformer output)."""
+        out = np.empty((len(X), len(self.columns)), dtype=np.float64, order="F")
+        j = 0
+        for block in self.blocks:
+            cols = block["columns"]
+            if block["kind"] == "scaler":
+                dtype = np.result_type(*[X[c].dtype for c in cols])
+                dtype = dtype if dtype in (np.float32, np.float64) else np.float64
+                for k, col in enumerate(cols):
+                    values = X[col].to_numpy(dtype=dtype, copy=True)
+                    values -= block["mean"][k]
+                    values /= block["scale"][k]
+                    out[:, j] = values
+                    j += 1
+                continue
+            for col in cols:
+                if col in self.tables:
+                    categories, table, missing_value = self.tables[col]
+                    values = X[col]
+                    out[:, j] = table[categories.get_indexer(values.astype(str))]
+                    out[values.isna().to_numpy(), j] = missing_value
+                else:
+                    out[:, j] = X[col].to_numpy(dtype=np.float64)
+                j += 1
+        return out
+
+    def predict(self, X):
+        return self.booster.predict(self.transform(X), num_iteration=self.num_iteration)
+
+
+def flat_predictor(model):
+    """FlatPredictor of a loaded model (ModelArtifact or fitted Pipeline)."""
+    if isinstance(model, ModelArtifact):
+        return model.flat
+    if isinstance(model, FlatPredictor):
+        return model
+    return FlatPredictor.from_pipeline(model)
+
+
 def save_model(model, filename):
-    with open(filename, "wb") as f:
-        pickle.dump(model, f)
+    """
+    Save a trained pipeline (or a FlatPredictor, e.g. from ``warm_start_model``).
+
+    A path ending in ``.pkl`` keeps the pickle format; any other path is
+    written as a ModelArtifact directory.
+    """
+    if str(filename).endswith(".pkl"):
+        with open(filename, "wb") as f:
+            pickle.dump(model, f)
+        return
+    ModelArtifact.save(model, filename)
 
 
 def load_model(filename):
+    """Load a ModelArtifact directory (lazily) or a pickled pipeline."""
+    if Path(filename).is_dir():
+        return ModelArtifact.load(filename)
     with open(filename, "rb") as f:
         return pickle.load(f)
 
@@ -33,161 +337,350 @@ def load_model(filename):
 #  WEATHER API (Open-Meteo archive)
 # ===========================================================
 def query_weather_api(df, latitude, longitude, start_date, end_date):
-    url = (
-        "https://archive-api.open-meteo.com/v1/archive"
-        f"?latitude={latitude}&longitude={longitude}"
-        f"&start_date={start_date}&end_date={end_date}"
-        "&hourly=temperature_2m,precipitation,wind_speed_10m"
-        "&timezone=Europe%2FParis"
+    # cached per day on disk: only days never seen before hit the network
+    return query_station_weather(latitude, longitude, start_date, end_date)
+
+
+# ===========================================================
+#  PREPROCESS FUNCTION
+# ===========================================================
+@timed("preprocess_data")
+def preprocess_data(df):
+    # Feature definitions live in the shared registry (VELIB_PROJ/data/preprocessing.py):
+    # calendar flags, coordinates, weather (median-filled), per-site lags (median-filled),
+    # cyclic hour/month, compact dtypes. Only the MODEL_FEATURES columns are computed.
+    return MODEL_FEATURES.transform(df)
+
+
+# ===========================================================
+#  LIGHTGBM MODEL TRAINING PIPELINE
+# ===========================================================
+def make_pipeline(model_params, target_cols, numeric_cols):
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("target_enc", TargetEncoder(), target_cols),
+            ("num", StandardScaler(), numeric_cols),
+        ],
+        remainder="drop",
     )
 
-    response = requests.get(url)
+    model = LGBMRegressor(**model_params)
 
-    if response.status_code != 200:
-        print("⚠️ Weather API error:", response.status_code)
-        return None
+    return Pipeline(steps=[("preprocessor", preprocessor), ("model", model)])
 
-    data = response.json()
-    if "hourly" not in data:
-        return None
 
-    weather_df = pd.DataFrame(data["hourly"])
-    weather_df.rename(columns={"time": "date_et_heure_de_comptage"}, inplace=True)
-    weather_df["date_et_heure_de_comptage"] = pd.to_datetime(weather_df["date_et_heure_de_comptage"])
+# Paramètres qui déterminent le binning du Dataset LightGBM (font partie de la clé du cache)
+DATASET_PARAMS = (
+    "max_bin", "max_bin_by_feature", "min_data_in_bin", "subsample_for_bin", "bin_construct_sample_cnt",
+    "min_child_samples", "min_data_in_leaf", "feature_pre_filter", "use_missing", "zero_as_missing",
+    "random_state", "seed", "data_random_seed", "linear_tree",
+)
 
-    return weather_df
 
+# Features qui dépendent du reste du jeu (remplissage par la médiane) : hors de l'identité d'une ligne
+DATASET_DEPENDENT = LAG_FEATURES + MODEL_WEATHER
 
-# ===========================================================
-#  PREPROCESS FUNCTION
-# ===========================================================
-def preprocess_data(df):
-    df = df.copy()
 
-    df["date_et_heure_de_comptage"] = pd.to_datetime(df["date_et_heure_de_comptage"], errors="coerce")
-    df = df.dropna(subset=["date_et_heure_de_comptage"])
+class DatasetCache:
+    """
+    On-disk cache of the binned LightGBM training Dataset.
 
-    df["hour"] = df["date_et_heure_de_comptage"].dt.hour
-    df["day"] = df["date_et_heure_de_comptage"].dt.day
-    df["month"] = df["date_et_heure_de_comptage"].dt.month
-    df["weekday"] = df["date_et_heure_de_comptage"].dt.weekday
-    df["year"] = df["date_et_heure_de_comptage"].dt.year
+    The directory holds the Dataset in LightGBM's binary format (bin mappers
+    and binned features), the keys of its rows and a manifest keyed by the
+    feature schema and the binning parameters. A row is keyed on its target
+    and the features that only depend on the row itself: lags and weather
+    are median-filled over the whole dataset (``DATASET_DEPENDENT``), so
+    they can change for existing rows when rows are added.
 
-    # season
-    df["season"] = df["month"] % 12 // 3 + 1
+    ``dataset`` returns one of four statuses:
 
-    # rush hours
-    df["is_rush_hour"] = df["hour"].apply(lambda x: 1 if (7 <= x <= 9) or (16 <= x <= 19) else 0)
+    - ``hit``: same features (all of them) and targets in the same order, the
+      binary Dataset is loaded as is.
+    - ``append``: every cached row is still there and new rows were added. All
+      rows are binned again against the saved bin mappers, which only skips
+      the bin discovery (LightGBM cannot add rows to a binary Dataset in
+      place). The mappers are not refitted: the binning drifts from what a
+      full build would give as the scaler and the fill medians move.
+    - ``rebuild``: rows were added but the mappers are too old, after
+      ``max_appends`` appends or when a model column leaves the range it had
+      at the last full build by more than ``range_tolerance`` of its span.
+    - ``miss``: the Dataset is built from scratch.
 
-    # night
-    df["is_night"] = df["hour"].apply(lambda x: 1 if (x <= 5) or (x >= 22) else 0)
+    The cache is rewritten after every status but ``hit``.
+    """
 
-    # weekend
-    df["is_weekend"] = df["weekday"].apply(lambda x: 1 if x >= 5 else 0)
+    def __init__(self, directory, max_appends=5, range_tolerance=0.05):
+        self.directory = Path(directory)
+        self.max_appends = max_appends
+        self.range_tolerance = range_tolerance
 
-    # holiday (simple)
-    df["is_holiday"] = df["month"].apply(lambda x: 1 if x == 8 else 0)
+    @staticmethod
+    def row_hashes(X, y):
+        hx = pd.util.hash_pandas_object(X, index=False).to_numpy()
+        hy = pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False).to_numpy()
+        return hx ^ (hy * np.uint64(0x9E3779B97F4A7C15))
 
-    # extract lat/lon from coordinates
-    if "coordonnées_géographiques" in df.columns:
-        coords = df["coordonnées_géographiques"].astype(str).str.split(",", expand=True)
-        df["latitude"] = pd.to_numeric(coords[0], errors="coerce")
-        df["longitude"] = pd.to_numeric(coords[1], errors="coerce")
+    @staticmethod
+    def schema(X, params):
+        return {
+            "columns": [str(c) for c in X.columns],
+            "dtypes": [str(t) for t in X.dtypes],
+            "params": {k: params[k] for k in DATASET_PARAMS if k in params},
+        }
 
-    # weather merge
-    if "latitude" in df.columns and "longitude" in df.columns:
-        lat = df["latitude"].dropna().iloc[0] if df["latitude"].notna().any() else None
-        lon = df["longitude"].dropna().iloc[0] if df["longitude"].notna().any() else None
+    @staticmethod
+    def value_ranges(Xt):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # colonne entièrement manquante
+            return {"min": np.nanmin(Xt, axis=0).tolist(), "max": np.nanmax(Xt, axis=0).tolist()}
 
-        if lat is not None and lon is not None:
-            start_date = df["date_et_heure_de_comptage"].dt.date.min().strftime("%Y-%m-%d")
-            end_date = df["date_et_heure_de_comptage"].dt.date.max().strftime("%Y-%m-%d")
+    def drifted(self, ranges, current):
+        """Whether a column of ``current`` leaves ``ranges`` by more than ``range_tolerance`` of its span."""
+        lo, hi = np.asarray(ranges["min"], dtype=float), np.asarray(ranges["max"], dtype=float)
+        margin = self.range_tolerance * (hi - lo)
+        with np.errstate(invalid="ignore"):
+            return bool(
+                (np.asarray(current["min"], dtype=float) < lo - margin).any()
+                or (np.asarray(current["max"], dtype=float) > hi + margin).any()
+            )
 
-            weather_df = query_weather_api(df, lat, lon, start_date, end_date)
+    def dataset(self, X, y, Xt, params):
+        """
+        Binned Dataset for the raw rows ``X``/``y`` whose model matrix is ``Xt``.
 
-            if weather_df is not None:
-                df = df.merge(weather_df, on="date_et_heure_de_comptage", how="left")
+        Returns ``(lgb.Dataset, status)``; the Dataset is constructed.
+        """
+        manifest_path = self.directory / "manifest.json"
+        bin_path, keys_path = self.directory / "dataset.bin", self.directory / "row_keys.npy"
+        schema = self.schema(X, params)
+        data_hash = hashlib.sha256(self.row_hashes(X, y).tobytes()).hexdigest()
+        keys = self.row_hashes(X[[c for c in X.columns if c not in DATASET_DEPENDENT]], y)
+        ranges = self.value_ranges(Xt)
 
-    # missing weather fill
-    for c in ["temperature_2m", "precipitation", "wind_speed_10m"]:
-        if c in df.columns:
-            df[c] = df[c].fillna(df[c].median())
+        manifest = None
+        if manifest_path.exists() and bin_path.exists() and keys_path.exists():
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("schema") != schema:
+                manifest = None
 
-    # sort
-    df = df.sort_values(["identifiant_du_site_de_comptage", "date_et_heure_de_comptage"])
+        if manifest is not None and manifest["data_sha256"] == data_hash:
+            return lgb.Dataset(str(bin_path), params=params).construct(), "hit"
 
-    # lags and rolling
-    df["lag_1"] = df.groupby("identifiant_du_site_de_comptage")["comptage_horaire"].shift(1)
-    df["lag_24"] = df.groupby("identifiant_du_site_de_comptage")["comptage_horaire"].shift(24)
-    df["rolling_mean_24"] = (
-        df.groupby("identifiant_du_site_de_comptage")["comptage_horaire"]
-        .shift(1)
-        .rolling(window=24)
-        .mean()
-    )
+        status, reference, appends = "miss", None, 0
+        if manifest is not None and manifest["n_rows"] < len(X):
+            cached = np.load(keys_path)
+            current = np.sort(keys)
+            pos = np.searchsorted(current, cached).clip(max=len(current) - 1)
+            if (current[pos] == cached).all():
+                if manifest["appends"] >= self.max_appends or self.drifted(manifest["ranges"], ranges):
+                    status = "rebuild"
+                else:
+                    status, reference = "append", lgb.Dataset(str(bin_path), params=params).construct()
+                    # plages et compteur de la dernière construction complète (celle des bin mappers)
+                    ranges, appends = manifest["ranges"], manifest["appends"] + 1
 
-    df["lag_1"] = df["lag_1"].fillna(df["lag_1"].median())
-    df["lag_24"] = df["lag_24"].fillna(df["lag_24"].median())
-    df["rolling_mean_24"] = df["rolling_mean_24"].fillna(df["rolling_mean_24"].median())
-
-    # cyclic encoding
-    df["hour_sin"] = np.sin(2 * np.pi * df["hour"] / 24)
-    df["hour_cos"] = np.cos(2 * np.pi * df["hour"] / 24)
-    df["month_sin"] = np.sin(2 * np.pi * df["month"] / 12)
-    df["month_cos"] = np.cos(2 * np.pi * df["month"] / 12)
-
-    # drop unused columns
-    cols_to_drop = [
-        "identifiant_technique_compteur",
-        "mois_annee_comptage",
-        "identifiant_du_compteur",
-        "nom_du_site_de_comptage",
-        "nom_du_compteur",
-        "lien_vers_photo_du_site_de_comptage",
-        "id_photos",
-        "test_lien_vers_photos_du_site_de_comptage_",
-        "id_photo_1",
-        "url_sites",
-        "type_dimage",
-        "coordonnées_géographiques",
-        "date_d'installation_du_site_de_comptage",
-        "latitude",
-        "longitude",
-    ]
-
-    df = df.drop(columns=[c for c in cols_to_drop if c in df.columns], errors="ignore")
-
-    # feature list
-    features = [c for c in df.columns if c not in ["comptage_horaire", "date_et_heure_de_comptage"]]
-
-    return df, features
+        train_set = lgb.Dataset(Xt, label=np.asarray(y), reference=reference, params=params).construct()
 
+        # écriture atomique : le manifeste est remplacé en dernier
+        self.directory.mkdir(parents=True, exist_ok=True)
+        train_set.save_binary(str(bin_path) + ".tmp")
+        os.replace(str(bin_path) + ".tmp", bin_path)
+        with open(str(keys_path) + ".tmp", "wb") as f:
+            np.save(f, np.sort(keys))
+        os.replace(str(keys_path) + ".tmp", keys_path)
+        with open(str(manifest_path) + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {"schema": schema, "n_rows": int(len(X)), "data_sha256": data_hash, "appends": appends, "ranges": ranges},
+                f,
+                indent=2,
+            )
+        os.replace(str(manifest_path) + ".tmp", manifest_path)
+        return train_set, status
 
-# ===========================================================
-#  LIGHTGBM MODEL TRAINING PIPELINE
-# ===========================================================
-def train_final_model(X, y, model_params, target_cols, numeric_cols, test_size_ratio=0.1):
+
+class BoosterModel(RegressorMixin, BaseEstimator):
+    """
+    LightGBM regressor trained with ``lgb.train`` from processed parameters.
+
+    ``fit_dataset`` trains on a prebuilt ``lgb.Dataset`` (the DatasetCache
+    path); ``fit(X, y)`` builds the Dataset first, so the step clones and
+    refits like any scikit-learn estimator. The fitted attributes are those
+    of LGBMRegressor that the pipeline, the metrics and
+    ``FlatPredictor.from_pipeline`` read (``booster_``, ``best_iteration_``,
+    ``best_score_``, ``evals_result_``), and ``predict`` uses the best
+    iteration, like ``LGBMRegressor.predict``.
+
+    Parameters
+    ----------
+    params : dict
+        ``lgb.train`` parameters (``LGBMRegressor._process_params(stage="fit")``).
+    n_estimators : int
+        Boosting rounds at most.
+    """
+
+    def __init__(self, params=None, n_estimators=100):
+        self.params = params
+        self.n_estimators = n_estimators
+
+    def fit(self, X, y, eval_set=None, eval_metric=None, callbacks=None):
+        params = dict(self.params or {})
+        train_set = lgb.Dataset(X, label=np.asarray(y), params=params)
+        valid_set = None
+        if eval_set:
+            X_valid, y_valid = eval_set[0]
+            valid_set = lgb.Dataset(X_valid, label=np.asarray(y_valid), reference=train_set, params=params)
+        return self.fit_dataset(train_set, valid_set, eval_metric=eval_metric, callbacks=callbacks)
+
+    def fit_dataset(self, train_set, valid_set=None, eval_metric=None, callbacks=None):
+        """Train on a prebuilt Dataset (metrics, callbacks and evaluation history as in ``LGBMRegressor.fit``)."""
+        params = dict(self.params or {})
+        metrics = [params.get("metric")] if isinstance(params.get("metric"), (str, type(None))) else params["metric"]
+        params["metric"] = [m for m in ([eval_metric] if eval_metric else []) if m not in metrics] + [m for m in metrics if m]
+
+        evals_result = {}
+        booster = lgb.train(
+            params,
+            train_set,
+            num_boost_round=self.n_estimators,
+            valid_sets=[valid_set] if valid_set is not None else [],
+            callbacks=[*(callbacks or []), lgb.record_evaluation(evals_result)],
+        )
+        booster.free_dataset()
+
+        self.booster_ = booster
+        self.evals_result_ = evals_result
+        self.best_iteration_ = booster.best_iteration
+        self.best_score_ = booster.best_score
+        self.n_features_in_ = booster.num_feature()
+        return self
+
+    def predict(self, X):
+        return self.booster_.predict(X)
+
+
+def fit_lgbm_dataset(model, train_set, valid_set=None, eval_metric=None, callbacks=None):
+    """
+    Fit an unfitted LGBMRegressor's configuration on a prebuilt ``lgb.Dataset``.
+
+    Same training as ``model.fit`` (parameters, metrics, callbacks, evaluation
+    history) without the Dataset construction. ``model`` is left untouched;
+    the result is a fitted BoosterModel to put in its place in the pipeline.
+    """
+    params = model._process_params(stage="fit")
+    return BoosterModel(params, model.n_estimators).fit_dataset(train_set, valid_set, eval_metric=eval_metric, callbacks=callbacks)
+
+
+class TrainingBudget:
+    """
+    LightGBM callback stopping the fit once ``seconds`` of wall-clock time have elapsed.
+
+    When a validation set is monitored, the stop keeps the best iteration seen
+    so far (first metric of the first validation set), like early stopping does.
+    ``triggered`` tells whether the budget ended the fit.
+    """
+
+    order = 40  # après lgb.early_stopping (order 30)
+    before_iteration = False
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.start = time.perf_counter()  # créé juste avant model.fit
+        self.triggered = False
+        self._best = None
+
+    def __call__(self, env):
+        valid = [r for r in (env.evaluation_result_list or []) if r[0] != "training"]
+        if valid:
+            value, maximize = valid[0][2], valid[0][3]
+            if self._best is None or (value > self._best[0] if maximize else value < self._best[0]):
+                self._best = (value, env.iteration, env.evaluation_result_list)
+        if time.perf_counter() - self.start >= self.seconds:
+            self.triggered = True
+            if self._best is not None:
+                raise lgb.callback.EarlyStopException(self._best[1], self._best[2])
+            raise lgb.callback.EarlyStopException(env.iteration, env.evaluation_result_list or [])
+
+
+@timed("train_final_model")
+def train_final_model(
+    X,
+    y,
+    model_params,
+    target_cols,
+    numeric_cols,
+    test_size_ratio=0.1,
+    valid_ratio=0.0,
+    early_stopping_rounds=None,
+    time_budget=None,
+    dataset_cache=None,
+):
+    """
+    Fit the pipeline on the chronological head of ``X`` and score it on the tail.
+
+    With ``valid_ratio`` > 0, the last rows of the training window are held out
+    as a validation set monitored by LightGBM: ``early_stopping_rounds`` stops
+    the fit once the validation MAE stops improving, and the model predicts with
+    its best iteration. ``time_budget`` (seconds) stops the fit when the
+    wall-clock budget is spent. ``metrics["training"]`` records the trees
+    built, the best iteration, the time per tree and the stopping reason.
+
+    ``dataset_cache`` (directory) reuses the binned LightGBM Dataset of the
+    training rows across runs (``DatasetCache``); its status is recorded in
+    ``metrics["training"]["dataset_cache"]``.
+    """
     # chronological split
     split_idx = int(len(X) * (1 - test_size_ratio))
 
     X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
     y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
 
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ("target_enc", TargetEncoder(), target_cols),
-            ("num", StandardScaler(), numeric_cols),
-        ],
-        remainder="drop",
-    )
+    pipeline = make_pipeline(model_params, target_cols, numeric_cols)
+    preprocessor, model = pipeline.named_steps["preprocessor"], pipeline.named_steps["model"]
 
-    model = LGBMRegressor(**model_params)
+    # queue de validation prise sur la fin de la fenêtre d'entraînement (jamais sur le test)
+    valid_idx = int(len(X_train) * (1 - valid_ratio)) if valid_ratio else len(X_train)
+    if early_stopping_rounds and valid_idx == len(X_train):
+        raise ValueError("early_stopping_rounds needs a validation tail (valid_ratio > 0)")
+
+    t0 = time.perf_counter()
+    with stage("encode", rows=len(X_train)):
+        Xt_fit = preprocessor.fit_transform(X_train.iloc[:valid_idx], y_train.iloc[:valid_idx])
+        callbacks, fit_kwargs = [], {}
+        if valid_idx < len(X_train):
+            Xt_valid = preprocessor.transform(X_train.iloc[valid_idx:])
+            fit_kwargs = dict(eval_set=[(Xt_valid, y_train.iloc[valid_idx:])], eval_metric="l1")
+    if early_stopping_rounds:
+        callbacks.append(lgb.early_stopping(early_stopping_rounds, first_metric_only=True, verbose=False))
 
-    pipeline = Pipeline(steps=[("preprocessor", preprocessor), ("model", model)])
+    cache_status = None
+    if dataset_cache:
+        t_dataset = time.perf_counter()
+        with stage("dataset_cache", rows=valid_idx):
+            params = model._process_params(stage="fit")
+            train_set, cache_status = DatasetCache(dataset_cache).dataset(
+                X_train.iloc[:valid_idx], y_train.iloc[:valid_idx], Xt_fit, params
+            )
+            valid_set = None
+            if fit_kwargs:
+                valid_set = lgb.Dataset(Xt_valid, label=np.asarray(y_train.iloc[valid_idx:]), reference=train_set, params=params)
+        dataset_seconds = time.perf_counter() - t_dataset
 
-    pipeline.fit(X_train, y_train)
+    budget = TrainingBudget(time_budget) if time_budget else None
+    if budget is not None:
+        callbacks.append(budget)
+    t_boost = time.perf_counter()
+    with stage("boost", rows=valid_idx):
+        if dataset_cache:
+            model = fit_lgbm_dataset(model, train_set, valid_set, eval_metric=fit_kwargs.get("eval_metric"), callbacks=callbacks)
+            pipeline.steps[-1] = ("model", model)
+        else:
+            model.fit(Xt_fit, y_train.iloc[:valid_idx], callbacks=callbacks, **fit_kwargs)
+    boost_seconds = time.perf_counter() - t_boost
+    fit_seconds = time.perf_counter() - t0
 
-    preds = pipeline.predict(X_test)
+    with stage("predict_test", rows=len(X_test)):
+        preds = pipeline.predict(X_test)
 
     metrics = {
         "MAE": float(mean_absolute_error(y_test, preds)),
@@ -195,20 +688,514 @@ def train_final_model(X, y, model_params, target_cols, numeric_cols, test_size_r
         "R2": float(r2_score(y_test, preds)),
     }
 
+    # après un arrêt anticipé, le booster est tronqué à sa meilleure itération : on compte via l'historique d'évaluation
+    n_trees = len(model.evals_result_["valid_0"]["l1"]) if fit_kwargs else model.booster_.current_iteration()
+    if budget is not None and budget.triggered:
+        reason = "time_budget"
+    elif early_stopping_rounds and n_trees < model.n_estimators:
+        reason = "early_stopping"
+    else:
+        reason = "max_trees"
+    training = {
+        "trees_built": int(n_trees),
+        "best_iteration": int(model.best_iteration_ or n_trees),
+        "max_trees": int(model.n_estimators),
+        "stopping_reason": reason,
+        "fit_seconds": fit_seconds,
+        "seconds_per_tree": boost_seconds / max(n_trees, 1),
+        "train_rows": int(valid_idx),
+        "valid_rows": int(len(X_train) - valid_idx),
+        "time_budget": time_budget,
+    }
+    if cache_status is not None:
+        training["dataset_cache"] = cache_status
+        training["dataset_seconds"] = dataset_seconds
+    if fit_kwargs:
+        training["valid_MAE"] = float(model.best_score_["valid_0"]["l1"])
+    metrics["training"] = training
+
     return pipeline, metrics
 
 
+def extend_target_encoding(flat, X, y):
+    """
+    Blocks of ``flat`` with the target-encoded categories first seen in ``X`` added.
+
+    Known categories keep their value, so the splits of the existing trees
+    stay valid. New categories get the TargetEncoder smoothing of their mean
+    target towards the training prior (``unknown_value``). Scaling is not
+    updated: the trees' thresholds are expressed in the scaled units.
+    """
+    blocks = []
+    for block in flat.blocks:
+        if block["kind"] != "target_encoder":
+            blocks.append(block)
+            continue
+        encoded = []
+        for enc in block["encoded"]:
+            prior = enc["unknown_value"]
+            values = X[enc["column"]]
+            new = values.notna().to_numpy() & (pd.Index(enc["categories"]).get_indexer(values.astype(str)) < 0)
+            if not new.any():
+                encoded.append(enc)
+                continue
+            stats = pd.Series(np.asarray(y)[new]).groupby(values[new].astype(str).to_numpy()).agg(["count", "mean"])
+            smoove = 1 / (1 + np.exp(-(stats["count"] - block.get("min_samples_leaf", 20)) / block.get("smoothing", 10.0)))
+            encoding = prior * (1 - smoove) + stats["mean"] * smoove
+            encoding[stats["count"] == 1] = prior
+            encoded.append({
+                **enc,
+                "categories": np.concatenate([np.asarray(enc["categories"]), stats.index.to_numpy(dtype=str)]),
+                "values": np.concatenate([np.asarray(enc["values"]), encoding.to_numpy(dtype=np.float64)]),
+            })
+        blocks.append({**block, "encoded": encoded})
+    return blocks
+
+
+@timed("warm_start_model")
+def warm_start_model(
+    previous,
+    X,
+    y,
+    model_params,
+    n_estimators=100,
+    valid_ratio=0.2,
+    early_stopping_rounds=None,
+    encoders="frozen",
+    reference_mae=None,
+    drift_tolerance=0.2,
+):
+    """
+    Continue boosting a trained model on a new window of rows.
+
+    The previous preprocessing is reused as is (``encoders="frozen"``) or with
+    the new target-encoded categories added (``encoders="extend"``, see
+    ``extend_target_encoding``); the booster keeps its trees and LightGBM adds
+    up to ``n_estimators`` more through ``init_model``. The last
+    ``valid_ratio`` of the window (rows in chronological order) is held out
+    to score the result.
+
+    Drift guard: ``metrics["drift"]["tripped"]`` is set when the validation
+    MAE exceeds ``reference_mae * (1 + drift_tolerance)``; the caller should
+    then retrain from scratch. ``reference_mae`` defaults to the previous
+    model's MAE on the same validation rows.
+
+    Returns
+    -------
+    (FlatPredictor, dict)
+        The updated model (saved with ``save_model``) and its metrics.
+    """
+    if encoders not in ("frozen", "extend"):
+        raise ValueError(f"encoders must be 'frozen' or 'extend', got {encoders!r}")
+    flat = flat_predictor(previous)
+    # le booster précédent est repris à sa meilleure itération
+    booster = lgb.Booster(model_str=flat.booster.model_to_string(num_iteration=flat.num_iteration))
+
+    valid_idx = int(len(X) * (1 - valid_ratio))
+    if valid_idx == 0 or valid_idx == len(X):
+        raise ValueError(f"Cannot split {len(X)} new rows with valid_ratio={valid_ratio}")
+    X_fit, X_valid = X.iloc[:valid_idx], X.iloc[valid_idx:]
+    y_fit, y_valid = y.iloc[:valid_idx], y.iloc[valid_idx:]
+
+    blocks = flat.blocks if encoders == "frozen" else extend_target_encoding(flat, X_fit, y_fit)
+    updated = FlatPredictor(blocks, booster, features=flat.features)
+    previous_mae = float(mean_absolute_error(y_valid, updated.predict(X_valid)))
+
+    params = LGBMRegressor(**model_params)._process_params(stage="fit")
+    params["metric"] = ["l1"]
+    train_set = lgb.Dataset(updated.transform(X_fit), label=np.asarray(y_fit), params=params)
+    valid_set = lgb.Dataset(updated.transform(X_valid), label=np.asarray(y_valid), reference=train_set, params=params)
+    callbacks = [lgb.early_stopping(early_stopping_rounds, first_metric_only=True, verbose=False)] if early_stopping_rounds else []
+    evals_result = {}
+    t0 = time.perf_counter()
+    booster = lgb.train(
+        params,
+        train_set,
+        num_boost_round=n_estimators,
+        valid_sets=[valid_set],
+        init_model=booster,
+        callbacks=[*callbacks, lgb.record_evaluation(evals_result)],
+    )
+    fit_seconds = time.perf_counter() - t0
+    booster.free_dataset()
+
+    updated = FlatPredictor(blocks, booster, booster.best_iteration or None, features=flat.features)
+    preds = updated.predict(X_valid)
+    mae = float(mean_absolute_error(y_valid, preds))
+    reference = previous_mae if reference_mae is None else float(reference_mae)
+    trees_added = len(evals_result["valid_0"]["l1"])
+
+    metrics = {
+        "MAE": mae,
+        "RMSE": float(np.sqrt(mean_squared_error(y_valid, preds))),
+        "R2": float(r2_score(y_valid, preds)),
+        "training": {
+            "mode": "warm_start",
+            "encoders": encoders,
+            "trees_before": int(flat.num_iteration or flat.booster.num_trees()),
+            "trees_added": int(trees_added),
+            "best_iteration": int(booster.best_iteration or booster.current_iteration()),
+            "stopping_reason": "early_stopping" if early_stopping_rounds and trees_added < n_estimators else "max_trees",
+            "fit_seconds": fit_seconds,
+            "seconds_per_tree": fit_seconds / max(trees_added, 1),
+            "train_rows": int(len(X_fit)),
+            "valid_rows": int(len(X_valid)),
+        },
+        "drift": {
+            "previous_model_MAE": previous_mae,
+            "reference_MAE": reference,
+            "tolerance": drift_tolerance,
+            "tripped": bool(mae > reference * (1 + drift_tolerance)),
+        },
+    }
+    return updated, metrics
+
+
 # ===========================================================
-#  AUTO ARIMA OPTIMIZATION (optional)
+#  TIME-SERIES CV & HYPERPARAMETER SEARCH
 # ===========================================================
-def optimize_auto_arima(series):
+# Espace de recherche : ("choice", [valeurs]), ("uniform", bas, haut), ("log", bas, haut), ("int", bas, haut)
+SEARCH_SPACE = {
+    "learning_rate": ("log", 0.01, 0.1),
+    "num_leaves": ("choice", [31, 63, 127, 255]),
+    "min_child_samples": ("choice", [10, 20, 50, 100]),
+    "subsample": ("uniform", 0.6, 1.0),
+    "colsample_bytree": ("uniform", 0.6, 1.0),
+    "reg_lambda": ("log", 1e-3, 10.0),
+}
+
+
+def sample_params(space, n_iter, seed=42):
+    """Random search: ``n_iter`` parameter dicts drawn from ``space``."""
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for _ in range(n_iter):
+        params = {}
+        for name, (kind, *args) in space.items():
+            if kind == "choice":
+                params[name] = args[0][rng.integers(len(args[0]))]
+            elif kind == "uniform":
+                params[name] = float(rng.uniform(args[0], args[1]))
+            elif kind == "log":
+                params[name] = float(np.exp(rng.uniform(np.log(args[0]), np.log(args[1]))))
+            elif kind == "int":
+                params[name] = int(rng.integers(args[0], args[1] + 1))
+            else:
+                raise ValueError(f"Unknown search space kind '{kind}' for '{name}'")
+        candidates.append(params)
+    return candidates
+
+
+def plan_parallelism(n_tasks, max_workers=None, n_cpus=None):
     """
-    NOTE: Requires pmdarima:
-      pip install pmdarima
+    Split the cores between fold workers and LightGBM threads.
+
+    Returns ``(n_workers, lgbm_n_jobs)`` with ``n_workers * lgbm_n_jobs <= n_cpus``,
+    so the process pool and LightGBM's OpenMP threads never oversubscribe.
     """
-    # model = pm.auto_arima(series, seasonal=True, m=24, stepwise=True, suppress_warnings=True)
-    # return model
-    raise NotImplementedError("auto_arima is disabled because pmdarima import is commented out.")
+    n_cpus = n_cpus or os.cpu_count() or 1
+    n_workers = max(1, min(n_tasks, max_workers or n_cpus, n_cpus))
+    return n_workers, max(1, n_cpus // n_workers)
+
+
+# Matrice partagée attachée une fois par processus (initializer du pool)
+_SHARED = {}
+
+
+def _attach_shared(x_name, x_shape, y_name, columns):
+    x_shm = shared_memory.SharedMemory(name=x_name)
+    y_shm = shared_memory.SharedMemory(name=y_name)
+    _SHARED.update(
+        x_shm=x_shm,
+        y_shm=y_shm,
+        X=pd.DataFrame(np.ndarray(x_shape, dtype=np.float64, buffer=x_shm.buf), columns=columns, copy=False),
+        y=pd.Series(np.ndarray(x_shape[0], dtype=np.float64, buffer=y_shm.buf), copy=False),
+    )
+
+
+def _fit_fold(task):
+    """Fit one (candidate, fold) pair on the shared matrix with early stopping on the fold's validation rows."""
+    X, y = _SHARED["X"], _SHARED["y"]
+    train_end, valid_start, valid_end = task["train_end"], task["valid_start"], task["valid_end"]
+    t0 = time.perf_counter()
+
+    pipeline = make_pipeline(task["params"], task["target_cols"], task["numeric_cols"])
+    preprocessor, model = pipeline.named_steps["preprocessor"], pipeline.named_steps["model"]
+    X_train = preprocessor.fit_transform(X.iloc[:train_end], y.iloc[:train_end])
+    X_valid = preprocessor.transform(X.iloc[valid_start:valid_end])
+    y_valid = y.iloc[valid_start:valid_end]
+    model.fit(
+        X_train,
+        y.iloc[:train_end],
+        eval_set=[(X_valid, y_valid)],
+        eval_metric="l1",
+        callbacks=[lgb.early_stopping(task["early_stopping_rounds"], first_metric_only=True, verbose=False)],
+    )
+    preds = model.predict(X_valid)
+    return {
+        "candidate": task["candidate"],
+        "fold": task["fold"],
+        "MAE": float(mean_absolute_error(y_valid, preds)),
+        "RMSE": float(np.sqrt(mean_squared_error(y_valid, preds))),
+        "best_iteration": int(model.best_iteration_ or model.n_estimators),
+        "fit_seconds": time.perf_counter() - t0,
+    }
+
+
+@timed("tune_hyperparameters")
+def tune_hyperparameters(
+    X,
+    y,
+    target_cols,
+    numeric_cols,
+    base_params,
+    space=None,
+    n_iter=20,
+    n_splits=5,
+    gap=0,
+    early_stopping_rounds=50,
+    max_workers=None,
+    seed=42,
+):
+    """
+    Walk-forward cross-validated random search over LightGBM parameters.
+
+    Rows must be in chronological order. preprocess_data returns them sorted
+    by site then date, so sort by date first (see models/tune.py).
+    Every (candidate, fold) pair is fitted in a process pool on a
+    TimeSeriesSplit fold, with early stopping on the fold's validation block.
+    The feature matrix and target are placed once in shared memory: workers
+    attach to them when they start instead of receiving a pickled copy per
+    task, and a task only carries its fold boundaries. The cores are split
+    between workers and LightGBM threads (``plan_parallelism``).
+
+    Parameters
+    ----------
+    X : pd.DataFrame
+        Numeric feature matrix (``features`` of preprocess_data).
+    base_params : dict
+        Fixed LightGBM parameters (``n_estimators`` is the early-stopping cap).
+    space : dict, optional
+        Search space, ``SEARCH_SPACE`` by default.
+
+    Returns
+    -------
+    (dict, list of dict)
+        Best parameters (``n_estimators`` set to the mean best iteration of
+        its folds) and the per-candidate results, best first.
+    """
+    non_numeric = [c for c in X.columns if not pd.api.types.is_numeric_dtype(X[c])]
+    if non_numeric:
+        raise ValueError(f"Shared-memory tuning needs numeric features, got: {non_numeric}")
+
+    candidates = [{**base_params, **params} for params in sample_params(space or SEARCH_SPACE, n_iter, seed)]
+    folds = list(TimeSeriesSplit(n_splits=n_splits, gap=gap).split(np.arange(len(X))))
+    n_workers, n_jobs = plan_parallelism(len(candidates) * len(folds), max_workers)
+    print(f"Tuning {len(candidates)} candidates x {len(folds)} folds on {n_workers} workers x {n_jobs} LightGBM threads")
+
+    x_shm = shared_memory.SharedMemory(create=True, size=max(1, X.shape[0] * X.shape[1] * 8))
+    y_shm = shared_memory.SharedMemory(create=True, size=max(1, len(y) * 8))
+    try:
+        np.ndarray(X.shape, dtype=np.float64, buffer=x_shm.buf)[:] = X.to_numpy(dtype=np.float64)
+        np.ndarray(len(y), dtype=np.float64, buffer=y_shm.buf)[:] = np.asarray(y, dtype=np.float64)
+
+        tasks = [
+            {
+                "candidate": i,
+                "fold": k,
+                "params": {**params, "n_jobs": n_jobs, "verbose": -1},
+                "train_end": int(train_idx[-1]) + 1,
+                "valid_start": int(valid_idx[0]),
+                "valid_end": int(valid_idx[-1]) + 1,
+                "target_cols": list(target_cols),
+                "numeric_cols": list(numeric_cols),
+                "early_stopping_rounds": early_stopping_rounds,
+            }
+            for i, params in enumerate(candidates)
+            for k, (train_idx, valid_idx) in enumerate(folds)
+        ]
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_attach_shared,
+            initargs=(x_shm.name, X.shape, y_shm.name, list(X.columns)),
+        ) as pool:
+            fold_results = list(pool.map(_fit_fold, tasks))
+    finally:
+        x_shm.close()
+        x_shm.unlink()
+        y_shm.close()
+        y_shm.unlink()
+
+    results = []
+    for i, params in enumerate(candidates):
+        folds_i = [r for r in fold_results if r["candidate"] == i]
+        results.append({
+            "params": params,
+            "MAE": float(np.mean([r["MAE"] for r in folds_i])),
+            "MAE_std": float(np.std([r["MAE"] for r in folds_i])),
+            "RMSE": float(np.mean([r["RMSE"] for r in folds_i])),
+            "best_iterations": [r["best_iteration"] for r in folds_i],
+            "fit_seconds": float(sum(r["fit_seconds"] for r in folds_i)),
+        })
+    results.sort(key=lambda r: r["MAE"])
+
+    best = dict(results[0]["params"])
+    best["n_estimators"] = int(np.mean(results[0]["best_iterations"]))
+    return best, results
+
+
+# ===========================================================
+#  AUTO ARIMA OPTIMIZATION (bounded stepwise search)
+# ===========================================================
+def _difference_coefs(d, D, s):
+    """Coefficients c of (1 - L)^d (1 - L^s)^D: w_t = sum_k c[k] * y[t - k]."""
+    coefs = np.array([1.0])
+    for _ in range(d):
+        coefs = np.convolve(coefs, [1.0, -1.0])
+    for _ in range(D):
+        coefs = np.convolve(coefs, np.r_[1.0, np.zeros(s - 1), -1.0])
+    return coefs
+
+
+class SiteSarimax:
+    """
+    Fitted seasonal ARIMA of one series, kept as its filter state.
+
+    The model is fitted on the differenced series (``simple_differencing``:
+    the ARMA part has a much smaller state than the full SARIMAX, for the
+    same likelihood). Besides the parameters it keeps the Kalman filter state
+    after the last observation and the last ``d + D*s`` raw values, so that
+    ``extend`` filters new observations and ``forecast`` predicts from there
+    without refitting and without the history.
+    """
+
+    def __init__(self, order, seasonal_order, params, state, state_cov, tail, end, info=None):
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        self.params = np.asarray(params, dtype=np.float64)
+        self.state = np.asarray(state, dtype=np.float64)
+        self.state_cov = np.asarray(state_cov, dtype=np.float64)
+        self.tail = np.asarray(tail, dtype=np.float64)
+        self.end = pd.Timestamp(end)
+        self.info = info or {}
+
+    @staticmethod
+    def arma_model(w, order, seasonal_order, state=None, state_cov=None):
+        p, _, q = order
+        P, _, Q, s = seasonal_order
+        model = SARIMAX(w, order=(p, 0, q), seasonal_order=(P, 0, Q, s))
+        if state is not None:
+            model.initialize_known(state, state_cov)
+        return model
+
+    @property
+    def coefs(self):
+        return _difference_coefs(self.order[1], self.seasonal_order[1], self.seasonal_order[3])
+
+    @classmethod
+    def fit(cls, y, end, order=(1, 1, 1), seasonal_order=(1, 1, 1, 24), start_params=None, maxiter=50):
+        """Fit on the hourly values ``y`` (no gaps) whose last timestamp is ``end``."""
+        coefs = _difference_coefs(order[1], seasonal_order[1], seasonal_order[3])
+        y = np.asarray(y, dtype=np.float64)
+        w = np.convolve(y, coefs, mode="valid")
+        t0 = time.perf_counter()
+        results = cls.arma_model(w, order, seasonal_order).fit(start_params=start_params, maxiter=maxiter, disp=False)
+        info = {
+            "aic": float(results.aic),
+            "nobs": int(len(y)),
+            "iterations": int(results.mle_retvals.get("iterations", 0)) if results.mle_retvals else 0,
+            "converged": bool(results.mle_retvals.get("converged", True)) if results.mle_retvals else True,
+            "fit_seconds": time.perf_counter() - t0,
+            "warm_started": start_params is not None,
+        }
+        return cls(
+            order,
+            seasonal_order,
+            results.params,
+            results.predicted_state[:, -1],
+            results.predicted_state_cov[:, :, -1],
+            y[len(y) - len(coefs) + 1:],
+            end,
+            info,
+        )
+
+    def extend(self, values):
+        """Filter the next hourly ``values`` with the fitted parameters (no refit)."""
+        values = pd.Series(np.asarray(values, dtype=np.float64)).interpolate(limit_direction="both").to_numpy()
+        if not len(values):
+            return self
+        y = np.concatenate([self.tail, values])
+        w = np.convolve(y, self.coefs, mode="valid")
+        results = self.arma_model(w, self.order, self.seasonal_order, self.state, self.state_cov).filter(self.params)
+        self.state = results.predicted_state[:, -1]
+        self.state_cov = results.predicted_state_cov[:, :, -1]
+        self.tail = y[len(y) - len(self.tail):]
+        self.end = self.end + pd.Timedelta(hours=len(values))
+        return self
+
+    def forecast(self, steps):
+        """Mean forecast of the next ``steps`` hours, indexed by timestamp."""
+        w = np.full(steps, np.nan)
+        results = self.arma_model(w, self.order, self.seasonal_order, self.state, self.state_cov).filter(self.params)
+        w_hat = results.forecasts[0]
+        # intégration : y_t = w_t - sum_{k>=1} c_k y_{t-k}
+        coefs, lag = self.coefs, len(self.tail)
+        y = np.concatenate([self.tail, np.empty(steps)])
+        for t in range(lag, lag + steps):
+            y[t] = w_hat[t - lag] - coefs[1:] @ y[t - 1::-1][:lag]
+        index = pd.date_range(self.end + pd.Timedelta(hours=1), periods=steps, freq="h")
+        return pd.Series(y[lag:], index=index)
+
+
+def optimize_auto_arima(series, d=1, D=1, s=24, max_p=2, max_q=2, max_P=1, max_Q=1, max_fits=12, maxiter=50):
+    """
+    Bounded stepwise order search (in the spirit of auto_arima, without pmdarima).
+
+    Starts from (1,d,1)(1,D,1,s), (0,d,0)(0,D,0,s), (1,d,0)(1,D,0,s) and
+    (0,d,1)(0,D,1,s), then moves to the best neighbour (p, q, P or Q ±1
+    within the bounds) while the AIC improves, with at most ``max_fits``
+    fits. ``d`` and ``D`` are fixed: AICs are only comparable on the same
+    differenced series. ``series`` is an hourly Series without gaps.
+
+    Returns the best SiteSarimax; ``info["search"]`` lists the tried orders.
+    """
+    trials, fitted = [], {}
+
+    def fit(p, q, P, Q):
+        key = (p, q, P, Q)
+        if key not in fitted and len(fitted) < max_fits:
+            try:
+                fitted[key] = SiteSarimax.fit(series.to_numpy(), series.index[-1], (p, d, q), (P, D, Q, s), maxiter=maxiter)
+                trials.append({"order": [p, d, q], "seasonal_order": [P, D, Q, s], "aic": fitted[key].info["aic"]})
+            except (np.linalg.LinAlgError, ValueError) as e:
+                print(f"⚠️ SARIMAX ({p},{d},{q})({P},{D},{Q},{s}) failed: {e}")
+                fitted[key] = None
+        return fitted.get(key)
+
+    for start in [(1, 1, 1, 1), (0, 0, 0, 0), (1, 0, 1, 0), (0, 1, 0, 1)]:
+        fit(*start)
+    best = min((k for k, m in fitted.items() if m is not None), key=lambda k: fitted[k].info["aic"])
+    while len(fitted) < max_fits:
+        bounds = (max_p, max_q, max_P, max_Q)
+        neighbours = []
+        for i in range(4):
+            for step in (-1, 1):
+                cand = list(best)
+                cand[i] += step
+                if 0 <= cand[i] <= bounds[i] and tuple(cand) not in fitted:
+                    neighbours.append(tuple(cand))
+        if not neighbours:
+            break
+        for cand in neighbours:
+            fit(*cand)
+        new_best = min((k for k, m in fitted.items() if m is not None), key=lambda k: fitted[k].info["aic"])
+        if new_best == best:
+            break
+        best = new_best
+
+    model = fitted[best]
+    model.info["search"] = trials
+    return model
 
 
 # ===========================================================
@@ -218,3 +1205,158 @@ def train_sarimax(series, order=(1, 1, 1), seasonal_order=(1, 1, 1, 24)):
     model = SARIMAX(series, order=order, seasonal_order=seasonal_order)
     results = model.fit(disp=False)
     return results
+
+
+def site_series(df, history_days=28):
+    """
+    Hourly counts per site (one column per ``identifiant_du_site_de_comptage``,
+    naive UTC index) over the last ``history_days``; gaps are interpolated.
+    """
+    # UTC sans fuseau, comme raw_store : pas de trou ni de doublon aux changements d'heure
+    dates = pd.to_datetime(df["date_et_heure_de_comptage"].astype(str), errors="coerce", utc=True).dt.tz_convert(None)
+    table = (
+        pd.DataFrame({"site": df["identifiant_du_site_de_comptage"].to_numpy(), "date": dates.dt.floor("h"), "y": df["comptage_horaire"].to_numpy()})
+        .pivot_table(index="date", columns="site", values="y", aggfunc="sum")
+    )
+    table = table.asfreq("h")
+    if history_days:
+        table = table[table.index > table.index.max() - pd.Timedelta(days=history_days)]
+    return table.interpolate(limit_direction="both")
+
+
+def site_coordinates(df):
+    """Latitude / longitude of each site (from ``coordonnées_géographiques``)."""
+    coords = df[["identifiant_du_site_de_comptage", "coordonnées_géographiques"]].drop_duplicates("identifiant_du_site_de_comptage")
+    latlon = coords["coordonnées_géographiques"].astype(str).str.split(",", expand=True)
+    return pd.DataFrame(
+        {"latitude": pd.to_numeric(latlon[0], errors="coerce").to_numpy(), "longitude": pd.to_numeric(latlon[1], errors="coerce").to_numpy()},
+        index=coords["identifiant_du_site_de_comptage"].to_numpy(),
+    )
+
+
+def _seed_sites(coords, n_seeds):
+    """Farthest-point sample of ``n_seeds`` sites: seeds cover the map so every site has a close one."""
+    xy = coords[["latitude", "longitude"]].fillna(coords[["latitude", "longitude"]].mean()).to_numpy()
+    centre = xy.mean(axis=0)
+    chosen = [int(np.argmin(((xy - centre) ** 2).sum(axis=1)))]
+    dist = ((xy - xy[chosen[0]]) ** 2).sum(axis=1)
+    while len(chosen) < min(n_seeds, len(xy)):
+        chosen.append(int(np.argmax(dist)))
+        dist = np.minimum(dist, ((xy - xy[chosen[-1]]) ** 2).sum(axis=1))
+    return [coords.index[i] for i in chosen]
+
+
+def _fit_site(task):
+    site, y, end = task["site"], task["y"], task["end"]
+    try:
+        with warnings.catch_warnings():
+            # convergence consignée dans info["converged"]
+            warnings.simplefilter("ignore")
+            if task["search"]:
+                series = pd.Series(y, index=pd.date_range(end=end, periods=len(y), freq="h"))
+                model = optimize_auto_arima(series, maxiter=task["maxiter"], **task["search"])
+            else:
+                model = SiteSarimax.fit(y, end, task["order"], task["seasonal_order"], task["start_params"], task["maxiter"])
+    except (np.linalg.LinAlgError, ValueError) as e:
+        print(f"⚠️ SARIMAX failed for site {site}: {e}")
+        return site, None
+    model.info["seed"] = None if task.get("seed") is None else str(task["seed"])
+    return site, model
+
+
+@timed("fit_sites_sarimax")
+def fit_sites_sarimax(
+    df,
+    order=(1, 1, 1),
+    seasonal_order=(1, 1, 1, 24),
+    history_days=28,
+    search=False,
+    search_bounds=None,
+    n_seeds=None,
+    max_workers=None,
+    maxiter=50,
+):
+    """
+    One seasonal ARIMA per ``identifiant_du_site_de_comptage``, fitted in a process pool.
+
+    Sites are fitted in two waves. Seed sites, spread over the map
+    (``_seed_sites``), are fitted first — with the bounded order search of
+    ``optimize_auto_arima`` when ``search`` is set. Every other site then
+    takes the order of its nearest seed and starts the optimizer from that
+    seed's parameters instead of the defaults.
+
+    Returns
+    -------
+    dict
+        site -> SiteSarimax (sites whose fit failed are left out).
+    """
+    series = site_series(df, history_days)
+    coords = site_coordinates(df).reindex(series.columns)
+    end = series.index[-1]
+    n_workers, _ = plan_parallelism(len(series.columns), max_workers)
+    seeds = _seed_sites(coords, n_seeds or max(n_workers, 4))
+
+    def task(site, **kwargs):
+        return {"site": site, "y": series[site].to_numpy(), "end": end, "order": order, "seasonal_order": seasonal_order,
+                "start_params": None, "search": None, "maxiter": maxiter, **kwargs}
+
+    models = {}
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        bounds = {"d": order[1], "D": seasonal_order[1], "s": seasonal_order[3], **(search_bounds or {})}
+        seed_tasks = [task(site, search=bounds if search else None) for site in seeds]
+        models.update(pool.map(_fit_site, seed_tasks))
+        fitted_seeds = [s for s in seeds if models.get(s) is not None]
+        if not fitted_seeds:
+            raise ValueError("SARIMAX failed on every seed site")
+
+        seed_xy = coords.loc[fitted_seeds, ["latitude", "longitude"]].to_numpy()
+        others = [s for s in series.columns if s not in models]
+        tasks = []
+        for site in others:
+            xy = coords.loc[site, ["latitude", "longitude"]].to_numpy(dtype=np.float64)
+            dist = ((seed_xy - xy) ** 2).sum(axis=1)
+            nearest = fitted_seeds[int(np.nanargmin(dist)) if np.isfinite(dist).any() else 0]
+            seed_model = models[nearest]
+            tasks.append(task(site, order=seed_model.order, seasonal_order=seed_model.seasonal_order,
+                              start_params=seed_model.params, seed=nearest))
+        models.update(pool.map(_fit_site, tasks))
+    return {site: model for site, model in models.items() if model is not None}
+
+
+SARIMAX_STATES = "states.npz"
+
+
+def save_sarimax(models, path):
+    """Save fitted SiteSarimax models: ``manifest.json`` (orders, parameters, fit info) and ``states.npz``."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest, arrays = {}, {}
+    for i, (site, model) in enumerate(models.items()):
+        manifest[str(site)] = {
+            "key": i,
+            "order": list(model.order),
+            "seasonal_order": list(model.seasonal_order),
+            "params": model.params.tolist(),
+            "end": str(model.end),
+            "info": model.info,
+        }
+        arrays[f"state_{i}"], arrays[f"cov_{i}"], arrays[f"tail_{i}"] = model.state, model.state_cov, model.tail
+    np.savez(path / SARIMAX_STATES, **arrays)
+    with open(path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_sarimax(path):
+    """Load the models saved by ``save_sarimax`` (site ids as strings)."""
+    path = Path(path)
+    with open(path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    arrays = np.load(path / SARIMAX_STATES)
+    return {
+        site: SiteSarimax(
+            entry["order"], entry["seasonal_order"], entry["params"],
+            arrays[f"state_{entry['key']}"], arrays[f"cov_{entry['key']}"], arrays[f"tail_{entry['key']}"],
+            entry["end"], entry["info"],
+        )
+        for site, entry in manifest.items()
+    }
@@ -3,18 +3,33 @@ import pandas as pd
 import streamlit as st
 
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from pathlib import Path
 from my_utils import preprocess_data, load_model
 
 
+@st.cache_resource
+def get_model(path, mtime):
+    # Loaded once per model version (mtime), not on every rerun
+    return load_model(path)
+
+
+def model_mtime(path):
+    path = Path(path)
+    return (path / "manifest.json").stat().st_mtime if path.is_dir() else path.stat().st_mtime
+
+
 st.set_page_config(page_title="Traffic Count Predictor", layout="wide")
 st.title("🚲 Comptage Horaire - Prediction App")
 
-model_path = st.text_input("Model path", value="artifacts/model.pkl")
+model_path = st.text_input("Model path", value="artifacts/model")
 
-uploaded = st.file_uploader("Upload raw CSV", type=["csv"])
+uploaded = st.file_uploader("Upload raw CSV or Parquet", type=["csv", "parquet"])
 
 if uploaded is not None:
-    df_raw = pd.read_csv(uploaded)
+    if uploaded.name.endswith(".parquet"):
+        df_raw = pd.read_parquet(uploaded)
+    else:
+        df_raw = pd.read_csv(uploaded, sep=None, engine="python")
 
     st.subheader("Raw data preview")
     st.dataframe(df_raw.head(20), use_container_width=True)
@@ -25,7 +40,7 @@ if uploaded is not None:
     st.success(f"Preprocessing done  Rows after feature engineering: {len(df_encoded)}")
 
     with st.spinner("Loading model and predicting..."):
-        model = load_model(model_path)
+        model = get_model(model_path, model_mtime(model_path))
         X = df_encoded[features]
         preds = model.predict(X)
 